@@ -0,0 +1,8 @@
+"""
+Benchmarks do controle de produção, executados sem interface gráfica.
+
+    python -m benchmarks.gerar_dados producao_bench.db --linhas 1000000
+    python -m benchmarks.executar --banco producao_bench.db --saida resultado.json
+
+Execute a partir da raiz do repositório.
+"""
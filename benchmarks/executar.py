@@ -0,0 +1,286 @@
+"""
+Mede o tempo das operações principais do controle de produção, sem
+interface gráfica, e grava os resultados em JSON para comparar execuções.
+
+As operações rodam sobre uma cópia do banco informado (ou sobre um banco
+gerado por benchmarks.gerar_dados), em uma pasta temporária: o banco
+original não é alterado e execuções com o mesmo banco são comparáveis.
+Cada operação é executada uma vez para aquecer o cache e depois repetida;
+o resultado traz o mínimo, a mediana, a média e o máximo em milissegundos.
+
+Uso: python -m benchmarks.executar [--banco ARQUIVO | --linhas N] [--repeticoes R] [--saida ARQUIVO.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+from benchmarks.gerar_dados import SEMENTE_PADRAO, gerar_banco, gerar_documento
+from producao.backup import criar_backup, criar_backup_diferencial
+from producao.conexao import GerenciadorConexoes
+from producao.esquema import preparar_banco
+from producao.exportacao import exportar_cursor
+from producao.filtros import FiltroProducao
+from producao.relatorios import gerar_relatorio, montar_relatorio
+from producao.repositorio import COLUNAS_EXPORTACAO, consulta_pagina, consultar, excluir_producao, gravar_producao
+from producao.validacao import normalizar_registro
+
+REPETICOES_PADRAO = 10
+LINHAS_PADRAO = 100000
+
+
+def medir_operacao(operacao, repeticoes):
+    """
+    Executa operacao() uma vez para aquecimento e depois repeticoes vezes.
+    operacao retorna o número de linhas envolvidas (ou None).
+    Retorna o dicionário com as estatísticas dos tempos, em milissegundos.
+    """
+    linhas = operacao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = perf_counter()
+        linhas = operacao()
+        tempos.append((perf_counter() - inicio) * 1000)
+    return {
+        "repeticoes": repeticoes,
+        "linhas": linhas,
+        "min_ms": round(min(tempos), 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        "max_ms": round(max(tempos), 3),
+    }
+
+
+def _copiar_banco(origem, destino):
+    """
+    Copia um banco SQLite de forma consistente (inclusive o conteúdo do WAL).
+    """
+    conn_origem = sqlite3.connect(origem)
+    conn_destino = sqlite3.connect(destino)
+    try:
+        conn_origem.backup(conn_destino)
+    finally:
+        conn_origem.close()
+        conn_destino.close()
+
+
+def escolher_amostras(conn, rng):
+    """
+    Escolhe, nos próprios dados, os valores usados pelos filtros: a PA mais
+    frequente, um colaborador e um produto de frequência mediana, um trecho do
+    nome de um cliente (a palavra mais longa), o dia e o mês mais recentes e uma observação.
+    Retorna um dicionário de valores.
+    """
+    def mediano(coluna):
+        valores = conn.execute(f"SELECT {coluna} FROM producao_resumo_diario GROUP BY {coluna} ORDER BY SUM(quantidade) DESC").fetchall()
+        return valores[len(valores) // 2][0]
+
+    pa = conn.execute("SELECT pa FROM producao_resumo_diario GROUP BY pa ORDER BY SUM(quantidade) DESC LIMIT 1").fetchone()[0]
+    data = conn.execute("SELECT MAX(data) FROM producao_resumo_diario").fetchone()[0]
+    maximo_id = conn.execute("SELECT MAX(id) FROM registros_producao").fetchone()[0]
+    cliente = conn.execute("SELECT cliente FROM producao WHERE id >= ? ORDER BY id LIMIT 1", (rng.randint(1, maximo_id),)).fetchone()[0]
+    observacao = conn.execute("SELECT observacoes FROM producao WHERE observacoes <> '' LIMIT 1").fetchone()
+    return {
+        "pa": pa,
+        "colaborador": mediano("colaborador"),
+        "produto": mediano("produto"),
+        "cliente": max(cliente.split(), key=len),
+        "data": f"{data[8:10]}-{data[5:7]}-{data[0:4]}",
+        "mes": f"{data[5:7]}-{data[0:4]}",
+        "ano": data[0:4],
+        "observacoes": observacao[0].split()[0] if observacao else "",
+    }
+
+
+def _quantidade(ids):
+    """
+    Retorna a quantidade de ids, ou None se o resultado passou de LIMITE_IDS_RESULTADO.
+    """
+    return None if ids is None else len(ids)
+
+
+def montar_operacoes(conn, pasta, amostras, rng):
+    """
+    Monta as operações medidas, como pares (nome, função sem argumentos).
+    """
+    operacoes = []
+
+    # Filtros da tela de registros: a primeira página e os ids do resultado
+    filtros = {
+        "pa": FiltroProducao(pa=amostras["pa"]),
+        "colaborador": FiltroProducao(colaborador=amostras["colaborador"]),
+        "cliente": FiltroProducao(cliente=amostras["cliente"]),
+        "produto": FiltroProducao(produto=amostras["produto"]),
+        "data": FiltroProducao(data=amostras["data"]),
+        "observacoes": FiltroProducao(observacoes=amostras["observacoes"]),
+        "periodo": FiltroProducao(data_inicio=f"01-{amostras['mes']}", data_fim=amostras["data"]),
+        "combinado": FiltroProducao(pa=amostras["pa"], produto=amostras["produto"], data=amostras["ano"]),
+    }
+    for nome, filtro in filtros.items():
+        query, params = consulta_pagina(filtro)
+        operacoes.append((f"filtro.{nome}.pagina", lambda query=query, params=params: len(consultar(conn, query, params))))
+        operacoes.append((f"filtro.{nome}.ids", lambda filtro=filtro: _quantidade(filtro.buscar_ids(conn))))
+
+    # Relatórios: pelo resumo diário (sem texto livre) e pelos registros
+    relatorios = {
+        "colaborador": montar_relatorio(FiltroProducao()),
+        "pa_mes": montar_relatorio(FiltroProducao(), ("PA",), "Mês"),
+        "ranking_semana": montar_relatorio(FiltroProducao(data=amostras["ano"]), ("Colaborador",), "Semana", limite=10),
+        "cliente_produto": montar_relatorio(filtros["cliente"], ("Produto",)),
+    }
+    for nome, consulta in relatorios.items():
+        operacoes.append((f"relatorio.{nome}", lambda consulta=consulta: len(gerar_relatorio(conn, consulta))))
+
+    # Exportação dos registros do último mês
+    query_exportacao, params_exportacao = FiltroProducao(data=amostras["mes"]).consulta(COLUNAS_EXPORTACAO)
+    for extensao in ("csv", "xlsx"):
+        caminho = os.path.join(pasta, f"exportacao.{extensao}")
+
+        def exportar(caminho=caminho):
+            cursor = conn.cursor()
+            cursor.execute(query_exportacao, params_exportacao)
+            return exportar_cursor(cursor, caminho)
+
+        operacoes.append((f"exportar.{extensao}", exportar))
+
+    # Backups completo e diferencial; cada backup é removido após a medição,
+    # exceto o completo criado no aquecimento do diferencial, que é a base
+    pasta_backups = os.path.join(pasta, "backups")
+    os.mkdir(pasta_backups)
+
+    def backup_completo():
+        os.remove(criar_backup(conn, pasta))
+        return None
+
+    def backup_diferencial():
+        caminho = criar_backup_diferencial(conn, pasta_backups)
+        if caminho.endswith(".diff.gz"):
+            os.remove(caminho)
+        return None
+
+    operacoes.append(("backup.completo", backup_completo))
+    operacoes.append(("backup.diferencial", backup_diferencial))
+
+    # Gravações de um registro por vez, como no formulário; cada gravação usa
+    # um cliente novo, para não repetir a chave de duplicidade
+    maximo_id = conn.execute("SELECT MAX(id) FROM registros_producao").fetchone()[0]
+    ids_alterados = rng.sample(range(1, maximo_id + 1), min(maximo_id, 1000))
+    registros = [
+        normalizar_registro(
+            amostras["pa"], amostras["colaborador"], amostras["data"], gerar_documento(rng), "CLIENTE BENCHMARK",
+            amostras["produto"], "EM ANDAMENTO", "1.234,56",
+        )
+        for _ in range(2 * len(ids_alterados))
+    ]
+
+    def inserir():
+        gravar_producao(conn, registros.pop())
+        return 1
+
+    def editar():
+        gravar_producao(conn, registros.pop(), ids_alterados.pop())
+        return 1
+
+    def excluir():
+        excluir_producao(conn, [ids_alterados.pop()])
+        return 1
+
+    operacoes.append(("inserir", inserir))
+    operacoes.append(("editar", editar))
+    operacoes.append(("excluir", excluir))
+    return operacoes
+
+
+def executar_benchmarks(caminho, repeticoes=REPETICOES_PADRAO, semente=SEMENTE_PADRAO, operacoes=None, ao_medir=None):
+    """
+    Executa os benchmarks sobre uma cópia do banco informado.
+    operacoes, se informado, restringe a execução às operações cujo nome
+    começa por um dos prefixos da lista. ao_medir(nome, resultado), se
+    informado, é chamado após cada operação.
+    Retorna o dicionário com o ambiente, o banco e os tempos das operações.
+    """
+    rng = random.Random(semente)
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as pasta:
+        copia = os.path.join(pasta, "producao.db")
+        _copiar_banco(caminho, copia)
+        gerenciador = GerenciadorConexoes(copia)
+        try:
+            conn = gerenciador.obter()
+            preparar_banco(conn)
+            registros = conn.execute("SELECT COUNT(*) FROM registros_producao").fetchone()[0]
+            amostras = escolher_amostras(conn, rng)
+            resultados = {}
+            for nome, operacao in montar_operacoes(conn, pasta, amostras, rng):
+                if operacoes and not nome.startswith(tuple(operacoes)):
+                    continue
+                try:
+                    resultados[nome] = medir_operacao(operacao, repeticoes)
+                except ImportError as erro:  # exportação sem openpyxl, por exemplo
+                    resultados[nome] = {"ignorada": str(erro)}
+                if ao_medir is not None:
+                    ao_medir(nome, resultados[nome])
+        finally:
+            gerenciador.fechar_todas()
+
+    return {
+        "data_execucao": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+        },
+        "banco": {
+            "arquivo": os.path.abspath(caminho),
+            "registros": registros,
+            "tamanho_bytes": os.path.getsize(caminho),
+        },
+        "parametros": {"repeticoes": repeticoes, "semente": semente},
+        "amostras": amostras,
+        "operacoes": resultados,
+    }
+
+
+def main(argv=None):
+    """
+    Executa os benchmarks com os argumentos da linha de comando.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.executar", description="Mede o tempo das operações principais.")
+    parser.add_argument("--banco", help="banco de dados a medir (padrão: gera um com --linhas registros)")
+    parser.add_argument("--linhas", type=int, default=LINHAS_PADRAO, help=f"registros do banco gerado (padrão: {LINHAS_PADRAO})")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES_PADRAO, help=f"repetições de cada operação (padrão: {REPETICOES_PADRAO})")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO, help=f"semente dos dados e das amostras (padrão: {SEMENTE_PADRAO})")
+    parser.add_argument("--operacao", action="append", help="mede apenas as operações com este prefixo (ex.: filtro, relatorio); pode ser repetido")
+    parser.add_argument("--saida", help="grava o resultado JSON neste arquivo em vez de exibi-lo")
+    args = parser.parse_args(argv)
+
+    def ao_medir(nome, resultado):
+        tempo = f"{resultado['mediana_ms']:10.2f} ms" if "mediana_ms" in resultado else "   ignorada"
+        print(f"{nome:32} {tempo}", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_dados_") as pasta:
+        caminho = args.banco
+        if caminho is None:
+            caminho = os.path.join(pasta, "producao.db")
+            print(f"Gerando {args.linhas} registros...", file=sys.stderr)
+            gerar_banco(caminho, args.linhas, args.semente)
+        resultado = executar_benchmarks(caminho, args.repeticoes, args.semente, args.operacao, ao_medir)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
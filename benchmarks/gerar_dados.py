@@ -0,0 +1,210 @@
+"""
+Gerador de dados sintéticos de produção para os benchmarks.
+
+Os registros imitam a produção real: poucas PAs e poucos colaboradores
+concentram a maior parte das vendas (distribuição de Zipf), os clientes se
+repetem, os documentos têm dígitos verificadores válidos, os valores seguem
+uma distribuição log-normal e as datas cobrem os últimos anos até uma data
+final fixa. A mesma semente gera sempre os mesmos dados.
+
+Uso: python -m benchmarks.gerar_dados ARQUIVO --linhas N [--semente S]
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+from itertools import accumulate
+
+from producao.conexao import GerenciadorConexoes
+from producao.esquema import LISTA_PAS, LISTA_STATUS, preparar_banco
+from producao.importacao import SQL_INSERIR_REGISTRO, insercao_em_lote
+from producao.validacao import PESOS_CNPJ, PESOS_CPF
+
+# Ao acrescentar registros a um banco existente, os que repetirem a chave de
+# duplicidade de um registro já gravado são descartados
+SQL_INSERIR_SINTETICO = SQL_INSERIR_REGISTRO.rstrip() + "\n    ON CONFLICT DO NOTHING\n"
+
+SEMENTE_PADRAO = 42
+TAMANHO_LOTE = 10000
+DATA_FINAL = date(2025, 12, 31)
+ANOS_HISTORICO = 3
+NUMERO_COLABORADORES = 300
+MAXIMO_CLIENTES = 200000
+REGISTROS_POR_CLIENTE = 5
+PROPORCAO_CNPJ = 0.15
+EXPOENTE_ZIPF = 1.1
+
+PRIMEIROS_NOMES = (
+    "ANA", "MARIA", "JOÃO", "JOSÉ", "PEDRO", "PAULO", "LUCAS", "GABRIEL", "RAFAEL", "MARCOS",
+    "FERNANDA", "JULIANA", "PATRÍCIA", "ALINE", "CAMILA", "BRUNO", "CARLOS", "ANTÔNIO", "LUIZ", "MÁRCIA",
+    "FRANCISCO", "RODRIGO", "LETÍCIA", "BEATRIZ", "VINÍCIUS", "SIMONE", "ANDRÉ", "DÉBORA", "SÉRGIO", "CLÁUDIA",
+)
+SOBRENOMES = (
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA", "LIMA", "GOMES",
+    "COSTA", "RIBEIRO", "MARTINS", "CARVALHO", "ALMEIDA", "LOPES", "SOARES", "FERNANDES", "VIEIRA", "BARBOSA",
+    "ROCHA", "DIAS", "NASCIMENTO", "ANDRADE", "MOREIRA", "NUNES", "MARQUES", "MACHADO", "MENDES", "FREITAS",
+    "CARDOSO", "RAMOS", "GONÇALVES", "SANTANA", "TEIXEIRA", "ARAÚJO", "PINTO", "CAVALCANTI", "MONTEIRO", "MOURA",
+)
+SUFIXOS_EMPRESA = ("LTDA", "ME", "EIRELI", "S.A.", "COMÉRCIO LTDA", "SERVIÇOS LTDA")
+PRODUTOS = (
+    "CONTA CORRENTE", "CARTÃO DE CRÉDITO", "POUPANÇA", "CRÉDITO PESSOAL", "CRÉDITO CONSIGNADO",
+    "SEGURO DE VIDA", "SEGURO AUTO", "SEGURO RESIDENCIAL", "PREVIDÊNCIA", "CONSÓRCIO",
+    "CAPITALIZAÇÃO", "CDB", "LCA", "FINANCIAMENTO IMOBILIÁRIO", "MAQUININHA",
+)
+PESOS_STATUS = {"EM ANDAMENTO": 25, "CONCLUÍDO": 65, "CANCELADO": 10}
+# Observações, em sua maioria vazias
+OBSERVACOES = ("", "CLIENTE INDICADO", "RETORNAR LIGAÇÃO", "AGUARDANDO DOCUMENTOS", "PORTABILIDADE", "RENOVAÇÃO")
+PESOS_OBSERVACOES = (80, 5, 5, 4, 3, 3)
+
+
+def pesos_zipf(quantidade, expoente=EXPOENTE_ZIPF):
+    """
+    Retorna os pesos acumulados de uma distribuição de Zipf, para random.choices.
+    """
+    return list(accumulate(1 / posicao ** expoente for posicao in range(1, quantidade + 1)))
+
+
+def _digito(digitos, pesos):
+    """
+    Calcula um dígito verificador módulo 11.
+    """
+    resto = sum(digito * peso for digito, peso in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def gerar_documento(rng, cnpj=False):
+    """
+    Gera um CPF (ou CNPJ) com dígitos verificadores válidos, sem pontuação.
+    """
+    if cnpj:
+        digitos = [rng.randrange(10) for _ in range(8)] + [0, 0, 0, 1]
+        pesos = PESOS_CNPJ
+    else:
+        digitos = [rng.randrange(10) for _ in range(9)]
+        pesos = PESOS_CPF
+    digitos.append(_digito(digitos, pesos[0]))
+    digitos.append(_digito(digitos, pesos[1]))
+    return "".join(map(str, digitos))
+
+
+def gerar_nome(rng, sobrenomes=2):
+    """
+    Gera um nome de pessoa com o número de sobrenomes informado.
+    """
+    return " ".join([rng.choice(PRIMEIROS_NOMES)] + rng.sample(SOBRENOMES, sobrenomes))
+
+
+def gerar_clientes(rng, quantidade):
+    """
+    Gera a lista de clientes (documento, nome), pessoas físicas e jurídicas.
+    """
+    clientes = []
+    for _ in range(quantidade):
+        if rng.random() < PROPORCAO_CNPJ:
+            clientes.append((gerar_documento(rng, cnpj=True), f"{rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SUFIXOS_EMPRESA)}"))
+        else:
+            clientes.append((gerar_documento(rng), gerar_nome(rng)))
+    return clientes
+
+
+def gerar_colaboradores(rng, quantidade=NUMERO_COLABORADORES):
+    """
+    Gera nomes distintos de colaboradores.
+    """
+    nomes = {}
+    while len(nomes) < quantidade:
+        nomes.setdefault(gerar_nome(rng, sobrenomes=1 + len(nomes) % 2), None)
+    return list(nomes)
+
+
+def gerar_registros(rng, linhas, ids, pesos_status, ate=DATA_FINAL):
+    """
+    Gera os valores de registros_producao em lotes de TAMANHO_LOTE.
+    ids mapeia cada coluna de dimensão para a lista de ids disponíveis, da
+    mais frequente para a menos frequente; os status seguem pesos_status.
+    Não há dois registros com o mesmo cliente, produto e data.
+    """
+    clientes = gerar_clientes(rng, max(1, min(MAXIMO_CLIENTES, linhas // REGISTROS_POR_CLIENTE)))
+    dias = ANOS_HISTORICO * 365
+    inicio = ate - timedelta(days=dias - 1)
+    datas = [(inicio + timedelta(days=dia)).isoformat() for dia in range(dias)]
+    acumulados = {coluna: pesos_zipf(len(ids[coluna])) for coluna in ("pa", "colaborador", "produto")}
+
+    # Chaves de duplicidade já geradas (por hash, que ocupa menos memória);
+    # uma venda repetida do cliente no mesmo produto e dia é sorteada de novo
+    chaves = set()
+    geradas = 0
+    while geradas < linhas:
+        tamanho = min(TAMANHO_LOTE, linhas - geradas)
+        pas = rng.choices(ids["pa"], cum_weights=acumulados["pa"], k=tamanho)
+        colaboradores = rng.choices(ids["colaborador"], cum_weights=acumulados["colaborador"], k=tamanho)
+        produtos = rng.choices(ids["produto"], cum_weights=acumulados["produto"], k=tamanho)
+        status = rng.choices(ids["status"], weights=pesos_status, k=tamanho)
+        observacoes = rng.choices(OBSERVACOES, weights=PESOS_OBSERVACOES, k=tamanho)
+        lote = []
+        for i in range(tamanho):
+            while True:
+                documento, cliente = clientes[rng.randrange(len(clientes))]
+                data = datas[rng.randrange(dias)]
+                chave = hash((documento, produtos[i], data))
+                if chave not in chaves:
+                    chaves.add(chave)
+                    break
+            valor_centavos = max(1000, int(rng.lognormvariate(7.6, 1.0) * 100))
+            lote.append((pas[i], colaboradores[i], data, documento, cliente,
+                         produtos[i], status[i], valor_centavos, observacoes[i]))
+        geradas += tamanho
+        yield lote
+
+
+def gerar_banco(caminho, linhas, semente=SEMENTE_PADRAO, ate=DATA_FINAL, ao_lote=None):
+    """
+    Acrescenta linhas registros sintéticos ao banco informado (criando-o se
+    necessário), em uma única inserção em lote.
+    ao_lote(geradas), se informado, é chamado após cada lote.
+    """
+    rng = random.Random(semente)
+    gerenciador = GerenciadorConexoes(caminho)
+    try:
+        conn = gerenciador.obter()
+        preparar_banco(conn)
+        with insercao_em_lote(conn) as dimensoes:
+            nomes = {
+                "pa": LISTA_PAS,
+                "colaborador": gerar_colaboradores(rng),
+                "produto": PRODUTOS,
+                "status": LISTA_STATUS,
+            }
+            ids = {coluna: [dimensoes.obter_id(coluna, nome) for nome in lista] for coluna, lista in nomes.items()}
+            pesos_status = [PESOS_STATUS.get(nome, 1) for nome in LISTA_STATUS]
+            geradas = 0
+            for lote in gerar_registros(rng, linhas, ids, pesos_status, ate):
+                conn.executemany(SQL_INSERIR_SINTETICO, lote)
+                geradas += len(lote)
+                if ao_lote is not None:
+                    ao_lote(geradas)
+    finally:
+        gerenciador.fechar_todas()
+
+
+def main(argv=None):
+    """
+    Gera o banco de dados sintético informado na linha de comando.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.gerar_dados", description="Gera dados sintéticos de produção.")
+    parser.add_argument("arquivo", help="banco de dados a preencher (criado se não existir)")
+    parser.add_argument("--linhas", type=int, default=100000, help="quantidade de registros (padrão: 100000)")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO, help=f"semente dos dados (padrão: {SEMENTE_PADRAO})")
+    parser.add_argument("--ate", type=date.fromisoformat, default=DATA_FINAL, help=f"data final AAAA-MM-DD (padrão: {DATA_FINAL})")
+    args = parser.parse_args(argv)
+
+    def ao_lote(geradas):
+        print(f"\r{geradas} de {args.linhas} registros...", end="", file=sys.stderr, flush=True)
+
+    gerar_banco(args.arquivo, args.linhas, args.semente, args.ate, ao_lote)
+    print(file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
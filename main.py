@@ -1,119 +1,321 @@
-import sqlite3
 import tkinter as tk
+from time import perf_counter
 from tkinter import ttk, messagebox, filedialog
-from datetime import datetime
-import re
-import shutil
-import pandas as pd
+
+from producao.backup import criar_backup, criar_backup_diferencial, podar_backups
+from producao.cliente import SERVIDOR_API, ClienteProducao, ErroAPI
+from producao.conexao import ARQUIVO_DB, GerenciadorConexoes
+from producao.dimensoes import carregar_dimensao
+from producao.esquema import contar_datas_nao_convertidas, contar_valores_nao_convertidos, preparar_banco
+from producao.executor import ExecutorBD
+from producao.exportacao import exportar_cursor
+from producao.filtros import FiltroProducao
+from producao.importacao import importar_arquivo
+from producao import instrumentacao
+from producao.instrumentacao import explicar_se_lenta, medir, registrar, resumir_sql
+from producao.relatorios import COLUNAS_CENTAVOS, DIMENSOES_RELATORIO, PERIODOS_RELATORIO, gerar_relatorio, montar_relatorio
+from producao.repositorio import (
+    COLUNAS_EXPORTACAO, TAMANHO_PAGINA,
+    aplicar_exclusao, aplicar_gravacao, buscar_pagina, buscar_registro, formatar_linha,
+)
+from producao.sugestoes import CacheClientes, IndicePrefixos, buscar_cliente, carregar_clientes
+from producao.validacao import (
+    RegistroDuplicado, RegistroInvalido, data_para_exibicao, formatar_centavos, normalizar_registro, validar_cpf_cnpj,
+)
 
 # Constantes
-ARQUIVO_DB = "producao.db"
-LISTA_PAS = ["PA01", "PA02", "PA03", "PA04", "PA05", "PA06", "PA07", "PA08", "PA09", "PA10", "PA97"]
+ATRASO_BUSCA_MS = 300
+INTERVALO_RESULTADOS_MS = 50
+COMPRIMIR_BACKUPS = False
+MANTER_BACKUPS = 10
+SEM_AGRUPAMENTO = "(Nenhum)"
+# Campos do formulário com autocompletar pelos nomes já cadastrados
+COLUNAS_AUTOCOMPLETAR = ("colaborador", "produto")
+# Teclas que não digitam texto e, portanto, não disparam o autocompletar
+TECLAS_SEM_TEXTO = ("BackSpace", "Delete", "Left", "Right", "Up", "Down", "Home", "End", "Tab", "Return", "Escape")
+# Títulos das colunas dos relatórios
+TITULOS_RELATORIO = {
+    "periodo": "Período",
+    "pa": "PA",
+    "colaborador": "Colaborador",
+    "produto": "Produto",
+    "status": "Status",
+    "quantidade": "Quantidade",
+    "total_centavos": "Total",
+    "media_centavos": "Média",
+    "posicao": "Posição",
+    "variacao_centavos": "Variação",
+}
+
+# Conexões persistentes com o banco de dados (uma por thread), criadas em main()
+gerenciador_conexoes = None
+
+# Operações de banco de dados em segundo plano, fora da thread da interface
+executor_bd = None
+
+# Cliente da API quando PRODUCAO_SERVIDOR aponta para um servidor (modo
+# cliente); None quando a aplicação usa o banco local
+cliente_api = None
+
+# Listas das caixas de seleção (PAs, status, colaboradores e produtos), lidas
+# das dimensões uma vez e atualizadas apenas após gravações
+listas_selecao = {}
+
+# Índices de prefixos dos campos com autocompletar e nomes dos clientes por
+# CPF/CNPJ, consultados em memória a cada tecla digitada no formulário
+indices_autocompletar = {}
+cache_clientes = CacheClientes()
+
+# Nome do cliente preenchido pelo CPF/CNPJ, que pode ser trocado se o
+# documento mudar; um nome digitado pelo operador nunca é substituído
+cliente_preenchido = None
 
 # Variável global para armazenar o índice do registro em edição
 registro_em_edicao = None
 
-# Funções de Validação
-def validar_cpf_cnpj(cpf_cnpj):
+# Último filtro aplicado na tela de registros
+filtro_atual = None
+
+# Filtragem agendada pela pesquisa ao digitar
+filtro_agendado = None
+
+# Versão dos dados, incrementada a cada gravação feita pela aplicação
+versao_dados = 0
+
+# Tarefas em segundo plano acompanhadas na tela de registros
+tarefa_em_andamento = None
+tarefa_ids = None
+
+# Conexão da thread da interface
+def conectar_db():
     """
-    Valida CPF ou CNPJ.
-    Retorna True se for válido, False caso contrário.
+    Conecta ao banco de dados SQLite.
+    Retorna a conexão persistente da thread atual; ela não deve ser fechada
+    pelo chamador (o bloco "with" apenas confirma ou desfaz a transação).
     """
-    cpf_cnpj = re.sub(r'[^0-9]', '', cpf_cnpj)
-    if len(cpf_cnpj) == 11:  # CPF
-        if cpf_cnpj == cpf_cnpj[0] * 11:
-            return False
-        return True
-    elif len(cpf_cnpj) == 14:  # CNPJ
-        if cpf_cnpj == cpf_cnpj[0] * 14:
-            return False
-        return True
-    return False
+    return gerenciador_conexoes.obter()
 
-def validar_data(data):
+def carregar_listas_selecao():
     """
-    Valida a data no formato DD-MM-AAAA.
-    Retorna True se for válida, False caso contrário.
+    Lê das dimensões as listas das caixas de seleção e monta os índices do
+    autocompletar.
     """
-    try:
-        datetime.strptime(data, "%d-%m-%Y")
-        return True
-    except ValueError:
-        return False
+    for coluna in ("pa", "status", *COLUNAS_AUTOCOMPLETAR):
+        if cliente_api is not None:
+            listas_selecao[coluna] = cliente_api.carregar_dimensao(coluna)
+        else:
+            listas_selecao[coluna] = carregar_dimensao(conectar_db(), coluna)
+    for coluna in COLUNAS_AUTOCOMPLETAR:
+        indices_autocompletar[coluna] = IndicePrefixos(listas_selecao[coluna])
+
+def atualizar_listas_selecao():
+    """
+    Relê as listas das caixas de seleção após uma gravação, que pode ter
+    cadastrado nomes novos, e atualiza as caixas de seleção abertas.
+    """
+    carregar_listas_selecao()
+    combo_pa.config(values=listas_selecao["pa"])
+    combo_status.config(values=listas_selecao["status"])
+    if tela_registros_aberta():
+        entry_filtro_pa.config(values=listas_selecao["pa"])
 
-def validar_valor(valor):
+def invalidar_resultado_filtro():
     """
-    Valida o valor monetário.
-    Retorna True se for válido, False caso contrário.
+    Descarta os ids guardados do último filtro após alterações nos dados.
     """
-    try:
-        valor_limpo = valor.replace("R$", "").replace(",", ".").strip()
-        float(valor_limpo)
-        return True
-    except ValueError:
-        return False
+    global versao_dados
+    versao_dados += 1
+    if filtro_atual is not None:
+        filtro_atual.ids = None
+
+# Operações executadas em segundo plano pelo executor_bd; todas recebem a
+# conexão da thread (None no modo cliente) e a tarefa em execução
+def buscar_pagina_registros(conn, tarefa, filtro, coluna, decrescente, ultima_chave):
+    """
+    Busca uma página de registros no banco local ou no servidor.
+    """
+    if cliente_api is not None:
+        return cliente_api.buscar_pagina(filtro, coluna, decrescente, ultima_chave)
+    return buscar_pagina(conn, filtro, coluna, decrescente, ultima_chave)
 
-# Funções de Banco de Dados
-def conectar_db():
+def gerar_relatorio_consulta(conn, tarefa, consulta):
     """
-    Conecta ao banco de dados SQLite.
-    Retorna a conexão.
-    """
-    return sqlite3.connect(ARQUIVO_DB)
-
-def criar_tabela_pas():
-    """
-    Cria a tabela de PAs e a popula com dados iniciais, se necessário.
-    """
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL UNIQUE
-            )
-        ''')
-        cursor.execute("SELECT COUNT(*) FROM pas")
-        if cursor.fetchone()[0] == 0:  # Se a tabela estiver vazia
-            cursor.executemany('''
-                INSERT INTO pas (nome) VALUES (?)
-            ''', [(pa,) for pa in LISTA_PAS])
-        conn.commit()
-
-def carregar_pas():
-    """
-    Carrega a lista de PAs do banco de dados.
-    Retorna uma lista de PAs.
-    """
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pas'")
-        if cursor.fetchone() is None:
-            criar_tabela_pas()  # Cria a tabela se não existir
-        cursor.execute("SELECT nome FROM pas")
-        return [row[0] for row in cursor.fetchall()]
-
-def criar_tabela_producao():
-    """
-    Cria a tabela de produção, se não existir.
-    """
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS producao (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pa TEXT NOT NULL,
-                colaborador TEXT NOT NULL,
-                data TEXT NOT NULL,
-                cpf_cnpj TEXT NOT NULL,
-                cliente TEXT NOT NULL,
-                produto TEXT NOT NULL,
-                status TEXT NOT NULL,
-                valor TEXT NOT NULL,
-                observacoes TEXT
-            )
-        ''')
-        conn.commit()
+    Gera um relatório no banco local ou no servidor.
+    """
+    if cliente_api is not None:
+        return cliente_api.gerar_relatorio(consulta)
+    return gerar_relatorio(conn, consulta)
+
+def gravar_registro(conn, tarefa, campos, valores, id_registro):
+    """
+    Grava um registro na transação do grupo, ou no servidor, que recebe os
+    campos do formulário e os valida de novo.
+    """
+    if cliente_api is not None:
+        return cliente_api.gravar(campos, id_registro)
+    return aplicar_gravacao(conn, valores, id_registro)
+
+def excluir_registros(conn, tarefa, ids):
+    """
+    Exclui registros na transação do grupo, ou no servidor.
+    """
+    if cliente_api is not None:
+        return cliente_api.excluir(ids)
+    return aplicar_exclusao(conn, ids)
+
+def ler_clientes(conn, tarefa):
+    """
+    Lê do banco local os nomes dos clientes por CPF/CNPJ.
+    """
+    with medir("sql: carregar clientes") as medicao:
+        nomes = carregar_clientes(conn)
+        medicao["linhas"] = len(nomes)
+    return nomes
+
+def buscar_nome_cliente(conn, tarefa, cpf_cnpj):
+    """
+    Busca o nome do cliente de um CPF/CNPJ no banco local ou no servidor.
+    """
+    if cliente_api is not None:
+        return cliente_api.buscar_cliente(cpf_cnpj)
+    return buscar_cliente(conn, cpf_cnpj)
+
+def ler_registro(conn, tarefa, id_registro):
+    """
+    Busca um registro pela chave primária no banco local ou no servidor.
+    """
+    if cliente_api is not None:
+        return cliente_api.buscar_registro(id_registro)
+    return buscar_registro(conn, id_registro)
+
+def baixar_exportacao(conn, tarefa, caminho_arquivo, filtro=None, consulta=None):
+    """
+    Baixa do servidor a exportação dos registros filtrados ou de um relatório.
+    """
+    def ao_bloco(recebidos, total):
+        tarefa.verificar_cancelamento()
+        tarefa.informar_progresso(recebidos, total)
+
+    with medir("exportação: baixar arquivo", arquivo=caminho_arquivo):
+        cliente_api.exportar(caminho_arquivo, filtro, consulta, ao_bloco)
+    return caminho_arquivo
+
+def exportar_consulta(conn, tarefa, query, params, caminho_arquivo, total_esperado=None):
+    """
+    Exporta o resultado de uma consulta em lotes; o formato segue a extensão
+    do arquivo (Excel, CSV ou Parquet).
+    """
+    def ao_lote(total):
+        tarefa.verificar_cancelamento()
+        tarefa.informar_progresso(total, total_esperado)
+
+    cursor = conn.cursor()
+    with medir("sql: executar", sql=resumir_sql(query)) as execucao:
+        cursor.execute(query, params)
+    explicar_se_lenta(conn, query, params, execucao.duracao_ms)
+    with medir("exportação: gravar arquivo", arquivo=caminho_arquivo) as medicao:
+        medicao["linhas"] = exportar_cursor(cursor, caminho_arquivo, ao_lote=ao_lote)
+    return caminho_arquivo
+
+# Paginação da Treeview
+class PaginadorRegistros:
+    """
+    Carrega os registros na Treeview sob demanda, uma página por vez.
+    Usa paginação por chave (chave de ordenação e id maiores que os da última
+    linha carregada), então cada nova página custa uma busca no índice,
+    independente de quantas linhas já foram exibidas.
+    """
+
+    def __init__(self, tree, scrollbar):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.filtro = FiltroProducao()
+        self.coluna = None  # coluna de ORDENACAO_COLUNAS, ou None para a ordem de cadastro
+        self.decrescente = False
+        self.ultima_chave = None
+        self.esgotado = True
+        self.tarefa = None  # busca da página em andamento, em segundo plano
+
+    def carregar(self, filtro):
+        """
+        Limpa a Treeview e carrega a primeira página para o filtro informado.
+        Retorna a tarefa que busca a página.
+        """
+        self.filtro = filtro
+        return self.recarregar()
+
+    def ordenar(self, coluna, decrescente=False):
+        """
+        Reordena os registros pela coluna informada, mantendo o filtro atual.
+        """
+        self.coluna = coluna
+        self.decrescente = decrescente
+        return self.recarregar()
+
+    def recarregar(self):
+        """
+        Limpa a Treeview e carrega a primeira página com o filtro e a ordem atuais.
+        Retorna a tarefa que busca a página.
+        """
+        if self.tarefa is not None:
+            self.tarefa.cancelar()
+            self.tarefa = None
+        self.ultima_chave = None
+        self.esgotado = False
+        with medir("interface: limpar registros") as medicao:
+            itens = self.tree.get_children()
+            medicao["linhas"] = len(itens)
+            self.tree.delete(*itens)
+        return self.carregar_proxima_pagina()
+
+    def carregar_proxima_pagina(self):
+        """
+        Busca a próxima página de registros em segundo plano; ao concluir, ela é
+        acrescentada à Treeview. Retorna a tarefa da busca.
+        """
+        if self.esgotado or self.tarefa is not None:
+            return self.tarefa
+        tarefa = executor_bd.ler(buscar_pagina_registros, self.filtro, self.coluna, self.decrescente, self.ultima_chave)
+        tarefa.ao_concluir = lambda pagina: self._pagina_carregada(tarefa, *pagina)
+        tarefa.ao_falhar = lambda erro: self._pagina_com_erro(tarefa, erro)
+        tarefa.ao_cancelar = lambda: self._pagina_com_erro(tarefa, None)
+        self.tarefa = tarefa
+        return tarefa
+
+    def _pagina_carregada(self, tarefa, linhas, proxima_chave):
+        """
+        Acrescenta à Treeview as linhas de uma página buscada em segundo plano.
+        """
+        if tarefa is not self.tarefa or not self.tree.winfo_exists():
+            return  # Página de uma consulta já substituída ou janela fechada
+        self.tarefa = None
+        with medir("interface: inserir página", linhas=len(linhas)):
+            for row in linhas:
+                # O iid do item é o id do registro, usado na edição e na exclusão
+                self.tree.insert("", tk.END, iid=row[0], values=formatar_linha(row))
+        # Chave da última linha (ou cursor do servidor), ponto de partida da próxima página
+        self.ultima_chave = proxima_chave
+        self.esgotado = proxima_chave is None
+
+    def _pagina_com_erro(self, tarefa, erro):
+        """
+        Interrompe a paginação quando a busca de uma página falha ou é cancelada.
+        """
+        if tarefa is not self.tarefa:
+            return
+        self.tarefa = None
+        self.esgotado = True
+        if erro is not None:
+            messagebox.showerror("Erro", f"Ocorreu um erro ao carregar os registros: {erro}")
+
+    def rolagem(self, primeiro, ultimo):
+        """
+        Atualiza a barra de rolagem e carrega mais registros perto do fim da lista.
+        Usada como yscrollcommand da Treeview.
+        """
+        self.scrollbar.set(primeiro, ultimo)
+        if float(ultimo) > 0.9 and not self.esgotado and self.tarefa is None:
+            self.tree.after_idle(self.carregar_proxima_pagina)
 
 # Funções de Interface Gráfica
 def registrar_producao():
@@ -122,66 +324,145 @@ def registrar_producao():
     """
     global registro_em_edicao
 
-    pa = combo_pa.get().upper()
-    nome_colaborador = entry_colaborador.get().upper()
-    data = entry_data.get()
-    cpf_cnpj = entry_cpf_cnpj.get().upper()
-    nome_cliente = entry_cliente.get().upper()
-    produto = entry_produto.get().upper()
-    status = combo_status.get().upper()
-    valor_captado = entry_valor.get().upper()
-    observacoes = entry_observacoes.get().upper()
-
-    if not pa or not nome_colaborador or not cpf_cnpj or not nome_cliente or not produto or not status or not valor_captado:
-        messagebox.showwarning("Atenção", "Todos os campos devem ser preenchidos!")
+    campos = {
+        "pa": combo_pa.get(),
+        "colaborador": entry_colaborador.get(),
+        "data": entry_data.get(),
+        "cpf_cnpj": entry_cpf_cnpj.get(),
+        "cliente": entry_cliente.get(),
+        "produto": entry_produto.get(),
+        "status": combo_status.get(),
+        "valor": entry_valor.get(),
+        "observacoes": entry_observacoes.get(),
+    }
+    try:
+        valores = normalizar_registro(**campos)
+    except RegistroInvalido as erro:
+        messagebox.showwarning("Atenção", str(erro))
         return
 
-    if not validar_cpf_cnpj(cpf_cnpj):
-        messagebox.showwarning("Atenção", "CPF/CNPJ inválido!")
+    # A gravação roda na thread escritora, agrupada com as que chegarem junto,
+    # e só é confirmada depois de gravada em disco; os botões ficam
+    # desabilitados até a confirmação para evitar envios duplicados
+    btn_registrar.config(state="disabled")
+    btn_salvar_edicao.config(state="disabled")
+    executor_bd.escrever_em_grupo(
+        gravar_registro, campos, valores, registro_em_edicao,
+        ao_concluir=lambda resultado: producao_registrada(resultado, valores),
+        ao_falhar=falha_ao_registrar,
+    )
+
+def producao_registrada(resultado=None, valores=None):
+    """
+    Conclui o registro de uma produção após a gravação.
+    """
+    global registro_em_edicao
+    btn_registrar.config(state="normal")
+    btn_salvar_edicao.config(state="normal")
+    if valores is not None:
+        cache_clientes.registrar(valores[3], valores[4])
+    invalidar_resultado_filtro()
+    atualizar_listas_selecao()
+
+    messagebox.showinfo("Sucesso", "Produção registrada com sucesso!")
+    editando = registro_em_edicao is not None
+    limpar_campos()
+    if editando:
+        registro_em_edicao = None  # Reseta o registro em edição
+        abrir_tela_registros()  # Atualiza a lista de registros
+
+def falha_ao_registrar(erro):
+    """
+    Informa uma falha na gravação de uma produção.
+    """
+    btn_registrar.config(state="normal")
+    btn_salvar_edicao.config(state="normal")
+    if isinstance(erro, RegistroDuplicado) or (isinstance(erro, ErroAPI) and erro.status == 409):
+        messagebox.showwarning("Atenção", str(erro))
         return
+    messagebox.showerror("Erro", f"Ocorreu um erro ao registrar a produção: {erro}")
 
-    if not validar_data(data):
-        messagebox.showwarning("Atenção", "Data inválida! Use o formato DD-MM-AAAA.")
+def carregar_cache_clientes():
+    """
+    Lê em segundo plano os nomes dos clientes do banco local. No modo
+    cliente, os nomes são buscados no servidor um documento por vez.
+    """
+    if cliente_api is not None:
+        return
+    cache_clientes.iniciar_leitura()
+    executor_bd.ler(ler_clientes, ao_concluir=cache_clientes.definir)
+
+def preencher_cliente(event=None):
+    """
+    Preenche o nome do cliente quando o CPF/CNPJ digitado já tem registros.
+    Enquanto os nomes não foram carregados (ou no modo cliente), um
+    documento desconhecido é buscado em segundo plano.
+    """
+    cpf_cnpj = entry_cpf_cnpj.get()
+    if not validar_cpf_cnpj(cpf_cnpj):
+        return
+    with medir("interface: buscar cliente"):
+        cliente = cache_clientes.buscar(cpf_cnpj)
+    if cliente is not None or cache_clientes.carregado:
+        definir_cliente(cliente)
         return
+    executor_bd.ler(buscar_nome_cliente, cpf_cnpj, ao_concluir=lambda cliente: cliente_encontrado(cpf_cnpj, cliente))
+
+def cliente_encontrado(cpf_cnpj, cliente):
+    """
+    Preenche o nome do cliente buscado em segundo plano, se o CPF/CNPJ do
+    formulário ainda for o mesmo.
+    """
+    if cliente is not None:
+        cache_clientes.registrar(cpf_cnpj, cliente)
+    if entry_cpf_cnpj.get() == cpf_cnpj:
+        definir_cliente(cliente)
 
-    if not validar_valor(valor_captado):
-        messagebox.showwarning("Atenção", "Valor inválido! Insira um valor monetário válido.")
+def definir_cliente(cliente):
+    """
+    Coloca o nome do cliente no formulário (ou limpa o nome preenchido antes,
+    se cliente for None), sem substituir um nome digitado pelo operador.
+    """
+    global cliente_preenchido
+    atual = entry_cliente.get()
+    if atual and atual != cliente_preenchido:
         return
+    entry_cliente.delete(0, tk.END)
+    entry_cliente.insert(0, cliente or "")
+    cliente_preenchido = cliente
 
-    try:
-        with conectar_db() as conn:
-            cursor = conn.cursor()
-            if registro_em_edicao is None:
-                cursor.execute('''
-                    INSERT INTO producao (pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (pa, nome_colaborador, data, cpf_cnpj, nome_cliente, produto, status, valor_captado, observacoes))
-            else:
-                cursor.execute('''
-                    UPDATE producao
-                    SET pa=?, colaborador=?, data=?, cpf_cnpj=?, cliente=?, produto=?, status=?, valor=?, observacoes=?
-                    WHERE id=?
-                ''', (pa, nome_colaborador, data, cpf_cnpj, nome_cliente, produto, status, valor_captado, observacoes, registro_em_edicao))
-            conn.commit()
-
-        messagebox.showinfo("Sucesso", "Produção registrada com sucesso!")
-        limpar_campos()
-        if registro_em_edicao is not None:
-            registro_em_edicao = None  # Reseta o registro em edição
-            abrir_tela_registros()  # Atualiza a lista de registros
-    except Exception as e:
-        messagebox.showerror("Erro", f"Ocorreu um erro ao registrar a produção: {e}")
+def autocompletar(event, coluna):
+    """
+    Completa o texto digitado com o primeiro nome cadastrado que começa com
+    ele (o trecho completado fica selecionado e é substituído ao continuar
+    digitando) e lista os demais na caixa de seleção do campo.
+    """
+    campo = event.widget
+    if event.keysym in TECLAS_SEM_TEXTO or not (event.char and event.char.isprintable()):
+        if event.keysym in ("BackSpace", "Delete"):
+            campo.config(values=indices_autocompletar[coluna].sugerir(campo.get()))
+        return
+    digitado = campo.get()[:campo.index(tk.INSERT)]
+    with medir("interface: autocompletar", coluna=coluna):
+        sugestoes = indices_autocompletar[coluna].sugerir(digitado)
+    campo.config(values=sugestoes)
+    if sugestoes:
+        campo.delete(0, tk.END)
+        campo.insert(0, sugestoes[0])
+        campo.icursor(len(digitado))
+        campo.selection_range(len(digitado), tk.END)
 
 def limpar_campos():
     """
     Limpa todos os campos do formulário.
     """
-    global registro_em_edicao
+    global registro_em_edicao, cliente_preenchido
     combo_pa.set("")
     entry_colaborador.delete(0, tk.END)
     entry_data.delete(0, tk.END)
     entry_cpf_cnpj.delete(0, tk.END)
     entry_cliente.delete(0, tk.END)
+    cliente_preenchido = None
     entry_produto.delete(0, tk.END)
     combo_status.set("")
     entry_valor.delete(0, tk.END)
@@ -192,29 +473,28 @@ def limpar_campos():
 def ordenar_coluna(tree, col, reverse):
     """
     Ordena as colunas da Treeview.
+    A ordenação é feita pelo banco (ORDER BY sobre o filtro atual) e apenas a
+    primeira página é recarregada.
     """
-    dados = [(tree.set(item, col), item) for item in tree.get_children("")]
-    dados.sort(reverse=reverse)
-    for index, (valor, item) in enumerate(dados):
-        tree.move(item, "", index)
+    acompanhar_tarefa(paginador.ordenar(col, reverse), "Ordenando registros...")
     tree.heading(col, command=lambda: ordenar_coluna(tree, col, not reverse))
 
 def abrir_tela_registros():
     """
     Abre a tela de registros com filtros e Treeview.
     """
-    global tree, janela_registros, entry_filtro_colaborador, entry_filtro_cliente, entry_filtro_produto, entry_filtro_data, entry_filtro_pa, entry_filtro_data_inicio, entry_filtro_data_fim
+    global tree, paginador, janela_registros, entry_filtro_colaborador, entry_filtro_cliente, entry_filtro_produto, entry_filtro_data, entry_filtro_pa, entry_filtro_data_inicio, entry_filtro_data_fim, entry_filtro_observacoes, var_busca_digitacao, combo_agrupamento, combo_periodo, entry_ranking, label_status, barra_progresso, btn_cancelar
 
     janela_registros = tk.Toplevel()
     janela_registros.title("Registros de Produção")
-    janela_registros.geometry("1000x500")
+    janela_registros.geometry("1000x540")
 
     # Frame de filtros
     frame_filtros = tk.Frame(janela_registros)
     frame_filtros.pack(pady=10, fill="x")
 
     tk.Label(frame_filtros, text="PA:").grid(row=0, column=0, padx=5)
-    entry_filtro_pa = ttk.Combobox(frame_filtros, values=carregar_pas())
+    entry_filtro_pa = ttk.Combobox(frame_filtros, values=listas_selecao["pa"])
     entry_filtro_pa.grid(row=0, column=1, padx=5)
 
     tk.Label(frame_filtros, text="Colaborador:").grid(row=0, column=2, padx=5)
@@ -233,6 +513,16 @@ def abrir_tela_registros():
     entry_filtro_data = tk.Entry(frame_filtros)
     entry_filtro_data.grid(row=1, column=3, padx=5)
 
+    tk.Label(frame_filtros, text="Observações:").grid(row=1, column=4, padx=5)
+    entry_filtro_observacoes = tk.Entry(frame_filtros)
+    entry_filtro_observacoes.grid(row=1, column=5, padx=5)
+
+    # Pesquisa ao digitar (opcional), com espera para agrupar as teclas
+    var_busca_digitacao = tk.BooleanVar(value=False)
+    tk.Checkbutton(frame_filtros, text="Pesquisar ao digitar", variable=var_busca_digitacao).grid(row=1, column=6, columnspan=2, padx=5)
+    for entry in (entry_filtro_colaborador, entry_filtro_cliente, entry_filtro_produto, entry_filtro_observacoes):
+        entry.bind("<KeyRelease>", agendar_filtro)
+
     tk.Label(frame_filtros, text="Data Início (DD-MM-AAAA):").grid(row=2, column=0, padx=5)
     entry_filtro_data_inicio = tk.Entry(frame_filtros)
     entry_filtro_data_inicio.grid(row=2, column=1, padx=5)
@@ -250,9 +540,24 @@ def abrir_tela_registros():
     btn_gerar_relatorio = tk.Button(frame_filtros, text="Gerar Relatório", command=gerar_relatorio_filtrado)
     btn_gerar_relatorio.grid(row=2, column=6, padx=5)
 
-    btn_exportar_excel = tk.Button(frame_filtros, text="Exportar para Excel", command=exportar_para_excel)
+    btn_exportar_excel = tk.Button(frame_filtros, text="Exportar", command=exportar_para_excel)
     btn_exportar_excel.grid(row=2, column=7, padx=5)
 
+    # Opções do relatório
+    tk.Label(frame_filtros, text="Agrupar por:").grid(row=3, column=0, padx=5)
+    combo_agrupamento = ttk.Combobox(frame_filtros, values=[SEM_AGRUPAMENTO, *DIMENSOES_RELATORIO], state="readonly")
+    combo_agrupamento.set("Colaborador")
+    combo_agrupamento.grid(row=3, column=1, padx=5)
+
+    tk.Label(frame_filtros, text="Período:").grid(row=3, column=2, padx=5)
+    combo_periodo = ttk.Combobox(frame_filtros, values=[SEM_AGRUPAMENTO, *PERIODOS_RELATORIO], state="readonly")
+    combo_periodo.set(SEM_AGRUPAMENTO)
+    combo_periodo.grid(row=3, column=3, padx=5)
+
+    tk.Label(frame_filtros, text="Somente os N primeiros:").grid(row=3, column=4, padx=5)
+    entry_ranking = tk.Entry(frame_filtros, width=6)
+    entry_ranking.grid(row=3, column=5, padx=5, sticky="w")
+
     # Frame para a Treeview e barras de rolagem
     frame_treeview = tk.Frame(janela_registros)
     frame_treeview.pack(expand=True, fill="both", padx=10, pady=10)
@@ -277,82 +582,113 @@ def abrir_tela_registros():
     scrollbar_horizontal = ttk.Scrollbar(frame_treeview, orient="horizontal", command=tree.xview)
     scrollbar_horizontal.pack(side="bottom", fill="x")
 
-    # Configura a Treeview para usar as barras de rolagem
-    tree.configure(yscrollcommand=scrollbar_vertical.set, xscrollcommand=scrollbar_horizontal.set)
+    # Configura a Treeview para usar as barras de rolagem; a vertical também
+    # dispara o carregamento da próxima página
+    paginador = PaginadorRegistros(tree, scrollbar_vertical)
+    tree.configure(yscrollcommand=paginador.rolagem, xscrollcommand=scrollbar_horizontal.set)
     tree.pack(expand=True, fill="both")
 
     tree.bind("<Double-1>", carregar_para_edicao)
-    exibir_registros()
 
     # Botão de exclusão
     btn_excluir = tk.Button(janela_registros, text="Excluir", command=excluir_registro)
     btn_excluir.pack(pady=5)
 
+    # Medições de tempo, disponíveis apenas com o diagnóstico ativo (PRODUCAO_DIAGNOSTICO=1)
+    if instrumentacao.ATIVA:
+        btn_diagnostico = tk.Button(janela_registros, text="Diagnóstico", command=abrir_diagnostico)
+        btn_diagnostico.pack(pady=5)
+
+    # Andamento das operações em segundo plano
+    frame_status = tk.Frame(janela_registros)
+    frame_status.pack(fill="x", padx=10, pady=5)
+    label_status = tk.Label(frame_status, text="", anchor="w")
+    label_status.pack(side="left", fill="x", expand=True)
+    btn_cancelar = tk.Button(frame_status, text="Cancelar", command=cancelar_tarefa, state="disabled")
+    btn_cancelar.pack(side="right", padx=5)
+    barra_progresso = ttk.Progressbar(frame_status, length=200)
+    barra_progresso.pack(side="right", padx=5)
+
+    exibir_registros()
+
 def exibir_registros():
     """
-    Exibe todos os registros na Treeview.
+    Exibe todos os registros na Treeview, carregados sob demanda.
+    """
+    global filtro_atual
+    filtro_atual = FiltroProducao()
+    acompanhar_tarefa(paginador.carregar(filtro_atual), "Carregando registros...")
+
+def ler_filtros():
+    """
+    Lê os filtros da tela de registros.
+    Retorna o filtro atual se os critérios não mudaram (mantendo os ids do
+    último resultado), um novo FiltroProducao caso contrário, ou None se
+    alguma data for inválida.
     """
-    tree.delete(*tree.get_children())
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM producao")
-        for row in cursor.fetchall():
-            tree.insert("", tk.END, values=row[1:])
+    try:
+        filtro = FiltroProducao(
+            pa=entry_filtro_pa.get(),
+            colaborador=entry_filtro_colaborador.get(),
+            cliente=entry_filtro_cliente.get(),
+            produto=entry_filtro_produto.get(),
+            data=entry_filtro_data.get(),
+            data_inicio=entry_filtro_data_inicio.get(),
+            data_fim=entry_filtro_data_fim.get(),
+            observacoes=entry_filtro_observacoes.get(),
+        )
+    except ValueError:
+        messagebox.showwarning("Atenção", "Formato de data inválido! Use AAAA, MM-AAAA ou DD-MM-AAAA.")
+        return None
+    if filtro.mesmo_filtro(filtro_atual):
+        return filtro_atual
+    return filtro
 
 def filtrar_registros():
     """
     Filtra os registros com base nos critérios fornecidos.
     """
-    pa = entry_filtro_pa.get().upper()
-    colaborador = entry_filtro_colaborador.get().upper()
-    cliente = entry_filtro_cliente.get().upper()
-    produto = entry_filtro_produto.get().upper()
-    data_filtro = entry_filtro_data.get()
-    data_inicio = entry_filtro_data_inicio.get()
-    data_fim = entry_filtro_data_fim.get()
-
-    tree.delete(*tree.get_children())
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        query = "SELECT * FROM producao WHERE 1=1"
-        params = []
-
-        if pa:
-            query += " AND pa = ?"
-            params.append(pa)
-        if colaborador:
-            query += " AND colaborador LIKE ?"
-            params.append(f"%{colaborador}%")
-        if cliente:
-            query += " AND cliente LIKE ?"
-            params.append(f"%{cliente}%")
-        if produto:
-            query += " AND produto LIKE ?"
-            params.append(f"%{produto}%")
-        if data_filtro.strip():
-            if len(data_filtro) == 4:  # Filtro por ano (AAAA)
-                query += " AND strftime('%Y', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 7:  # Filtro por ano e mês (AAAA-MM)
-                query += " AND strftime('%Y-%m', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 10:  # Filtro por data completa (AAAA-MM-DD)
-                query += " AND data = ?"
-                params.append(data_filtro)
-        if data_inicio.strip() and data_fim.strip():
-            try:
-                # Converte as datas para o formato YYYY-MM-DD
-                data_inicio_formatada = datetime.strptime(data_inicio, "%d-%m-%Y").strftime("%Y-%m-%d")
-                data_fim_formatada = datetime.strptime(data_fim, "%d-%m-%Y").strftime("%Y-%m-%d")
-                query += " AND data BETWEEN ? AND ?"
-                params.extend([data_inicio_formatada, data_fim_formatada])
-            except ValueError:
-                messagebox.showwarning("Atenção", "Formato de data inválido! Use DD-MM-AAAA.")
-                return
+    global filtro_atual, tarefa_ids
+    filtro = ler_filtros()
+    if filtro is None:
+        return
 
-        cursor.execute(query, params)
-        for row in cursor.fetchall():
-            tree.insert("", tk.END, values=row[1:])
+    filtro_atual = filtro
+    acompanhar_tarefa(paginador.carregar(filtro), "Filtrando registros...")
+
+    # Guarda os ids do resultado em segundo plano, para o relatório e a exportação
+    if tarefa_ids is not None:
+        tarefa_ids.cancelar()
+        tarefa_ids = None
+    # No modo cliente os ids ficam no servidor; relatório e exportação são feitos lá
+    if filtro.ids is None and cliente_api is None:
+        versao = versao_dados
+
+        def guardar_ids(ids):
+            if versao == versao_dados:  # Descarta ids lidos antes de uma gravação
+                filtro.ids = ids
+
+        tarefa_ids = executor_bd.ler(lambda conn, tarefa: filtro.buscar_ids(conn), ao_concluir=guardar_ids)
+
+def agendar_filtro(event=None):
+    """
+    Agenda a filtragem após ATRASO_BUSCA_MS sem digitação, se a pesquisa ao
+    digitar estiver ativada. Cada tecla cancela o agendamento anterior.
+    """
+    global filtro_agendado
+    if not var_busca_digitacao.get():
+        return
+    if filtro_agendado is not None:
+        janela_registros.after_cancel(filtro_agendado)
+    filtro_agendado = janela_registros.after(ATRASO_BUSCA_MS, executar_filtro_agendado)
+
+def executar_filtro_agendado():
+    """
+    Executa a filtragem agendada pela pesquisa ao digitar.
+    """
+    global filtro_agendado
+    filtro_agendado = None
+    filtrar_registros()
 
 def limpar_filtros():
     """
@@ -365,99 +701,127 @@ def limpar_filtros():
     entry_filtro_data.delete(0, tk.END)
     entry_filtro_data_inicio.delete(0, tk.END)
     entry_filtro_data_fim.delete(0, tk.END)
+    entry_filtro_observacoes.delete(0, tk.END)
     exibir_registros()
 
 def gerar_relatorio_filtrado():
     """
-    Gera um relatório de valor captado por colaborador com base nos filtros.
-    """
-    pa = entry_filtro_pa.get().upper()
-    colaborador = entry_filtro_colaborador.get().upper()
-    cliente = entry_filtro_cliente.get().upper()
-    produto = entry_filtro_produto.get().upper()
-    data_filtro = entry_filtro_data.get()
-    data_inicio = entry_filtro_data_inicio.get()
-    data_fim = entry_filtro_data_fim.get()
-
-    relatorio = {}
-    with conectar_db() as conn:
-        cursor = conn.cursor()
-        query = "SELECT colaborador, valor FROM producao WHERE 1=1"
-        params = []
-
-        if pa:
-            query += " AND pa = ?"
-            params.append(pa)
-        if colaborador:
-            query += " AND colaborador LIKE ?"
-            params.append(f"%{colaborador}%")
-        if cliente:
-            query += " AND cliente LIKE ?"
-            params.append(f"%{cliente}%")
-        if produto:
-            query += " AND produto LIKE ?"
-            params.append(f"%{produto}%")
-        if data_filtro.strip():
-            if len(data_filtro) == 4:  # Filtro por ano (AAAA)
-                query += " AND strftime('%Y', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 7:  # Filtro por ano e mês (AAAA-MM)
-                query += " AND strftime('%Y-%m', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 10:  # Filtro por data completa (AAAA-MM-DD)
-                query += " AND data = ?"
-                params.append(data_filtro)
-        if data_inicio.strip() and data_fim.strip():
-            try:
-                # Converte as datas para o formato YYYY-MM-DD
-                data_inicio_formatada = datetime.strptime(data_inicio, "%d-%m-%Y").strftime("%Y-%m-%d")
-                data_fim_formatada = datetime.strptime(data_fim, "%d-%m-%Y").strftime("%Y-%m-%d")
-                query += " AND data BETWEEN ? AND ?"
-                params.extend([data_inicio_formatada, data_fim_formatada])
-            except ValueError:
-                messagebox.showwarning("Atenção", "Formato de data inválido! Use DD-MM-AAAA.")
-                return
+    Gera o relatório dos registros filtrados, agrupado conforme as opções de
+    agrupamento, período e ranking da tela de registros.
+    """
+    filtro = ler_filtros()
+    if filtro is None:
+        return
+    ranking = entry_ranking.get().strip()
+    if ranking and not ranking.isdigit():
+        messagebox.showwarning("Atenção", "Informe um número inteiro em \"Somente os N primeiros\".")
+        return
 
-        cursor.execute(query, params)
-        for row in cursor.fetchall():
-            colaborador_nome = row[0]
-            valor = float(row[1].replace("R$", "").replace(",", "").strip())
-            if colaborador_nome in relatorio:
-                relatorio[colaborador_nome] += valor
-            else:
-                relatorio[colaborador_nome] = valor
-
-    # Exibir relatório em uma nova janela
+    agrupamento = combo_agrupamento.get()
+    periodo = combo_periodo.get()
+    consulta = montar_relatorio(
+        filtro,
+        dimensoes=() if agrupamento == SEM_AGRUPAMENTO else (agrupamento,),
+        periodo=None if periodo == SEM_AGRUPAMENTO else periodo,
+        limite=int(ranking) if ranking else None,
+    )
+    tarefa = executor_bd.ler(gerar_relatorio_consulta, consulta, ao_concluir=lambda linhas: exibir_relatorio(consulta, linhas))
+    tarefa.ao_falhar = lambda erro: finalizar_tarefa(tarefa, erro=f"Ocorreu um erro ao gerar o relatório: {erro}")
+    acompanhar_tarefa(tarefa, "Gerando relatório...")
+
+def exibir_relatorio(consulta, linhas):
+    """
+    Exibe um relatório em uma nova janela, em uma Treeview.
+    As linhas são inseridas aos poucos, conforme a rolagem se aproxima do fim,
+    para que relatórios grandes abram imediatamente.
+    """
     janela_relatorio = tk.Toplevel()
     janela_relatorio.title("Relatório de Produção")
-    tk.Label(janela_relatorio, text="Relatório de Valor Captado por Colaborador", font=("Arial", 12)).pack(pady=10)
-    for colaborador, valor in relatorio.items():
-        tk.Label(janela_relatorio, text=f"{colaborador}: R$ {valor:.2f}").pack()
+    janela_relatorio.geometry("800x400")
+
+    frame_relatorio = tk.Frame(janela_relatorio)
+    frame_relatorio.pack(expand=True, fill="both", padx=10, pady=10)
+    tree_relatorio = ttk.Treeview(frame_relatorio, columns=consulta.colunas, show="headings")
+    for coluna in consulta.colunas:
+        tree_relatorio.heading(coluna, text=TITULOS_RELATORIO.get(coluna, coluna))
+    scrollbar_relatorio = ttk.Scrollbar(frame_relatorio, orient="vertical", command=tree_relatorio.yview)
+    scrollbar_relatorio.pack(side="right", fill="y")
+
+    posicoes_centavos = [i for i, coluna in enumerate(consulta.colunas) if coluna in COLUNAS_CENTAVOS]
+    inseridas = 0
+
+    def inserir_pagina():
+        nonlocal inseridas
+        pagina = linhas[inseridas:inseridas + TAMANHO_PAGINA]
+        with medir("interface: inserir página do relatório", linhas=len(pagina)):
+            for linha in pagina:
+                valores = ["" if valor is None else valor for valor in linha]
+                for i in posicoes_centavos:
+                    if linha[i] is not None:
+                        valores[i] = formatar_centavos(linha[i])
+                tree_relatorio.insert("", tk.END, values=valores)
+        inseridas = min(inseridas + TAMANHO_PAGINA, len(linhas))
+
+    def rolagem(primeiro, ultimo):
+        scrollbar_relatorio.set(primeiro, ultimo)
+        if float(ultimo) > 0.9 and inseridas < len(linhas):
+            tree_relatorio.after_idle(inserir_pagina)
+
+    tree_relatorio.configure(yscrollcommand=rolagem)
+    tree_relatorio.pack(expand=True, fill="both")
+    inserir_pagina()
+
+    btn_exportar_relatorio = tk.Button(janela_relatorio, text="Exportar Relatório", command=lambda: exportar_relatorio(consulta))
+    btn_exportar_relatorio.pack(pady=5)
+
+def exportar_relatorio(consulta):
+    """
+    Exporta um relatório para Excel, CSV ou Parquet, executando de novo a
+    mesma consulta usada na exibição.
+    """
+    caminho_arquivo = escolher_arquivo_exportacao()
+    if not caminho_arquivo:
+        return
+    if cliente_api is not None:
+        tarefa = executor_bd.ler(baixar_exportacao, caminho_arquivo, consulta=consulta)
+    else:
+        tarefa = executor_bd.ler(exportar_consulta, consulta.query, consulta.params, caminho_arquivo)
+    tarefa.ao_concluir = lambda caminho: finalizar_tarefa(tarefa, sucesso=f"Relatório exportado com sucesso para:\n{caminho}")
+    tarefa.ao_falhar = lambda erro: finalizar_tarefa(tarefa, erro=f"Ocorreu um erro ao exportar o relatório: {erro}")
+    acompanhar_tarefa(tarefa, "Exportando relatório...")
 
 def carregar_para_edicao(event):
     """
-    Carrega um registro selecionado na Treeview para edição.
+    Carrega um registro selecionado na Treeview para edição; a leitura é
+    feita em segundo plano e preencher_edicao completa o formulário.
     """
-    global registro_em_edicao
-
     selecionado = tree.focus()
     if not selecionado:
         return
 
-    valores = tree.item(selecionado, "values")
+    # O iid do item é o id do registro, então a busca é pela chave primária
+    id_registro = int(selecionado)
+    executor_bd.ler(
+        ler_registro, id_registro,
+        ao_concluir=lambda valores: preencher_edicao(id_registro, valores),
+        ao_falhar=lambda erro: messagebox.showerror("Erro", f"Ocorreu um erro ao carregar o registro: {erro}"),
+    )
+
+def preencher_edicao(id_registro, valores):
+    """
+    Preenche o formulário com os valores do registro lido para edição.
+    """
+    global registro_em_edicao
+
     if valores:
-        # Obtém o ID do registro selecionado
-        with conectar_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM producao WHERE pa=? AND colaborador=? AND data=? AND cpf_cnpj=? AND cliente=? AND produto=? AND status=? AND valor=? AND observacoes=?", valores)
-            registro_em_edicao = cursor.fetchone()[0]
+        registro_em_edicao = id_registro
 
         # Preenche os campos do formulário com os valores do registro selecionado
         combo_pa.set(valores[0])
         entry_colaborador.delete(0, tk.END)
         entry_colaborador.insert(0, valores[1])
         entry_data.delete(0, tk.END)
-        entry_data.insert(0, datetime.strptime(valores[2], "%d-%m-%Y").strftime("%d-%m-%Y"))
+        entry_data.insert(0, data_para_exibicao(valores[2]))
         entry_cpf_cnpj.delete(0, tk.END)
         entry_cpf_cnpj.insert(0, valores[3])
         entry_cliente.delete(0, tk.END)
@@ -466,163 +830,410 @@ def carregar_para_edicao(event):
         entry_produto.insert(0, valores[5])
         combo_status.set(valores[6])
         entry_valor.delete(0, tk.END)
-        entry_valor.insert(0, valores[7])
+        if valores[7] is not None:
+            entry_valor.insert(0, formatar_centavos(valores[7]))
         entry_observacoes.delete(0, tk.END)
-        entry_observacoes.insert(0, valores[8])
+        entry_observacoes.insert(0, valores[8] or "")
 
         # Exibe o botão "Salvar Edição"
         btn_salvar_edicao.pack(pady=5)
         # Fecha a janela de registros
-        janela_registros.destroy()
+        if tela_registros_aberta():
+            janela_registros.destroy()
+    else:
+        messagebox.showinfo("Atenção", "Registro não encontrado ou de um ano arquivado, que não pode ser editado.")
 
 def excluir_registro():
     """
-    Exclui um registro selecionado na Treeview.
+    Exclui os registros selecionados na Treeview.
+    Todos os registros selecionados são excluídos pela chave primária em uma
+    única transação.
     """
-    selecionado = tree.focus()
-    if not selecionado:
+    selecionados = tree.selection()
+    if not selecionados:
         return
-    confirmacao = messagebox.askyesno("Confirmação", "Tem certeza que deseja excluir este registro?")
+    if len(selecionados) == 1:
+        mensagem = "Tem certeza que deseja excluir este registro?"
+    else:
+        mensagem = f"Tem certeza que deseja excluir os {len(selecionados)} registros selecionados?"
+    confirmacao = messagebox.askyesno("Confirmação", mensagem)
     if confirmacao:
-        valores = tree.item(selecionado, "values")
-        with conectar_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM producao WHERE pa=? AND colaborador=? AND data=? AND cpf_cnpj=? AND cliente=? AND produto=? AND status=? AND valor=? AND observacoes=?", valores)
-            conn.commit()
-        exibir_registros()
+        executor_bd.escrever_em_grupo(
+            excluir_registros, [int(iid) for iid in selecionados],
+            ao_concluir=lambda resultado: registros_excluidos(selecionados),
+            ao_falhar=lambda erro: messagebox.showerror("Erro", f"Ocorreu um erro ao excluir os registros: {erro}"),
+        )
 
-def exportar_para_excel():
+def registros_excluidos(selecionados):
     """
-    Exporta os registros filtrados para um arquivo Excel.
+    Remove da Treeview os itens excluídos, mantendo as páginas já carregadas.
     """
-    try:
-        pa = entry_filtro_pa.get().upper()
-        colaborador = entry_filtro_colaborador.get().upper()
-        cliente = entry_filtro_cliente.get().upper()
-        produto = entry_filtro_produto.get().upper()
-        data_filtro = entry_filtro_data.get()
-        data_inicio = entry_filtro_data_inicio.get()
-        data_fim = entry_filtro_data_fim.get()
-
-        query = "SELECT * FROM producao WHERE 1=1"
-        params = []
-
-        if pa:
-            query += " AND pa = ?"
-            params.append(pa)
-        if colaborador:
-            query += " AND colaborador LIKE ?"
-            params.append(f"%{colaborador}%")
-        if cliente:
-            query += " AND cliente LIKE ?"
-            params.append(f"%{cliente}%")
-        if produto:
-            query += " AND produto LIKE ?"
-            params.append(f"%{produto}%")
-        if data_filtro.strip():
-            if len(data_filtro) == 4:  # Filtro por ano (AAAA)
-                query += " AND strftime('%Y', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 7:  # Filtro por ano e mês (AAAA-MM)
-                query += " AND strftime('%Y-%m', data) = ?"
-                params.append(data_filtro)
-            elif len(data_filtro) == 10:  # Filtro por data completa (AAAA-MM-DD)
-                query += " AND data = ?"
-                params.append(data_filtro)
-        if data_inicio.strip() and data_fim.strip():
-            try:
-                # Converte as datas para o formato YYYY-MM-DD
-                data_inicio_formatada = datetime.strptime(data_inicio, "%d-%m-%Y").strftime("%Y-%m-%d")
-                data_fim_formatada = datetime.strptime(data_fim, "%d-%m-%Y").strftime("%Y-%m-%d")
-                query += " AND data BETWEEN ? AND ?"
-                params.extend([data_inicio_formatada, data_fim_formatada])
-            except ValueError:
-                messagebox.showwarning("Atenção", "Formato de data inválido! Use DD-MM-AAAA.")
-                return
-
-        with conectar_db() as conn:
-            df = pd.read_sql_query(query, conn, params=params)
-            df.columns = [coluna.upper() for coluna in df.columns]
-            caminho_arquivo = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Arquivos Excel", "*.xlsx"), ("Todos os arquivos", "*.*")],
-                title="Salvar como"
-            )
-            if caminho_arquivo:
-                df.to_excel(caminho_arquivo, index=False)
-                messagebox.showinfo("Sucesso", f"Dados exportados com sucesso para:\n{caminho_arquivo}")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Ocorreu um erro ao exportar os dados: {e}")
-
-def fazer_backup():
-    """
-    Cria um backup do banco de dados.
-    """
-    try:
-        data_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
-        shutil.copy(ARQUIVO_DB, f"backup_{data_hora}.db")
-        messagebox.showinfo("Backup", f"Backup realizado com sucesso: backup_{data_hora}.db")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao criar backup: {e}")
+    invalidar_resultado_filtro()
+    if tela_registros_aberta():
+        tree.delete(*[iid for iid in selecionados if tree.exists(iid)])
 
-# Criando a janela principal
-janela = tk.Tk()
-janela.title("Controle de Produção")
-janela.geometry("350x500")
+def exportar_para_excel():
+    """
+    Exporta os registros filtrados para um arquivo Excel, CSV ou Parquet.
+    """
+    filtro = ler_filtros()
+    if filtro is None:
+        return
+    query, params = filtro.consulta(COLUNAS_EXPORTACAO)
 
-# Criando os widgets
-tk.Label(janela, text="PA:").pack()
-combo_pa = ttk.Combobox(janela, values=carregar_pas())
-combo_pa.pack()
+    caminho_arquivo = escolher_arquivo_exportacao()
+    if not caminho_arquivo:
+        return
 
-tk.Label(janela, text="Nome do Colaborador:").pack()
-entry_colaborador = tk.Entry(janela)
-entry_colaborador.pack()
+    # Com os ids do último filtro guardados, o total é conhecido e o progresso é exato
+    total_esperado = len(filtro.ids) if filtro.ids is not None else None
+    if cliente_api is not None:
+        tarefa = executor_bd.ler(baixar_exportacao, caminho_arquivo, filtro=filtro)
+    else:
+        tarefa = executor_bd.ler(exportar_consulta, query, params, caminho_arquivo, total_esperado)
+    tarefa.ao_concluir = lambda caminho: finalizar_tarefa(tarefa, sucesso=f"Dados exportados com sucesso para:\n{caminho}")
+    tarefa.ao_falhar = lambda erro: finalizar_tarefa(tarefa, erro=f"Ocorreu um erro ao exportar os dados: {erro}")
+    acompanhar_tarefa(tarefa, "Exportando registros...")
+
+def escolher_arquivo_exportacao():
+    """
+    Pergunta onde salvar uma exportação.
+    Retorna o caminho escolhido, ou uma string vazia se o usuário cancelar.
+    """
+    return filedialog.asksaveasfilename(
+        defaultextension=".xlsx",
+        filetypes=[("Arquivos Excel", "*.xlsx"), ("Arquivos CSV", "*.csv"), ("Arquivos Parquet", "*.parquet"), ("Todos os arquivos", "*.*")],
+        title="Salvar como"
+    )
 
-tk.Label(janela, text="CPF/CNPJ do Cliente:").pack()
-entry_cpf_cnpj = tk.Entry(janela)
-entry_cpf_cnpj.pack()
+def importar_planilha():
+    """
+    Importa registros de uma planilha Excel ou arquivo CSV em segundo plano.
+    A importação roda na thread escritora, em uma única transação; as linhas
+    inválidas são gravadas em um relatório ao lado do arquivo.
+    """
+    caminho_arquivo = filedialog.askopenfilename(
+        filetypes=[("Planilhas e CSV", "*.xlsx *.csv"), ("Arquivos Excel", "*.xlsx"), ("Arquivos CSV", "*.csv"), ("Todos os arquivos", "*.*")],
+        title="Importar registros"
+    )
+    if not caminho_arquivo:
+        return
 
-tk.Label(janela, text="Nome do Cliente:").pack()
-entry_cliente = tk.Entry(janela)
-entry_cliente.pack()
+    def executar(conn, tarefa):
+        def ao_lote(resultado):
+            tarefa.verificar_cancelamento()
+            tarefa.informar_progresso(resultado.lidas)
+        return importar_arquivo(conn, caminho_arquivo, ao_lote=ao_lote)
+
+    def progresso(lidas, total):
+        btn_importar.config(text=f"Importando ({lidas} linhas)")
+
+    def finalizar():
+        btn_importar.config(state="normal", text="Importar Planilha")
+
+    def concluido(resultado):
+        finalizar()
+        invalidar_resultado_filtro()
+        atualizar_listas_selecao()
+        carregar_cache_clientes()  # A planilha pode trazer clientes novos
+        mensagem = f"Registros importados: {resultado.importadas}\nLinhas rejeitadas: {resultado.rejeitadas}"
+        if resultado.atualizadas or resultado.ignoradas:
+            mensagem += f"\nRegistros já existentes atualizados: {resultado.atualizadas}\nLinhas repetidas ignoradas: {resultado.ignoradas}"
+        if resultado.caminho_rejeitados:
+            mensagem += f"\n\nAs linhas rejeitadas e os motivos estão em:\n{resultado.caminho_rejeitados}"
+        messagebox.showinfo("Importação", mensagem)
+
+    def falhou(erro):
+        finalizar()
+        messagebox.showerror("Erro", f"Falha ao importar o arquivo: {erro}")
+
+    btn_importar.config(state="disabled")
+    executor_bd.escrever(executar, ao_concluir=concluido, ao_falhar=falhou, ao_progredir=progresso, ao_cancelar=finalizar)
+
+def abrir_diagnostico():
+    """
+    Exibe as últimas medições de tempo das consultas e da interface.
+    """
+    janela_diagnostico = tk.Toplevel()
+    janela_diagnostico.title("Diagnóstico")
+    janela_diagnostico.geometry("800x400")
+
+    frame_diagnostico = tk.Frame(janela_diagnostico)
+    frame_diagnostico.pack(expand=True, fill="both", padx=10, pady=10)
+    texto_diagnostico = tk.Text(frame_diagnostico, wrap="none")
+    scrollbar_diagnostico = ttk.Scrollbar(frame_diagnostico, orient="vertical", command=texto_diagnostico.yview)
+    scrollbar_diagnostico.pack(side="right", fill="y")
+    texto_diagnostico.configure(yscrollcommand=scrollbar_diagnostico.set)
+    texto_diagnostico.pack(expand=True, fill="both")
+
+    def atualizar():
+        texto_diagnostico.config(state="normal")
+        texto_diagnostico.delete("1.0", tk.END)
+        texto_diagnostico.insert(tk.END, "\n".join(instrumentacao.ultimas_medicoes))
+        texto_diagnostico.config(state="disabled")
+        texto_diagnostico.see(tk.END)
+
+    frame_botoes = tk.Frame(janela_diagnostico)
+    frame_botoes.pack(pady=5)
+    tk.Button(frame_botoes, text="Atualizar", command=atualizar).pack(side="left", padx=5)
+    tk.Button(frame_botoes, text="Limpar", command=lambda: (instrumentacao.ultimas_medicoes.clear(), atualizar())).pack(side="left", padx=5)
+    tk.Label(janela_diagnostico, text=f"Log: {instrumentacao.ARQUIVO_LOG}", anchor="w").pack(fill="x", padx=10)
+    atualizar()
+
+# Acompanhamento das tarefas em segundo plano
+def tela_registros_aberta():
+    """
+    Retorna True se a tela de registros estiver aberta.
+    """
+    try:
+        return bool(janela_registros.winfo_exists())
+    except NameError:
+        return False
 
-tk.Label(janela, text="Produto Adquirido:").pack()
-entry_produto = tk.Entry(janela)
-entry_produto.pack()
+def acompanhar_tarefa(tarefa, mensagem):
+    """
+    Exibe o andamento de uma tarefa na tela de registros e habilita o cancelamento.
+    """
+    global tarefa_em_andamento
+    if tarefa is None:
+        return
+    tarefa_em_andamento = tarefa
+
+    # Encadeia a finalização aos callbacks já definidos pela tarefa
+    ao_concluir, ao_cancelar = tarefa.ao_concluir, tarefa.ao_cancelar
+    inicio = perf_counter()
+
+    def concluir(resultado):
+        if ao_concluir is not None:
+            ao_concluir(resultado)
+        # Do clique até o resultado exibido, incluindo a espera na fila do executor
+        registrar("tarefa: " + mensagem, (perf_counter() - inicio) * 1000)
+        finalizar_tarefa(tarefa)
+
+    def cancelar():
+        if ao_cancelar is not None:
+            ao_cancelar()
+        finalizar_tarefa(tarefa, mensagem="Operação cancelada.")
+
+    tarefa.ao_concluir, tarefa.ao_cancelar = concluir, cancelar
+    tarefa.ao_progredir = atualizar_progresso
+    if tarefa.ao_falhar is None:
+        tarefa.ao_falhar = lambda erro: finalizar_tarefa(tarefa, erro=str(erro))
+
+    if tela_registros_aberta():
+        label_status.config(text=mensagem)
+        barra_progresso.config(mode="indeterminate")
+        barra_progresso.start(10)
+        btn_cancelar.config(state="normal")
+
+def atualizar_progresso(feito, total=None):
+    """
+    Atualiza a barra de progresso com o andamento informado pela tarefa.
+    """
+    if not tela_registros_aberta():
+        return
+    if total:
+        barra_progresso.stop()
+        barra_progresso.config(mode="determinate", maximum=total, value=feito)
+    label_status.config(text=f"Processados {feito} de {total} registros..." if total else f"Processados {feito} registros...")
 
-tk.Label(janela, text="Data (DD-MM-AAAA):").pack()
-entry_data = tk.Entry(janela)
-entry_data.pack()
+def finalizar_tarefa(tarefa, mensagem="", sucesso=None, erro=None):
+    """
+    Encerra o acompanhamento de uma tarefa e exibe o resultado, se houver.
+    """
+    global tarefa_em_andamento
+    if tarefa is None or tarefa is not tarefa_em_andamento:
+        return
+    tarefa_em_andamento = None
+    if tela_registros_aberta():
+        barra_progresso.stop()
+        barra_progresso.config(mode="determinate", value=0)
+        label_status.config(text=mensagem)
+        btn_cancelar.config(state="disabled")
+    if sucesso:
+        messagebox.showinfo("Sucesso", sucesso)
+    if erro:
+        messagebox.showerror("Erro", erro)
+
+def cancelar_tarefa():
+    """
+    Cancela a tarefa em andamento na tela de registros.
+    """
+    if tarefa_ids is not None:
+        tarefa_ids.cancelar()
+    if tarefa_em_andamento is not None:
+        tarefa_em_andamento.cancelar()
 
-tk.Label(janela, text="Status:").pack()
-combo_status = ttk.Combobox(janela, values=["EM ANDAMENTO", "CONCLUÍDO", "CANCELADO"])
-combo_status.pack()
+def executar_backup(conn, tarefa, diferencial):
+    """
+    Cria um backup (completo ou diferencial) e aplica a política de retenção.
+    """
+    def ao_progredir(copiadas, total):
+        tarefa.verificar_cancelamento()
+        tarefa.informar_progresso(copiadas, total)
+
+    if diferencial:
+        caminho = criar_backup_diferencial(conn, ao_progredir=ao_progredir)
+    else:
+        caminho = criar_backup(conn, comprimir=COMPRIMIR_BACKUPS, ao_progredir=ao_progredir)
+    podar_backups(manter=MANTER_BACKUPS)
+    return caminho
+
+def fazer_backup(diferencial=False):
+    """
+    Cria um backup do banco de dados em segundo plano.
+    A cópia é feita pela API de backup do SQLite, em passos, sem bloquear o
+    uso da aplicação.
+    """
+    btn_backup.config(state="disabled")
+    btn_backup_diferencial.config(state="disabled")
 
-tk.Label(janela, text="Valor Captado (R$):").pack()
-entry_valor = tk.Entry(janela)
-entry_valor.pack()
+    def progresso(copiadas, total):
+        botao = btn_backup_diferencial if diferencial else btn_backup
+        botao.config(text=f"Backup em andamento ({copiadas * 100 // max(total, 1)}%)")
 
-tk.Label(janela, text="Observações:").pack()
-entry_observacoes = tk.Entry(janela)
-entry_observacoes.pack()
+    def finalizar():
+        btn_backup.config(state="normal", text="Fazer Backup")
+        btn_backup_diferencial.config(state="normal", text="Backup Diferencial")
 
-# Botões
-btn_registrar = tk.Button(janela, text="Registrar Produção", command=registrar_producao)
-btn_registrar.pack(pady=5)
+    def concluido(caminho):
+        finalizar()
+        messagebox.showinfo("Backup", f"Backup realizado com sucesso: {caminho}")
 
-btn_ver_registros = tk.Button(janela, text="Exibir Registros", command=abrir_tela_registros)
-btn_ver_registros.pack(pady=5)
+    def falhou(erro):
+        finalizar()
+        messagebox.showerror("Erro", f"Falha ao criar backup: {erro}")
 
-btn_salvar_edicao = tk.Button(janela, text="Salvar Edição", command=registrar_producao)
-btn_salvar_edicao.pack_forget()
+    executor_bd.ler(executar_backup, diferencial, ao_concluir=concluido, ao_falhar=falhou, ao_progredir=progresso, ao_cancelar=finalizar)
 
-btn_backup = tk.Button(janela, text="Fazer Backup", command=fazer_backup)
-btn_backup.pack(pady=5)
+def verificar_resultados():
+    """
+    Entrega à interface os resultados das tarefas em segundo plano.
+    """
+    janela.after(INTERVALO_RESULTADOS_MS, verificar_resultados)
+    executor_bd.processar_resultados()
 
-# Criar as tabelas no banco de dados (se não existirem)
-criar_tabela_pas()
-criar_tabela_producao()
+def fechar_aplicacao():
+    """
+    Cancela as tarefas em andamento, fecha as conexões com o banco de dados e
+    encerra a aplicação.
+    """
+    cancelar_tarefa()
+    executor_bd.encerrar()
+    if gerenciador_conexoes is not None:
+        gerenciador_conexoes.fechar_todas()
+    janela.destroy()
 
-# Iniciar a interface gráfica
-janela.mainloop()
\ No newline at end of file
+def main():
+    """
+    Prepara o banco de dados, cria a janela principal e inicia a interface gráfica.
+    """
+    global gerenciador_conexoes, executor_bd, cliente_api, janela, combo_pa, entry_colaborador, entry_cpf_cnpj, entry_cliente, entry_produto, entry_data, combo_status, entry_valor, entry_observacoes, btn_registrar, btn_importar, btn_salvar_edicao, btn_backup, btn_backup_diferencial
+
+    valores_pendentes = datas_pendentes = 0
+    if SERVIDOR_API:
+        # Modo cliente: os dados ficam no servidor, acessado pela API
+        cliente_api = ClienteProducao(SERVIDOR_API)
+        executor_bd = ExecutorBD(None)
+    else:
+        gerenciador_conexoes = GerenciadorConexoes(ARQUIVO_DB)
+        executor_bd = ExecutorBD(gerenciador_conexoes)
+
+        # Criar as tabelas no banco de dados (se não existirem)
+        preparar_banco(conectar_db())
+        valores_pendentes = contar_valores_nao_convertidos(conectar_db())
+        datas_pendentes = contar_datas_nao_convertidas(conectar_db())
+    carregar_listas_selecao()
+
+    # Criando a janela principal
+    janela = tk.Tk()
+    janela.title("Controle de Produção")
+    janela.geometry("350x580")
+
+    # Criando os widgets
+    tk.Label(janela, text="PA:").pack()
+    combo_pa = ttk.Combobox(janela, values=listas_selecao["pa"])
+    combo_pa.pack()
+
+    tk.Label(janela, text="Nome do Colaborador:").pack()
+    entry_colaborador = ttk.Combobox(janela)
+    entry_colaborador.bind("<KeyRelease>", lambda event: autocompletar(event, "colaborador"))
+    entry_colaborador.pack()
+
+    tk.Label(janela, text="CPF/CNPJ do Cliente:").pack()
+    entry_cpf_cnpj = tk.Entry(janela)
+    entry_cpf_cnpj.bind("<KeyRelease>", preencher_cliente)
+    entry_cpf_cnpj.bind("<FocusOut>", preencher_cliente)
+    entry_cpf_cnpj.pack()
+
+    tk.Label(janela, text="Nome do Cliente:").pack()
+    entry_cliente = tk.Entry(janela)
+    entry_cliente.pack()
+
+    tk.Label(janela, text="Produto Adquirido:").pack()
+    entry_produto = ttk.Combobox(janela)
+    entry_produto.bind("<KeyRelease>", lambda event: autocompletar(event, "produto"))
+    entry_produto.pack()
+
+    tk.Label(janela, text="Data (DD-MM-AAAA):").pack()
+    entry_data = tk.Entry(janela)
+    entry_data.pack()
+
+    tk.Label(janela, text="Status:").pack()
+    combo_status = ttk.Combobox(janela, values=listas_selecao["status"])
+    combo_status.pack()
+
+    tk.Label(janela, text="Valor Captado (R$):").pack()
+    entry_valor = tk.Entry(janela)
+    entry_valor.pack()
+
+    tk.Label(janela, text="Observações:").pack()
+    entry_observacoes = tk.Entry(janela)
+    entry_observacoes.pack()
+
+    # Botões
+    btn_registrar = tk.Button(janela, text="Registrar Produção", command=registrar_producao)
+    btn_registrar.pack(pady=5)
+
+    btn_ver_registros = tk.Button(janela, text="Exibir Registros", command=abrir_tela_registros)
+    btn_ver_registros.pack(pady=5)
+
+    btn_importar = tk.Button(janela, text="Importar Planilha", command=importar_planilha)
+    btn_importar.pack(pady=5)
+
+    btn_salvar_edicao = tk.Button(janela, text="Salvar Edição", command=registrar_producao)
+    btn_salvar_edicao.pack_forget()
+
+    btn_backup = tk.Button(janela, text="Fazer Backup", command=fazer_backup)
+    btn_backup.pack(pady=5)
+
+    btn_backup_diferencial = tk.Button(janela, text="Backup Diferencial", command=lambda: fazer_backup(diferencial=True))
+    btn_backup_diferencial.pack(pady=5)
+
+    if cliente_api is not None:
+        # Importação e backup trabalham com o arquivo do banco, que fica no servidor
+        for botao in (btn_importar, btn_backup, btn_backup_diferencial):
+            botao.config(state="disabled")
+        janela.title(f"Controle de Produção - {SERVIDOR_API}")
+
+    janela.protocol("WM_DELETE_WINDOW", fechar_aplicacao)
+    verificar_resultados()
+    carregar_cache_clientes()
+    if valores_pendentes:
+        messagebox.showwarning(
+            "Valores não convertidos",
+            f"{valores_pendentes} registros estão sem valor, pois o texto original não pôde ser convertido. "
+            "Os textos originais estão na tabela valores_nao_convertidos; edite esses registros para informar o valor.",
+        )
+    if datas_pendentes:
+        messagebox.showwarning(
+            "Datas não convertidas",
+            f"{datas_pendentes} registros estão com a data em um formato que não pôde ser lido e não aparecem nos filtros por data. "
+            "As datas originais estão na tabela datas_nao_convertidas; edite esses registros para corrigir a data.",
+        )
+
+    # Iniciar a interface gráfica
+    janela.mainloop()
+
+if __name__ == "__main__":
+    main()
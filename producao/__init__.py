@@ -0,0 +1,11 @@
+"""
+Núcleo do controle de produção: banco de dados, validação, filtros, relatórios,
+exportação e backups, sem dependência da interface gráfica.
+
+Os módulos importam apenas a biblioteca padrão; openpyxl e pyarrow só são
+carregados na exportação para o formato correspondente.
+"""
+from .conexao import ARQUIVO_DB, GerenciadorConexoes
+from .esquema import preparar_banco
+from .filtros import FiltroProducao
+from .validacao import RegistroInvalido, normalizar_registro
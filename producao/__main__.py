@@ -0,0 +1,251 @@
+"""
+Linha de comando do controle de produção, para tarefas sem interface gráfica.
+
+Uso: python -m producao [--banco ARQUIVO] COMANDO ...
+"""
+import argparse
+import csv
+import sys
+
+from .conexao import ARQUIVO_DB, GerenciadorConexoes
+from .esquema import contar_datas_nao_convertidas, contar_valores_nao_convertidos, preparar_banco
+
+
+def comando_importar(conn, args):
+    """
+    Importa um arquivo CSV ou Excel para a tabela de produção.
+    """
+    from .importacao import importar_arquivo
+
+    def ao_lote(resultado):
+        print(f"\r{resultado.lidas} linhas lidas...", end="", file=sys.stderr, flush=True)
+
+    resultado = importar_arquivo(conn, args.arquivo, args.rejeitados, args.codificacao, ao_lote=ao_lote)
+    print(file=sys.stderr)
+    print(f"Importadas: {resultado.importadas}")
+    print(f"Atualizadas: {resultado.atualizadas}")
+    print(f"Ignoradas (repetidas): {resultado.ignoradas}")
+    print(f"Rejeitadas: {resultado.rejeitadas}")
+    if resultado.caminho_rejeitados:
+        print(f"Relatório de rejeitadas: {resultado.caminho_rejeitados}")
+    return 0
+
+
+def comando_auditar(conn, args):
+    """
+    Lista os registros com CPF/CNPJ inválido.
+    """
+    from .auditoria import COLUNAS_AUDITORIA, auditar_documentos
+
+    saida = open(args.saida, "w", newline="", encoding="utf-8-sig") if args.saida else sys.stdout
+    try:
+        escritor = csv.writer(saida, delimiter=";")
+        escritor.writerow(COLUNAS_AUDITORIA)
+        invalidos = 0
+        for linha in auditar_documentos(conn):
+            escritor.writerow(linha)
+            invalidos += 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"Registros com CPF/CNPJ inválido: {invalidos}", file=sys.stderr)
+    return 0
+
+
+def comando_deduplicar(conn, args):
+    """
+    Lista os registros repetidos (mesmo cliente, produto e data) e, com
+    --excluir, os exclui, mantendo o mais antigo de cada um.
+    """
+    from .duplicidade import COLUNAS_DUPLICADOS, encontrar_duplicados, excluir_duplicados
+    from .esquema import indice_unico_ativo
+
+    saida = open(args.saida, "w", newline="", encoding="utf-8-sig") if args.saida else sys.stdout
+    try:
+        escritor = csv.writer(saida, delimiter=";")
+        escritor.writerow(COLUNAS_DUPLICADOS)
+        repetidos = 0
+        for linha in encontrar_duplicados(conn):
+            escritor.writerow(linha)
+            repetidos += 1
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"Registros repetidos: {repetidos}", file=sys.stderr)
+    if args.excluir:
+        def ao_lote(excluidos, total):
+            print(f"\r{excluidos} de {total} registros excluídos...", end="", file=sys.stderr, flush=True)
+
+        excluidos = excluir_duplicados(conn, ao_lote=ao_lote)
+        if excluidos:
+            print(file=sys.stderr)
+        print(f"Registros repetidos excluídos: {excluidos}", file=sys.stderr)
+    if not indice_unico_ativo(conn):
+        print("Enquanto houver registros repetidos, a importação não atualiza os registros existentes.", file=sys.stderr)
+    return 0
+
+
+def comando_reconstruir_resumo(conn, args):
+    """
+    Recalcula os resumos diário e mensal a partir dos registros.
+    """
+    from .esquema import reconstruir_resumo
+    from .particoes import fonte_registros
+
+    # O resumo também conta os anos arquivados
+    reconstruir_resumo(conn, fonte_registros())
+    grupos = conn.execute("SELECT COUNT(*) FROM producao_resumo_diario").fetchone()[0]
+    mensais = conn.execute("SELECT COUNT(*) FROM producao_resumo_mensal").fetchone()[0]
+    print(f"Resumos reconstruídos: {grupos} grupos diários e {mensais} mensais.")
+    return 0
+
+
+def comando_arquivar(conn, args):
+    """
+    Move os registros de um ano encerrado para o arquivo do ano.
+    """
+    from .particoes import arquivar_ano, caminho_particao
+
+    def ao_progredir(meses, total):
+        print(f"\r{meses} de {total} meses arquivados...", end="", file=sys.stderr, flush=True)
+
+    movidos = arquivar_ano(conn, args.banco, args.ano, ao_progredir)
+    print(file=sys.stderr)
+    print(f"Registros arquivados em {caminho_particao(args.banco, args.ano)}: {movidos}")
+    if args.compactar:
+        print("Compactando o banco principal...", file=sys.stderr)
+        conn.execute("VACUUM main")
+    return 0
+
+
+def comando_alteracoes(conn, args):
+    """
+    Exporta as alterações de registros posteriores à sequência --desde.
+    """
+    from .alteracoes import exportar_alteracoes
+
+    def ao_lote(total):
+        print(f"\r{total} alterações exportadas...", end="", file=sys.stderr, flush=True)
+
+    exportadas, ultima = exportar_alteracoes(conn, args.arquivo, args.desde, ao_lote=ao_lote)
+    if exportadas:
+        print(file=sys.stderr)
+    print(f"Alterações exportadas: {exportadas}")
+    print(f"Última sequência (use em --desde na próxima exportação): {ultima}")
+    return 0
+
+
+def comando_servir(conn, args):
+    """
+    Executa o servidor HTTP/JSON até ser interrompido (Ctrl+C).
+    """
+    import asyncio
+
+    from .servidor import servir
+
+    def ao_iniciar(enderecos):
+        for endereco in enderecos:
+            print(f"Servindo em http://{endereco[0]}:{endereco[1]}/", file=sys.stderr)
+
+    try:
+        asyncio.run(servir(args.banco, args.endereco, args.porta, args.leitores, ao_iniciar))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def avisar_dados_nao_convertidos(conn):
+    """
+    Avisa, se houver, dos registros sem valor ou com a data no formato
+    antigo porque o texto original não pôde ser convertido.
+    """
+    pendentes = contar_valores_nao_convertidos(conn)
+    if pendentes:
+        print(
+            f"Aviso: {pendentes} registros estão sem valor, pois o texto original não pôde ser convertido; "
+            "os textos originais estão na tabela valores_nao_convertidos.",
+            file=sys.stderr,
+        )
+    pendentes = contar_datas_nao_convertidas(conn)
+    if pendentes:
+        print(
+            f"Aviso: {pendentes} registros estão com a data fora do formato AAAA-MM-DD, pois ela não pôde ser lida; "
+            "as datas originais estão na tabela datas_nao_convertidas.",
+            file=sys.stderr,
+        )
+
+
+def criar_parser():
+    """
+    Monta o parser dos argumentos da linha de comando.
+    """
+    parser = argparse.ArgumentParser(prog="python -m producao", description="Controle de produção sem interface gráfica.")
+    parser.add_argument("--banco", default=ARQUIVO_DB, help=f"arquivo do banco de dados (padrão: {ARQUIVO_DB})")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = comandos.add_parser("importar", help="importa registros de um arquivo CSV ou Excel (.xlsx)")
+    importar.add_argument("arquivo")
+    importar.add_argument("--rejeitados", help="relatório das linhas rejeitadas (padrão: ARQUIVO.rejeitados.csv)")
+    importar.add_argument("--codificacao", default="utf-8-sig", help="codificação do CSV (padrão: utf-8-sig)")
+    importar.set_defaults(executar=comando_importar)
+
+    auditar = comandos.add_parser("auditar", help="lista os registros com CPF/CNPJ inválido")
+    auditar.add_argument("--saida", help="grava a lista em um arquivo CSV em vez de exibi-la")
+    auditar.set_defaults(executar=comando_auditar)
+
+    deduplicar = comandos.add_parser("deduplicar", help="lista os registros repetidos (mesmo cliente, produto e data)")
+    deduplicar.add_argument("--saida", help="grava a lista em um arquivo CSV em vez de exibi-la")
+    deduplicar.add_argument("--excluir", action="store_true", help="exclui os repetidos, mantendo o registro mais antigo")
+    deduplicar.set_defaults(executar=comando_deduplicar)
+
+    reconstruir = comandos.add_parser("reconstruir-resumo", help="recalcula os resumos diário e mensal a partir dos registros")
+    reconstruir.set_defaults(executar=comando_reconstruir_resumo)
+
+    arquivar = comandos.add_parser("arquivar", help="move os registros de um ano encerrado para um banco à parte (BANCO_AAAA.db)")
+    arquivar.add_argument("ano", type=int)
+    arquivar.add_argument("--compactar", action="store_true", help="executa VACUUM no banco principal ao final")
+    arquivar.set_defaults(executar=comando_arquivar)
+
+    alteracoes = comandos.add_parser("alteracoes", help="exporta as alterações de registros para um arquivo CSV, Excel (.xlsx) ou Parquet")
+    alteracoes.add_argument("arquivo")
+    alteracoes.add_argument("--desde", type=int, default=0, help="exporta só as alterações após esta sequência (padrão: todas)")
+    alteracoes.set_defaults(executar=comando_alteracoes)
+
+    from .servidor import ENDERECO_PADRAO, LEITORES_SERVIDOR, PORTA_PADRAO
+
+    servir = comandos.add_parser(
+        "servir", help="atende a API HTTP/JSON para vários usuários",
+        description="Atende a API HTTP/JSON. A API não tem usuários: fora do próprio computador, "
+        "defina PRODUCAO_TOKEN com um segredo no servidor e nos clientes, que o enviam no cabeçalho Authorization.",
+    )
+    servir.add_argument(
+        "--endereco", default=ENDERECO_PADRAO,
+        help=f"endereço de escuta (padrão: {ENDERECO_PADRAO}); outro que não o do próprio computador exige PRODUCAO_TOKEN",
+    )
+    servir.add_argument("--porta", type=int, default=PORTA_PADRAO, help=f"porta de escuta (padrão: {PORTA_PADRAO})")
+    servir.add_argument("--leitores", type=int, default=LEITORES_SERVIDOR, help=f"threads de leitura do banco (padrão: {LEITORES_SERVIDOR})")
+    servir.set_defaults(executar=comando_servir)
+    return parser
+
+
+def main(argv=None):
+    """
+    Executa o comando informado na linha de comando.
+    Retorna o código de saída do processo.
+    """
+    args = criar_parser().parse_args(argv)
+    gerenciador = GerenciadorConexoes(args.banco)
+    try:
+        conn = gerenciador.obter()
+        preparar_banco(conn)
+        avisar_dados_nao_convertidos(conn)
+        return args.executar(conn, args)
+    except (OSError, ValueError) as erro:
+        print(f"Erro: {erro}", file=sys.stderr)
+        return 1
+    finally:
+        gerenciador.fechar_todas()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
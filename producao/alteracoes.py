@@ -0,0 +1,79 @@
+"""
+Leitura incremental do histórico de alterações (producao_alteracoes).
+
+Cada inclusão, alteração e exclusão de registro recebe um número de
+sequência (seq) crescente, que nunca é reaproveitado. Quem sincroniza guarda
+a última sequência lida e, na vez seguinte, pede só as alterações depois
+dela, em vez de exportar a tabela inteira. Para a primeira carga, leia
+ultima_sequencia antes da exportação completa e continue a partir dela: as
+alterações repetidas pela sobreposição se aplicam de novo sem efeito, pois
+trazem os valores completos do registro.
+
+Registros movidos para os anos arquivados não aparecem como exclusões.
+
+Uso: python -m producao [--banco ARQUIVO] alteracoes ARQUIVO [--desde SEQ]
+"""
+import json
+
+from .esquema import COLUNAS_HISTORICO
+from .exportacao import exportar_cursor
+
+LIMITE_ALTERACOES = 1000
+COLUNAS_ALTERACOES = ("seq", "registro_id", "operacao", "momento", "antes", "depois")
+
+
+def ultima_sequencia(conn):
+    """
+    Retorna a sequência da última alteração registrada (0 se não houver).
+    """
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM producao_alteracoes").fetchone()[0]
+
+
+def buscar_alteracoes(conn, desde=0, limite=LIMITE_ALTERACOES):
+    """
+    Busca até limite alterações com sequência maior que desde, em ordem.
+    Cada alteração é um dicionário (COLUNAS_ALTERACOES) com os valores
+    antes e depois como dicionários (None na inclusão e na exclusão).
+    Retorna uma tupla (alterações, há mais alterações depois delas).
+    """
+    cursor = conn.execute(
+        f"SELECT {', '.join(COLUNAS_ALTERACOES)} FROM producao_alteracoes WHERE seq > ? ORDER BY seq LIMIT ?",
+        (desde, limite + 1),
+    )
+    alteracoes = []
+    for row in cursor.fetchmany(limite):
+        alteracao = dict(zip(COLUNAS_ALTERACOES, row))
+        for coluna in ("antes", "depois"):
+            if alteracao[coluna] is not None:
+                alteracao[coluna] = json.loads(alteracao[coluna])
+        alteracoes.append(alteracao)
+    return alteracoes, cursor.fetchone() is not None
+
+
+def consulta_exportacao_alteracoes(desde, ate):
+    """
+    Monta a consulta das alterações com sequência em (desde, ate], uma por
+    linha, com os valores gravados em colunas (os de antes, nas exclusões),
+    como na exportação dos registros.
+    Retorna uma tupla (query, params).
+    """
+    colunas = [f"json_extract(COALESCE(depois, antes), '$.{coluna}') AS {coluna}" for coluna in COLUNAS_HISTORICO]
+    query = f'''
+        SELECT seq, registro_id, operacao, momento, {', '.join(colunas)}
+        FROM producao_alteracoes WHERE seq > ? AND seq <= ? ORDER BY seq
+    '''
+    return query, (desde, ate)
+
+
+def exportar_alteracoes(conn, caminho, desde=0, formato=None, ao_lote=None):
+    """
+    Exporta as alterações com sequência maior que desde para um arquivo,
+    no formato da sua extensão (ou no formato informado).
+    Retorna uma tupla (linhas exportadas, última sequência exportada), que
+    é o desde da próxima exportação.
+    """
+    ate = ultima_sequencia(conn)
+    cursor = conn.cursor()
+    cursor.execute(*consulta_exportacao_alteracoes(desde, ate))
+    total = exportar_cursor(cursor, caminho, formato, ao_lote=ao_lote)
+    return total, max(ate, desde)
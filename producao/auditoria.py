@@ -0,0 +1,30 @@
+"""
+Auditoria dos registros já gravados na tabela de produção.
+"""
+from .validacao import validar_cpf_cnpj_lote
+
+TAMANHO_LOTE_AUDITORIA = 20000
+COLUNAS_AUDITORIA = ("id", "pa", "colaborador", "data", "cpf_cnpj", "cliente")
+
+
+def auditar_documentos(conn, tamanho_lote=TAMANHO_LOTE_AUDITORIA, ao_lote=None):
+    """
+    Percorre a tabela de produção em lotes e valida os CPFs/CNPJs de cada lote
+    de uma vez (validar_cpf_cnpj_lote).
+    Gera as linhas (COLUNAS_AUDITORIA) cujo documento é inválido.
+    ao_lote(verificadas), se informado, é chamado após cada lote.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(COLUNAS_AUDITORIA)} FROM producao ORDER BY id")
+    verificadas = 0
+    while True:
+        linhas = cursor.fetchmany(tamanho_lote)
+        if not linhas:
+            break
+        documentos_validos = validar_cpf_cnpj_lote([linha[4] for linha in linhas])
+        for linha, valido in zip(linhas, documentos_validos):
+            if not valido:
+                yield linha
+        verificadas += len(linhas)
+        if ao_lote is not None:
+            ao_lote(verificadas)
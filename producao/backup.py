@@ -0,0 +1,218 @@
+"""
+Backups consistentes do banco de dados.
+
+As cópias usam a API de backup do SQLite (Connection.backup), em passos, de
+modo que o banco continua disponível para leitura e gravação durante a cópia
+e o arquivo gerado nunca fica pela metade. Toda a cópia é lida em uma única
+transação de leitura: no modo WAL as gravações continuam, e a cópia retrata
+o banco do início dela, em vez de recomeçar a cada gravação feita por outra
+conexão entre um passo e outro. Além do backup completo, há o
+backup diferencial: apenas as páginas que mudaram desde o último backup
+completo são gravadas (compactadas) em um arquivo .diff.gz. Os backups
+antigos são removidos conforme a política de retenção.
+"""
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+from datetime import datetime
+
+PAGINAS_POR_PASSO = 1024
+MANTER_BACKUPS = 10  # backups completos mantidos pela retenção
+ASSINATURA_DIFERENCIAL = b"PRODDIF1"
+
+
+def _novo_caminho(pasta, extensao):
+    """
+    Retorna um caminho backup_AAAAMMDD_HHMMSS com a extensão informada que
+    ainda não exista na pasta.
+    """
+    data_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
+    caminho = os.path.join(pasta, f"backup_{data_hora}{extensao}")
+    sufixo = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta, f"backup_{data_hora}_{sufixo}{extensao}")
+        sufixo += 1
+    return caminho
+
+
+def _copiar_banco(conn, destino, ao_progredir=None, paginas_por_passo=PAGINAS_POR_PASSO):
+    """
+    Copia o banco da conexão para o arquivo destino com a API de backup,
+    dentro de uma transação de leitura da conexão (que não deve ter outra
+    transação aberta).
+    ao_progredir(copiadas, total) é chamado a cada passo; uma exceção lançada
+    por ele interrompe a cópia.
+    """
+    def progresso(status, restantes, total):
+        if ao_progredir is not None:
+            ao_progredir(total - restantes, total)
+
+    conn_destino = sqlite3.connect(destino)
+    try:
+        # A leitura fixa o retrato do banco até o fim da transação; sem ela,
+        # cada passo abriria uma leitura nova e recomeçaria a cópia se
+        # outra conexão tivesse gravado
+        conn.execute("BEGIN")
+        conn.execute("SELECT 1 FROM main.sqlite_master LIMIT 1")
+        conn.backup(conn_destino, pages=paginas_por_passo, progress=progresso)
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn_destino.close()
+
+
+def _abrir_backup(caminho):
+    """
+    Abre um backup completo para leitura, descompactando-o se necessário.
+    """
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rb")
+    return open(caminho, "rb")
+
+
+def _tamanho_pagina(caminho):
+    """
+    Lê o tamanho de página do cabeçalho de um arquivo SQLite.
+    """
+    with _abrir_backup(caminho) as arquivo:
+        cabecalho = arquivo.read(100)
+    tamanho = struct.unpack(">H", cabecalho[16:18])[0]
+    return 65536 if tamanho == 1 else tamanho
+
+
+def listar_backups_completos(pasta="."):
+    """
+    Retorna os backups completos da pasta, do mais antigo para o mais recente.
+    """
+    caminhos = glob.glob(os.path.join(pasta, "backup_*.db")) + glob.glob(os.path.join(pasta, "backup_*.db.gz"))
+    return sorted(caminhos, key=os.path.basename)
+
+
+def criar_backup(conn, pasta=".", comprimir=False, ao_progredir=None):
+    """
+    Cria um backup completo e consistente do banco da conexão.
+    Com comprimir=True o arquivo é gravado compactado (backup_*.db.gz).
+    Retorna o caminho do backup.
+    """
+    if not comprimir:
+        caminho = _novo_caminho(pasta, ".db")
+        temporario = caminho + ".tmp"
+        try:
+            _copiar_banco(conn, temporario, ao_progredir)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        return caminho
+
+    caminho = _novo_caminho(pasta, ".db.gz")
+    with tempfile.TemporaryDirectory(dir=pasta) as pasta_temporaria:
+        copia = os.path.join(pasta_temporaria, "copia.db")
+        _copiar_banco(conn, copia, ao_progredir)
+        temporario = caminho + ".tmp"
+        with open(copia, "rb") as origem, gzip.open(temporario, "wb") as destino:
+            shutil.copyfileobj(origem, destino)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def criar_backup_diferencial(conn, pasta=".", ao_progredir=None):
+    """
+    Cria um backup diferencial em relação ao backup completo mais recente:
+    grava apenas as páginas alteradas desde então, compactadas.
+    Se não houver backup completo compatível, cria um backup completo.
+    Retorna o caminho do backup gerado.
+    """
+    completos = listar_backups_completos(pasta)
+    if not completos:
+        return criar_backup(conn, pasta, ao_progredir=ao_progredir)
+    base = completos[-1]
+
+    caminho = _novo_caminho(pasta, ".diff.gz")
+    with tempfile.TemporaryDirectory(dir=pasta) as pasta_temporaria:
+        copia = os.path.join(pasta_temporaria, "copia.db")
+        _copiar_banco(conn, copia, ao_progredir)
+        tamanho_pagina = _tamanho_pagina(copia)
+        if tamanho_pagina != _tamanho_pagina(base):
+            return criar_backup(conn, pasta, ao_progredir=ao_progredir)
+
+        total_paginas = os.path.getsize(copia) // tamanho_pagina
+        nome_base = os.path.basename(base).encode("utf-8")
+        temporario = caminho + ".tmp"
+        with open(copia, "rb") as atual, _abrir_backup(base) as anterior, gzip.open(temporario, "wb") as destino:
+            destino.write(ASSINATURA_DIFERENCIAL)
+            destino.write(struct.pack(">IIH", tamanho_pagina, total_paginas, len(nome_base)))
+            destino.write(nome_base)
+            for numero in range(total_paginas):
+                pagina = atual.read(tamanho_pagina)
+                if pagina != anterior.read(tamanho_pagina):
+                    destino.write(struct.pack(">I", numero))
+                    destino.write(pagina)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def base_do_diferencial(caminho):
+    """
+    Retorna o nome do arquivo do backup completo usado por um diferencial.
+    """
+    with gzip.open(caminho, "rb") as arquivo:
+        if arquivo.read(len(ASSINATURA_DIFERENCIAL)) != ASSINATURA_DIFERENCIAL:
+            raise ValueError(f"Arquivo não é um backup diferencial: {caminho}")
+        _, _, tamanho_nome = struct.unpack(">IIH", arquivo.read(10))
+        return arquivo.read(tamanho_nome).decode("utf-8")
+
+
+def restaurar_backup(caminho, destino):
+    """
+    Restaura um backup completo (.db ou .db.gz) ou diferencial (.diff.gz) no
+    arquivo destino. O diferencial é aplicado sobre o backup completo em que
+    se baseia, que deve estar na mesma pasta.
+    """
+    if not caminho.endswith(".diff.gz"):
+        with _abrir_backup(caminho) as origem, open(destino, "wb") as arquivo_destino:
+            shutil.copyfileobj(origem, arquivo_destino)
+        return
+
+    with gzip.open(caminho, "rb") as diferencial:
+        if diferencial.read(len(ASSINATURA_DIFERENCIAL)) != ASSINATURA_DIFERENCIAL:
+            raise ValueError(f"Arquivo não é um backup diferencial: {caminho}")
+        tamanho_pagina, total_paginas, tamanho_nome = struct.unpack(">IIH", diferencial.read(10))
+        base = os.path.join(os.path.dirname(caminho), diferencial.read(tamanho_nome).decode("utf-8"))
+        restaurar_backup(base, destino)
+        with open(destino, "r+b") as arquivo_destino:
+            while True:
+                numero = diferencial.read(4)
+                if not numero:
+                    break
+                arquivo_destino.seek(struct.unpack(">I", numero)[0] * tamanho_pagina)
+                arquivo_destino.write(diferencial.read(tamanho_pagina))
+            arquivo_destino.truncate(total_paginas * tamanho_pagina)
+
+
+def podar_backups(pasta=".", manter=MANTER_BACKUPS):
+    """
+    Remove os backups completos mais antigos, mantendo os `manter` mais
+    recentes, e os diferenciais cujo backup completo não existe mais.
+    Retorna a lista de arquivos removidos.
+    """
+    removidos = []
+    completos = listar_backups_completos(pasta)
+    for caminho in completos[:max(len(completos) - manter, 0)]:
+        os.remove(caminho)
+        removidos.append(caminho)
+
+    restantes = {os.path.basename(caminho) for caminho in completos[-manter:]} if manter else set()
+    for caminho in glob.glob(os.path.join(pasta, "backup_*.diff.gz")):
+        try:
+            base = base_do_diferencial(caminho)
+        except (OSError, ValueError, struct.error):
+            continue  # Arquivo ilegível: mantido para inspeção
+        if base not in restantes:
+            os.remove(caminho)
+            removidos.append(caminho)
+    return removidos
@@ -0,0 +1,282 @@
+"""
+Cliente da API HTTP/JSON do servidor de produção (producao.servidor).
+
+Usado pela interface quando PRODUCAO_SERVIDOR aponta para um servidor: os
+métodos espelham as funções de repositorio, relatorios e exportacao, mas em
+vez de abrir o banco fazem requisições ao servidor. Cada thread mantém sua
+própria conexão HTTP persistente, então o cliente pode ser usado pelas
+threads do ExecutorBD. As respostas das leituras ficam em cache com o ETag
+recebido; a mesma leitura é repetida com If-None-Match e, se nada mudou no
+banco, o servidor responde 304 sem consultá-lo.
+
+Se o servidor exigir um token de acesso, defina PRODUCAO_TOKEN com o mesmo
+segredo: ele vai no cabeçalho Authorization de todas as requisições.
+"""
+import http.client
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote, urlencode, urlsplit
+
+from .exportacao import formato_do_arquivo
+from .repositorio import NOMES_COLUNAS_REGISTRO, TAMANHO_PAGINA
+from .validacao import normalizar_documento
+
+SERVIDOR_API = os.environ.get("PRODUCAO_SERVIDOR", "")
+TOKEN_API = os.environ.get("PRODUCAO_TOKEN", "")
+TEMPO_LIMITE = 60  # segundos aguardando uma resposta do servidor
+TEMPO_CONEXAO_OCIOSA = 30  # o servidor fecha conexões ociosas após 60 s
+TAMANHO_CACHE = 256
+TAMANHO_BLOCO_ARQUIVO = 64 * 1024
+METODOS_IDEMPOTENTES = ("GET", "HEAD", "PUT", "DELETE")
+
+
+class ErroAPI(Exception):
+    """
+    Erro informado pelo servidor, com o status HTTP da resposta.
+    """
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ClienteProducao:
+    """
+    Acessa o servidor de produção no endereço informado (http://host:porta).
+    """
+
+    def __init__(self, url, token=TOKEN_API):
+        partes = urlsplit(url if "//" in url else f"http://{url}")
+        if partes.scheme != "http" or not partes.hostname:
+            raise ValueError(f"Endereço do servidor inválido: {url}")
+        self.host = partes.hostname
+        self.porta = partes.port or 80
+        self.prefixo = partes.path.rstrip("/")
+        self._autorizacao = f"Bearer {token}" if token else None
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._trava_cache = threading.Lock()
+
+    def _conexao(self):
+        """
+        Retorna a conexão HTTP da thread atual, reabrindo-a se estiver ociosa
+        há tempo suficiente para o servidor tê-la fechado.
+        """
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None and time.monotonic() - self._local.ultimo_uso > TEMPO_CONEXAO_OCIOSA:
+            conexao.close()
+            conexao = None
+        if conexao is None:
+            conexao = http.client.HTTPConnection(self.host, self.porta, timeout=TEMPO_LIMITE)
+            self._local.conexao = conexao
+        return conexao
+
+    def _descartar_conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
+
+    def _enviar(self, metodo, caminho, consulta=None, dados=None, cabecalhos=None):
+        """
+        Envia uma requisição e retorna a resposta, ainda não lida.
+        Métodos idempotentes são reenviados uma vez se a conexão persistente
+        tiver sido fechada pelo servidor.
+        """
+        alvo = self.prefixo + caminho
+        if consulta:
+            alvo += "?" + urlencode(consulta)
+        corpo = json.dumps(dados).encode("utf-8") if dados is not None else None
+        cabecalhos = dict(cabecalhos or {})
+        if self._autorizacao is not None:
+            cabecalhos["Authorization"] = self._autorizacao
+        if corpo is not None:
+            cabecalhos["Content-Type"] = "application/json; charset=utf-8"
+        tentativas = 2 if metodo in METODOS_IDEMPOTENTES else 1
+        for tentativa in range(tentativas):
+            conexao = self._conexao()
+            try:
+                conexao.request(metodo, alvo, body=corpo, headers=cabecalhos)
+                resposta = conexao.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self._descartar_conexao()
+                if tentativa + 1 == tentativas:
+                    raise
+                continue
+            except OSError:
+                self._descartar_conexao()
+                raise
+            self._local.ultimo_uso = time.monotonic()
+            if resposta.will_close:
+                self._local.conexao = None  # Fechada pelo servidor após esta resposta
+            return resposta
+
+    @staticmethod
+    def _verificar(resposta, corpo):
+        """
+        Lança ErroAPI se a resposta indicar erro.
+        """
+        if resposta.status < 400:
+            return
+        try:
+            mensagem = json.loads(corpo)["erro"]
+        except (ValueError, KeyError, TypeError):
+            mensagem = resposta.reason
+        raise ErroAPI(resposta.status, mensagem)
+
+    def requisitar(self, metodo, caminho, consulta=None, dados=None):
+        """
+        Faz uma requisição JSON.
+        Retorna os dados da resposta (None se ela não tiver corpo).
+        """
+        resposta = self._enviar(metodo, caminho, consulta, dados)
+        corpo = resposta.read()
+        self._verificar(resposta, corpo)
+        if metodo != "GET":
+            self.limpar_cache()  # Os dados mudaram; as versões guardadas já não valem
+        return json.loads(corpo) if corpo else None
+
+    def obter(self, caminho, consulta=None):
+        """
+        Faz uma leitura, reaproveitando a resposta guardada se o servidor
+        informar que os dados não mudaram.
+        Retorna os dados da resposta.
+        """
+        chave = caminho + "?" + urlencode(sorted((consulta or {}).items()))
+        with self._trava_cache:
+            guardada = self._cache.get(chave)
+        cabecalhos = {"If-None-Match": guardada[0]} if guardada else None
+        resposta = self._enviar("GET", caminho, consulta, cabecalhos=cabecalhos)
+        corpo = resposta.read()
+        if resposta.status == 304 and guardada:
+            return guardada[1]
+        self._verificar(resposta, corpo)
+        dados = json.loads(corpo)
+        versao = resposta.getheader("ETag")
+        if versao:
+            with self._trava_cache:
+                self._cache[chave] = (versao, dados)
+                self._cache.move_to_end(chave)
+                while len(self._cache) > TAMANHO_CACHE:
+                    self._cache.popitem(last=False)
+        return dados
+
+    def limpar_cache(self):
+        with self._trava_cache:
+            self._cache.clear()
+
+    def buscar_pagina(self, filtro, coluna=None, decrescente=False, ultima_chave=None, tamanho=TAMANHO_PAGINA):
+        """
+        Busca uma página de registros, como repositorio.buscar_pagina.
+        Retorna (linhas com COLUNAS_REGISTRO, cursor da próxima página ou None).
+        """
+        consulta = dict(filtro.criterios(), tamanho=tamanho)
+        if coluna:
+            consulta["ordem"] = coluna
+        if decrescente:
+            consulta["decrescente"] = "1"
+        if ultima_chave:
+            consulta["apos"] = ultima_chave
+        dados = self.obter("/registros", consulta)
+        linhas = [tuple(registro[nome] for nome in NOMES_COLUNAS_REGISTRO) for registro in dados["registros"]]
+        return linhas, dados["proxima"]
+
+    def buscar_registro(self, id_registro):
+        """
+        Busca um registro, como repositorio.buscar_registro.
+        Retorna a tupla de valores sem o id, ou None se o registro não existir.
+        """
+        try:
+            dados = self.obter(f"/registros/{id_registro}")
+        except ErroAPI as erro:
+            if erro.status == 404:
+                return None
+            raise
+        return tuple(dados[nome] for nome in NOMES_COLUNAS_REGISTRO[1:])
+
+    def gravar(self, campos, id_registro=None):
+        """
+        Cadastra um registro, ou altera o registro id_registro, com os campos
+        do formulário (dicionário com os nomes de normalizar_registro).
+        Retorna o id do registro gravado.
+        """
+        if id_registro is None:
+            return self.requisitar("POST", "/registros", dados=campos)["id"]
+        return self.requisitar("PUT", f"/registros/{id_registro}", dados=campos)["id"]
+
+    def excluir(self, ids):
+        """
+        Exclui os registros informados em uma única transação no servidor:
+        ou todos são excluídos, ou nenhum.
+        """
+        self.requisitar("DELETE", "/registros", dados={"ids": list(ids)})
+
+    @staticmethod
+    def _consulta_relatorio(consulta):
+        """
+        Converte uma ConsultaRelatorio nos parâmetros da rota de relatórios.
+        """
+        parametros = dict(consulta.filtro.criterios(), agrupamento=",".join(consulta.dimensoes))
+        if consulta.periodo:
+            parametros["periodo"] = consulta.periodo
+        if consulta.limite:
+            parametros["limite"] = consulta.limite
+        return parametros
+
+    def gerar_relatorio(self, consulta):
+        """
+        Gera um relatório, como relatorios.gerar_relatorio.
+        Retorna a lista de linhas, na ordem de consulta.colunas.
+        """
+        dados = self.obter("/relatorios", self._consulta_relatorio(consulta))
+        return [tuple(linha) for linha in dados["linhas"]]
+
+    def exportar(self, caminho_arquivo, filtro=None, consulta=None, ao_bloco=None):
+        """
+        Baixa a exportação dos registros filtrados, ou do relatório consulta,
+        para o arquivo informado, no formato da sua extensão.
+        ao_bloco(recebidos, total), se informado, é chamado a cada bloco.
+        """
+        if consulta is not None:
+            caminho, parametros = "/relatorios/exportacao", self._consulta_relatorio(consulta)
+        else:
+            caminho, parametros = "/exportacao", dict(filtro.criterios()) if filtro is not None else {}
+        parametros["formato"] = formato_do_arquivo(caminho_arquivo)
+        resposta = self._enviar("GET", caminho, parametros)
+        if resposta.status >= 400:
+            self._verificar(resposta, resposta.read())
+        total = int(resposta.getheader("Content-Length") or 0) or None
+        recebidos = 0
+        try:
+            with open(caminho_arquivo, "wb") as arquivo:
+                while bloco := resposta.read(TAMANHO_BLOCO_ARQUIVO):
+                    arquivo.write(bloco)
+                    recebidos += len(bloco)
+                    if ao_bloco is not None:
+                        ao_bloco(recebidos, total)
+        except BaseException:
+            self._descartar_conexao()  # A resposta não foi lida até o fim
+            if os.path.exists(caminho_arquivo):
+                os.remove(caminho_arquivo)
+            raise
+
+    def carregar_dimensao(self, coluna):
+        """
+        Retorna os nomes cadastrados na dimensão, como dimensoes.carregar_dimensao.
+        """
+        return self.obter(f"/dimensoes/{coluna}")["nomes"]
+
+    def buscar_cliente(self, cpf_cnpj):
+        """
+        Retorna o nome mais recente do cliente do documento, como
+        sugestoes.buscar_cliente, ou None se ele não tiver registros.
+        """
+        try:
+            return self.obter(f"/clientes/{quote(normalizar_documento(cpf_cnpj), safe='')}")["cliente"]
+        except ErroAPI as erro:
+            if erro.status == 404:
+                return None
+            raise
@@ -0,0 +1,75 @@
+"""
+Gerenciamento das conexões com o banco de dados SQLite.
+
+Cada thread reaproveita uma única conexão persistente, aberta na primeira
+utilização e configurada com WAL e pragmas de desempenho. Assim as operações
+não pagam a abertura do arquivo nem a leitura do esquema a cada chamada, e
+leituras longas (como uma exportação) não bloqueiam as gravações. Os anos
+arquivados (particoes) são anexados a cada conexão ao ser obtida, inclusive
+os arquivados depois que ela foi aberta.
+"""
+import sqlite3
+import threading
+
+from .particoes import anexar_particoes
+
+# Configurações das conexões
+ARQUIVO_DB = "producao.db"
+TEMPO_ESPERA_TRAVA = 30  # segundos aguardando um banco travado antes de falhar
+INSTRUCOES_EM_CACHE = 256
+TAMANHO_CACHE_KB = 20000  # cache de páginas por conexão (~20 MB)
+TAMANHO_MMAP = 256 * 1024 * 1024
+
+
+class GerenciadorConexoes:
+    """
+    Mantém uma conexão persistente por thread para um arquivo de banco de dados.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conexoes = []
+        self._trava = threading.Lock()
+
+    def obter(self):
+        """
+        Retorna a conexão da thread atual, abrindo-a se necessário, com os
+        anos arquivados existentes anexados.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._abrir()
+            self._local.conn = conn
+            self._local.anos_anexados = frozenset()
+            with self._trava:
+                self._conexoes.append(conn)
+        self._local.anos_anexados = anexar_particoes(conn, self.caminho, self._local.anos_anexados)
+        return conn
+
+    def _abrir(self):
+        """
+        Abre uma nova conexão e aplica os pragmas de desempenho.
+        """
+        conn = sqlite3.connect(
+            self.caminho,
+            timeout=TEMPO_ESPERA_TRAVA,
+            cached_statements=INSTRUCOES_EM_CACHE,
+            check_same_thread=False,  # Permite fechar todas as conexões ao sair
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{TAMANHO_CACHE_KB}")
+        conn.execute(f"PRAGMA mmap_size={TAMANHO_MMAP}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def fechar_todas(self):
+        """
+        Fecha todas as conexões abertas. Usado ao encerrar a aplicação.
+        """
+        with self._trava:
+            conexoes, self._conexoes = self._conexoes, []
+        for conn in conexoes:
+            conn.close()
+        self._local = threading.local()
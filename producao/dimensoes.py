@@ -0,0 +1,57 @@
+"""
+Tabelas de dimensão (PAs, colaboradores, produtos e status) em memória.
+
+As dimensões são pequenas e mudam pouco, então são lidas uma única vez e
+consultadas em dicionários: a interface preenche as listas de seleção sem ir
+ao banco, e a importação em lote converte nomes em ids sem uma consulta por
+linha.
+"""
+from .esquema import TABELAS_DIMENSOES
+
+
+def carregar_dimensao(conn, coluna):
+    """
+    Carrega os nomes cadastrados na dimensão de uma coluna (ex.: "pa"), na
+    ordem de cadastro.
+    Retorna uma lista de nomes.
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT nome FROM {TABELAS_DIMENSOES[coluna]} ORDER BY id")
+    return [row[0] for row in cursor.fetchall()]
+
+
+class CacheDimensoes:
+    """
+    Ids das dimensões por nome, carregados uma vez da conexão informada.
+    Nomes ainda não cadastrados são incluídos na dimensão na primeira vez
+    em que aparecem (na transação em andamento da conexão).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {
+            coluna: dict(conn.execute(f"SELECT nome, id FROM {tabela}"))
+            for coluna, tabela in TABELAS_DIMENSOES.items()
+        }
+
+    def obter_id(self, coluna, nome):
+        """
+        Retorna o id do nome na dimensão da coluna, cadastrando-o se necessário.
+        """
+        ids = self.ids[coluna]
+        id_dimensao = ids.get(nome)
+        if id_dimensao is None:
+            cursor = self.conn.execute(f"INSERT INTO {TABELAS_DIMENSOES[coluna]} (nome) VALUES (?)", (nome,))
+            id_dimensao = ids[nome] = cursor.lastrowid
+        return id_dimensao
+
+    def linha_normalizada(self, registro):
+        """
+        Converte um registro de normalizar_registro nos valores de
+        registros_producao (sem o id).
+        """
+        pa, colaborador, data, cpf_cnpj, cliente, produto, status, _, valor_centavos, observacoes = registro
+        return (
+            self.obter_id("pa", pa), self.obter_id("colaborador", colaborador), data, cpf_cnpj, cliente,
+            self.obter_id("produto", produto), self.obter_id("status", status), valor_centavos, observacoes,
+        )
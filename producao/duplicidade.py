@@ -0,0 +1,58 @@
+"""
+Localização e exclusão de registros repetidos: mesmo cliente (CPF/CNPJ sem
+pontuação), produto e data.
+
+Os repetidos são encontrados em uma única passagem pelo índice de
+duplicidade, sem comparar os registros dois a dois: row_number() numera os
+registros de cada chave (CHAVE_DUPLICIDADE) em ordem de id, e todos depois do
+primeiro são repetições dele. O primeiro, o mais antigo, é o mantido.
+Registros de anos arquivados não são verificados.
+
+Uso: python -m producao [--banco ARQUIVO] deduplicar [--saida ARQUIVO] [--excluir]
+"""
+from .esquema import CHAVE_DUPLICIDADE, criar_indice_duplicidade
+
+TAMANHO_LOTE_EXCLUSAO = 5000
+COLUNAS_DUPLICADOS = ("id", "id_mantido", "pa", "colaborador", "data", "cpf_cnpj", "cliente", "produto", "status", "valor_centavos")
+
+# Cada registro com o primeiro id da sua chave e sua posição nela
+SQL_NUMERAR_CHAVES = f'''
+    SELECT id, first_value(id) OVER chave AS id_mantido, row_number() OVER chave AS posicao
+    FROM registros_producao
+    WINDOW chave AS (PARTITION BY {', '.join(CHAVE_DUPLICIDADE)} ORDER BY id)
+'''
+
+
+def encontrar_duplicados(conn):
+    """
+    Gera as linhas (COLUNAS_DUPLICADOS) dos registros repetidos, agrupadas
+    pelo registro mantido.
+    """
+    colunas = ", ".join(f"d.{coluna}" if coluna in ("id", "id_mantido") else f"p.{coluna}" for coluna in COLUNAS_DUPLICADOS)
+    cursor = conn.execute(f'''
+        SELECT {colunas} FROM ({SQL_NUMERAR_CHAVES}) d
+        JOIN producao p ON p.id = d.id
+        WHERE d.posicao > 1
+        ORDER BY d.id_mantido, d.id
+    ''')
+    yield from cursor
+
+
+def excluir_duplicados(conn, tamanho_lote=TAMANHO_LOTE_EXCLUSAO, ao_lote=None):
+    """
+    Exclui os registros repetidos, mantendo o mais antigo de cada chave, em
+    lotes com uma transação cada (o resumo diário e o índice de busca são
+    atualizados pelos gatilhos); se for interrompida, basta executá-la de
+    novo. Ao final, torna único o índice de duplicidade.
+    ao_lote(excluidos, total), se informado, é chamado após cada lote.
+    Retorna a quantidade de registros excluídos.
+    """
+    ids = [row[0] for row in conn.execute(f"SELECT id FROM ({SQL_NUMERAR_CHAVES}) WHERE posicao > 1")]
+    for inicio in range(0, len(ids), tamanho_lote):
+        lote = ids[inicio:inicio + tamanho_lote]
+        with conn:
+            conn.executemany("DELETE FROM registros_producao WHERE id = ?", [(id_registro,) for id_registro in lote])
+        if ao_lote is not None:
+            ao_lote(inicio + len(lote), len(ids))
+    criar_indice_duplicidade(conn)
+    return len(ids)
@@ -0,0 +1,810 @@
+"""
+Esquema do banco de dados de produção e suas migrações.
+
+As migrações são aplicadas em ordem conforme o PRAGMA user_version; cada uma
+pode ser interrompida e executada novamente sem perda de dados.
+
+Os registros ficam em registros_producao, com PA, colaborador, produto e
+status gravados como chaves para as tabelas de dimensão. A visão producao
+mantém as colunas originais (com os nomes) para leitura e, por gatilhos
+INSTEAD OF, também para inserção, alteração e exclusão. A coluna gerada
+documento (CPF/CNPJ sem pontuação) e o índice de duplicidade identificam
+lançamentos repetidos do mesmo cliente, produto e data.
+
+Toda inclusão, alteração e exclusão em registros_producao fica registrada
+por gatilhos no histórico producao_alteracoes, com um número de sequência
+crescente, para que extrações e sincronizações leiam só o que mudou.
+"""
+from .validacao import ACENTOS, PONTUACAO_DOCUMENTO, data_para_iso, remover_acentos, valor_para_centavos
+
+TAMANHO_LOTE_MIGRACAO = 5000
+# Datas já no formato AAAA-MM-DD, que as migrações de data não alteram
+PADRAO_DATA_ISO = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+LISTA_PAS = ["PA01", "PA02", "PA03", "PA04", "PA05", "PA06", "PA07", "PA08", "PA09", "PA10", "PA97"]
+LISTA_STATUS = ["EM ANDAMENTO", "CONCLUÍDO", "CANCELADO"]
+# Tabela de dimensão de cada coluna normalizada; em registros_producao a
+# coluna correspondente é <coluna>_id
+TABELAS_DIMENSOES = {
+    "pa": "pas",
+    "colaborador": "colaboradores",
+    "produto": "produtos",
+    "status": "status_producao",
+}
+# Campos de texto livre servidos pelo índice de busca (FTS5 trigram)
+COLUNAS_BUSCA = ("colaborador", "cliente", "produto", "observacoes")
+# Dimensões do resumo diário (producao_resumo_diario)
+DIMENSOES_RESUMO = ("data", "pa", "colaborador", "produto", "status")
+# Dimensões totalizadas, cada uma à parte, no resumo mensal (producao_resumo_mensal)
+DIMENSOES_RESUMO_MENSAL = ("colaborador", "produto", "status")
+CHAVE_RESUMO_MENSAL = ("dimensao", "data", "pa", "nome")
+# Gatilhos de inserção em registros_producao que a importação em lote suspende
+# e compensa ao final com indexar_registros
+GATILHOS_INSERCAO = ("producao_busca_insert", "producao_resumo_insert", "producao_alteracoes_insert")
+# Gatilhos de exclusão suspensos ao arquivar um ano: os registros arquivados
+# continuam no resumo e não entram no histórico como excluídos
+GATILHOS_ARQUIVAMENTO = ("producao_resumo_delete", "producao_alteracoes_delete")
+# Colunas da visão producao guardadas (em JSON) no histórico de alterações
+COLUNAS_HISTORICO = ("pa", "colaborador", "data", "cpf_cnpj", "cliente", "produto", "status", "valor_centavos", "observacoes")
+# Chave de um mesmo lançamento: cliente, produto e data
+CHAVE_DUPLICIDADE = ("documento", "produto_id", "data")
+INDICE_DUPLICIDADE = "idx_registros_duplicidade"
+
+def criar_tabela_pas(conn):
+    """
+    Cria a tabela de PAs e a popula com dados iniciais, se necessário.
+    """
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute("SELECT COUNT(*) FROM pas")
+        if cursor.fetchone()[0] == 0:  # Se a tabela estiver vazia
+            cursor.executemany('''
+                INSERT INTO pas (nome) VALUES (?)
+            ''', [(pa,) for pa in LISTA_PAS])
+
+def criar_tabela_producao(conn):
+    """
+    Cria a tabela de produção, se não existir, e aplica as migrações pendentes.
+    """
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS producao (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pa TEXT NOT NULL,
+                colaborador TEXT NOT NULL,
+                data TEXT NOT NULL,
+                cpf_cnpj TEXT NOT NULL,
+                cliente TEXT NOT NULL,
+                produto TEXT NOT NULL,
+                status TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                observacoes TEXT
+            )
+        ''')
+    aplicar_migracoes(conn)
+
+def preparar_banco(conn):
+    """
+    Cria as tabelas do banco de dados (se não existirem) e aplica as migrações.
+    """
+    criar_tabela_pas(conn)
+    criar_tabela_producao(conn)
+
+def _converter_datas(conn, tabela):
+    """
+    Converte para AAAA-MM-DD as datas da tabela que ainda não estão nesse
+    formato, com a mesma leitura dia-mês-ano da validação (data_para_iso),
+    que também aceita dia e mês sem zero à esquerda, como 5-3-2024. A
+    conversão é feita em lotes por faixa de id, com commit a cada lote, e só
+    altera linhas fora do formato ISO; se for interrompida, basta executá-la
+    novamente. As datas que não podem ser lidas ficam como estão e são
+    guardadas em datas_nao_convertidas, em vez de ignoradas em silêncio.
+    Retorna a quantidade de datas não convertidas.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS datas_nao_convertidas (registro_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+    nao_convertidas = 0
+    ultimo_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0]
+    for inicio in range(0, ultimo_id, TAMANHO_LOTE_MIGRACAO):
+        linhas = conn.execute(
+            f"SELECT id, data FROM {tabela} WHERE id > ? AND id <= ? AND data NOT GLOB '{PADRAO_DATA_ISO}'",
+            (inicio, inicio + TAMANHO_LOTE_MIGRACAO),
+        ).fetchall()
+        atualizacoes = []
+        ilegiveis = []
+        for id_registro, data in linhas:
+            try:
+                atualizacoes.append((data_para_iso(data.strip()), id_registro))
+            except ValueError:
+                ilegiveis.append((id_registro, data))
+        conn.executemany(f"UPDATE {tabela} SET data = ? WHERE id = ?", atualizacoes)
+        conn.executemany("INSERT OR REPLACE INTO datas_nao_convertidas (registro_id, data) VALUES (?, ?)", ilegiveis)
+        conn.commit()
+        nao_convertidas += len(ilegiveis)
+    return nao_convertidas
+
+def _migrar_datas_iso(conn):
+    """
+    Converte as datas DD-MM-AAAA para AAAA-MM-DD e cria os índices por data.
+    """
+    _converter_datas(conn, "producao")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_producao_data ON producao (data)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_producao_pa_data ON producao (pa, data)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_producao_colaborador_data ON producao (colaborador, data)")
+
+def _colunas_tabela(conn, tabela):
+    """
+    Retorna o conjunto de nomes de colunas de uma tabela, inclusive as geradas.
+    """
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({tabela})")}
+
+def _converter_valores(conn, condicao):
+    """
+    Converte em centavos o texto de valor das linhas da tabela producao
+    antiga que atendem à condição, em lotes com commit a cada lote. Os textos
+    que não podem ser convertidos são guardados em valores_nao_convertidos e
+    a linha fica com valor_centavos nulo, em vez de um valor inventado.
+    Retorna a quantidade de valores não convertidos.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS valores_nao_convertidos (registro_id INTEGER PRIMARY KEY, valor TEXT NOT NULL)")
+    nao_convertidos = 0
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM producao").fetchone()[0]
+    for inicio in range(0, ultimo_id, TAMANHO_LOTE_MIGRACAO):
+        linhas = conn.execute(
+            f"SELECT id, valor FROM producao WHERE id > ? AND id <= ? AND ({condicao})",
+            (inicio, inicio + TAMANHO_LOTE_MIGRACAO),
+        ).fetchall()
+        atualizacoes = []
+        ilegiveis = []
+        for id_registro, valor in linhas:
+            try:
+                atualizacoes.append((valor_para_centavos(valor), id_registro))
+            except ValueError:
+                atualizacoes.append((None, id_registro))
+                ilegiveis.append((id_registro, valor))
+        conn.executemany("UPDATE producao SET valor_centavos = ? WHERE id = ?", atualizacoes)
+        conn.executemany("INSERT OR REPLACE INTO valores_nao_convertidos (registro_id, valor) VALUES (?, ?)", ilegiveis)
+        conn.commit()
+        nao_convertidos += len(ilegiveis)
+    return nao_convertidos
+
+def _migrar_valor_centavos(conn):
+    """
+    Adiciona a coluna valor_centavos e a preenche a partir do texto de valor.
+    O preenchimento é feito em lotes e só alcança linhas ainda sem centavos,
+    então a migração pode ser retomada se for interrompida. Os textos que
+    não são valores válidos ficam em valores_nao_convertidos.
+    """
+    if "valor_centavos" not in _colunas_tabela(conn, "producao"):
+        conn.execute("ALTER TABLE producao ADD COLUMN valor_centavos INTEGER")
+        conn.commit()
+    _converter_valores(conn, "valor_centavos IS NULL")
+
+def _corrigir_datas_sem_zeros(conn):
+    """
+    Converte as datas que versões anteriores da migração de datas deixaram
+    no formato antigo (as sem zero à esquerda, como 5-3-2024). A alteração
+    passa pelos gatilhos, então o resumo diário e o histórico acompanham.
+    """
+    _converter_datas(conn, "registros_producao")
+
+def _criar_indice_pa(conn):
+    """
+    Cria o índice em pa_id, que serve o filtro por PA na ordem de cadastro
+    (o índice em pa_id e data traria as linhas na ordem de data).
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_registros_pa ON registros_producao (pa_id)")
+
+def contar_datas_nao_convertidas(conn):
+    """
+    Retorna quantos registros do banco principal continuam com a data fora
+    do formato AAAA-MM-DD porque ela não pôde ser lida; o texto original
+    também fica em datas_nao_convertidas. Corrigir a data do registro o
+    retira da contagem.
+    """
+    if _tipo_objeto(conn, "datas_nao_convertidas") != "table":
+        return 0
+    tabela = "registros_producao" if _tipo_objeto(conn, "registros_producao") == "table" else "producao"
+    return conn.execute(f'''
+        SELECT COUNT(*) FROM datas_nao_convertidas d
+        JOIN {tabela} r ON r.id = d.registro_id
+        WHERE r.data NOT GLOB '{PADRAO_DATA_ISO}'
+    ''').fetchone()[0]
+
+def contar_valores_nao_convertidos(conn):
+    """
+    Retorna quantos registros do banco principal continuam sem valor porque
+    o texto original, guardado em valores_nao_convertidos, não pôde ser
+    convertido. Alterar o valor do registro o retira da contagem.
+    """
+    if _tipo_objeto(conn, "valores_nao_convertidos") != "table":
+        return 0
+    tabela = "registros_producao" if _tipo_objeto(conn, "registros_producao") == "table" else "producao"
+    return conn.execute(f'''
+        SELECT COUNT(*) FROM valores_nao_convertidos v
+        JOIN {tabela} r ON r.id = v.registro_id
+        WHERE r.valor_centavos IS NULL
+    ''').fetchone()[0]
+
+def _criar_indice_valor(conn):
+    """
+    Cria o índice em valor_centavos usado na ordenação por valor.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_producao_valor ON producao (valor_centavos)")
+
+def _sql_sem_acentos(expressao):
+    """
+    Envolve uma expressão SQL em replace() que removem os acentos de ACENTOS.
+    """
+    for acentuado, simples in zip(*ACENTOS):
+        expressao = f"replace({expressao}, '{acentuado}', '{simples}')"
+    return expressao
+
+def _criar_indice_busca(conn):
+    """
+    Cria e preenche o índice de busca textual (FTS5 trigram) sobre COLUNAS_BUSCA.
+    O índice guarda os textos sem acentos, com rowid igual ao id do registro.
+    O preenchimento é feito em lotes com INSERT OR REPLACE, então pode ser
+    repetido com segurança se for interrompido. Os gatilhos que o mantêm
+    sincronizado são criados sobre registros_producao (_normalizar_dimensoes).
+    """
+    colunas = ", ".join(COLUNAS_BUSCA)
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS producao_busca USING fts5({colunas}, tokenize='trigram')")
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM producao").fetchone()[0]
+    for inicio in range(0, ultimo_id, TAMANHO_LOTE_MIGRACAO):
+        indexar_busca(conn, inicio, inicio + TAMANHO_LOTE_MIGRACAO)
+        conn.commit()
+
+def indexar_busca(conn, id_inicio, id_fim):
+    """
+    Grava no índice de busca os registros com id no intervalo (id_inicio, id_fim].
+    Os acentos são removidos em Python, bem mais rápido que os replace()
+    encadeados usados pelos gatilhos, com o mesmo resultado.
+    """
+    colunas = ", ".join(COLUNAS_BUSCA)
+    valores_linha = ", ".join(f"COALESCE({coluna}, '')" for coluna in COLUNAS_BUSCA)
+    cursor = conn.execute(f"SELECT id, {valores_linha} FROM producao WHERE id > ? AND id <= ?", (id_inicio, id_fim))
+    conn.executemany(
+        f"INSERT OR REPLACE INTO producao_busca (rowid, {colunas}) VALUES (?{', ?' * len(COLUNAS_BUSCA)})",
+        ((id_registro, *(remover_acentos(valor) for valor in valores)) for id_registro, *valores in cursor),
+    )
+
+def _sql_coluna(coluna, registro):
+    """
+    Retorna a expressão SQL de uma coluna da visão producao para a linha
+    registro (NEW ou OLD) de registros_producao; colunas normalizadas são
+    buscadas na tabela de dimensão.
+    """
+    if coluna in TABELAS_DIMENSOES:
+        return f"(SELECT nome FROM {TABELAS_DIMENSOES[coluna]} WHERE id = {registro}.{coluna}_id)"
+    return f"{registro}.{coluna}"
+
+def _colunas_base(colunas):
+    """
+    Retorna os nomes em registros_producao das colunas da visão producao.
+    """
+    return ", ".join(f"{coluna}_id" if coluna in TABELAS_DIMENSOES else coluna for coluna in colunas)
+
+def criar_gatilhos_busca(conn):
+    """
+    Cria os gatilhos que mantêm o índice de busca sincronizado com os registros.
+    """
+    colunas = ", ".join(COLUNAS_BUSCA)
+    valores_novos = ", ".join(_sql_sem_acentos(f"COALESCE({_sql_coluna(coluna, 'NEW')}, '')") for coluna in COLUNAS_BUSCA)
+    atribuicoes = ", ".join(
+        f"{coluna} = " + _sql_sem_acentos(f"COALESCE({_sql_coluna(coluna, 'NEW')}, '')") for coluna in COLUNAS_BUSCA
+    )
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_busca_insert AFTER INSERT ON registros_producao BEGIN
+            INSERT INTO producao_busca (rowid, {colunas}) VALUES (NEW.id, {valores_novos});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_busca_update
+        AFTER UPDATE OF {_colunas_base(COLUNAS_BUSCA)} ON registros_producao BEGIN
+            UPDATE producao_busca SET {atribuicoes} WHERE rowid = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS producao_busca_delete AFTER DELETE ON registros_producao BEGIN
+            DELETE FROM producao_busca WHERE rowid = OLD.id;
+        END
+    ''')
+
+def _criar_resumo_diario(conn):
+    """
+    Cria e preenche o resumo diário (quantidade e soma dos valores por data,
+    PA, colaborador, produto e status). Os gatilhos que o mantêm atualizado
+    são criados sobre registros_producao (_normalizar_dimensoes).
+    """
+    dimensoes = ", ".join(DIMENSOES_RESUMO)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS producao_resumo_diario (
+            data TEXT NOT NULL,
+            pa TEXT NOT NULL,
+            colaborador TEXT NOT NULL,
+            produto TEXT NOT NULL,
+            status TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            total_centavos INTEGER NOT NULL,
+            PRIMARY KEY ({dimensoes})
+        ) WITHOUT ROWID
+    ''')
+    # A chave primária começa pela data; os relatórios filtrados por PA usam este índice
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_resumo_pa_data ON producao_resumo_diario (pa, data)")
+    reconstruir_resumo(conn)
+
+def _criar_resumo_mensal(conn):
+    """
+    Cria e preenche o resumo mensal, que totaliza por mês e PA cada uma das
+    DIMENSOES_RESUMO_MENSAL à parte (dimensao, nome). Sem combinar as
+    dimensões, tem poucas linhas por mês, enquanto o resumo diário tem
+    quase uma por registro; os relatórios de meses inteiros agrupados por PA
+    e no máximo uma outra dimensão usam este resumo. É preenchido a partir
+    do resumo diário, que já conta os anos arquivados, e os gatilhos do
+    resumo são recriados para mantê-lo junto com o diário.
+    """
+    with conn:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS producao_resumo_mensal (
+                dimensao TEXT NOT NULL,  -- colaborador, produto ou status
+                data TEXT NOT NULL,  -- primeiro dia do mês (AAAA-MM-01)
+                pa TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                quantidade INTEGER NOT NULL,
+                total_centavos INTEGER NOT NULL,
+                PRIMARY KEY ({", ".join(CHAVE_RESUMO_MENSAL)})
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_resumo_mensal_pa ON producao_resumo_mensal (dimensao, pa, data)")
+        for gatilho in ("producao_resumo_insert", "producao_resumo_update", "producao_resumo_delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+        criar_gatilhos_resumo(conn)
+        _reconstruir_resumo_mensal(conn)
+
+def _sql_mes(expressao_data):
+    """
+    Retorna a expressão SQL do primeiro dia do mês de uma data ISO.
+    """
+    return f"substr({expressao_data}, 1, 8) || '01'"
+
+def _sql_somar_resumo(valores, sinal, tabela="producao_resumo_diario", chave=DIMENSOES_RESUMO):
+    """
+    Retorna o INSERT que soma (sinal "+") ou subtrai (sinal "-") uma ou mais
+    linhas ao resumo; valores é um VALUES(...) ou um SELECT com as colunas
+    da chave, a quantidade e o total, nessa ordem.
+    """
+    dimensoes = ", ".join(chave)
+    return f'''
+        INSERT INTO {tabela} ({dimensoes}, quantidade, total_centavos) {valores}
+        ON CONFLICT ({dimensoes}) DO UPDATE SET
+            quantidade = quantidade {sinal} excluded.quantidade,
+            total_centavos = total_centavos {sinal} excluded.total_centavos
+    '''
+
+def _sql_resumo_mensal(registro, sinal):
+    """
+    Retorna os comandos (separados por ";") que somam (sinal "+") ou
+    subtraem (sinal "-") a linha registro (NEW ou OLD) de registros_producao
+    ao resumo mensal, uma vez por dimensão; ao subtrair, remove os grupos
+    que ficam sem registros.
+    """
+    comandos = []
+    mes = _sql_mes(f"{registro}.data")
+    pa = _sql_coluna("pa", registro)
+    for dimensao in DIMENSOES_RESUMO_MENSAL:
+        nome = _sql_coluna(dimensao, registro)
+        # O "WHERE true" evita a ambiguidade entre o ON do upsert e um JOIN
+        comandos.append(_sql_somar_resumo(
+            f"SELECT '{dimensao}', {mes}, {pa}, {nome}, 1, COALESCE({registro}.valor_centavos, 0) WHERE true",
+            sinal, "producao_resumo_mensal", CHAVE_RESUMO_MENSAL,
+        ))
+        if sinal == "-":
+            comandos.append(
+                f"DELETE FROM producao_resumo_mensal WHERE dimensao = '{dimensao}' AND data = {mes} "
+                f"AND pa = {pa} AND nome = {nome} AND quantidade = 0"
+            )
+    return ";\n".join(comandos)
+
+def criar_gatilhos_resumo(conn):
+    """
+    Cria os gatilhos que mantêm o resumo diário, e o mensal depois da
+    migração que o cria, em dia com a tabela de produção.
+    Grupos que ficam sem registros são removidos.
+    """
+    novos = ", ".join(_sql_coluna(dimensao, "NEW") for dimensao in DIMENSOES_RESUMO)
+    antigos = ", ".join(_sql_coluna(dimensao, "OLD") for dimensao in DIMENSOES_RESUMO)
+    condicao_antigos = " AND ".join(f"{dimensao} = {_sql_coluna(dimensao, 'OLD')}" for dimensao in DIMENSOES_RESUMO)
+    somar_novo = _sql_somar_resumo(f"VALUES ({novos}, 1, COALESCE(NEW.valor_centavos, 0))", "+")
+    # O "WHERE true" evita a ambiguidade entre o ON do upsert e um JOIN
+    subtrair_antigo = _sql_somar_resumo(f"SELECT {antigos}, 1, COALESCE(OLD.valor_centavos, 0) WHERE true", "-")
+    remover_vazio = f"DELETE FROM producao_resumo_diario WHERE {condicao_antigos} AND quantidade = 0"
+    mensal_novo = mensal_antigo = "SELECT 0"
+    if _tipo_objeto(conn, "producao_resumo_mensal") == "table":
+        mensal_novo = _sql_resumo_mensal("NEW", "+")
+        mensal_antigo = _sql_resumo_mensal("OLD", "-")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_resumo_insert AFTER INSERT ON registros_producao BEGIN
+            {somar_novo};
+            {mensal_novo};
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_resumo_update
+        AFTER UPDATE OF {_colunas_base(DIMENSOES_RESUMO)}, valor_centavos ON registros_producao BEGIN
+            {subtrair_antigo};
+            {remover_vazio};
+            {mensal_antigo};
+            {somar_novo};
+            {mensal_novo};
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_resumo_delete AFTER DELETE ON registros_producao BEGIN
+            {subtrair_antigo};
+            {remover_vazio};
+            {mensal_antigo};
+        END
+    ''')
+
+def somar_resumo(conn, id_inicio, id_fim):
+    """
+    Soma aos resumos diário e mensal os registros com id no intervalo
+    (id_inicio, id_fim].
+    """
+    dimensoes = ", ".join(DIMENSOES_RESUMO)
+    conn.execute(_sql_somar_resumo(f'''
+        SELECT {dimensoes}, COUNT(*), COALESCE(SUM(valor_centavos), 0) FROM producao
+        WHERE id > ? AND id <= ? GROUP BY {dimensoes}
+    ''', "+"), (id_inicio, id_fim))
+    if _tipo_objeto(conn, "producao_resumo_mensal") != "table":
+        return
+    for dimensao in DIMENSOES_RESUMO_MENSAL:
+        conn.execute(_sql_somar_resumo(f'''
+            SELECT '{dimensao}', {_sql_mes("data")} AS mes, pa, {dimensao}, COUNT(*), COALESCE(SUM(valor_centavos), 0)
+            FROM producao WHERE id > ? AND id <= ? GROUP BY mes, pa, {dimensao}
+        ''', "+", "producao_resumo_mensal", CHAVE_RESUMO_MENSAL), (id_inicio, id_fim))
+
+def reconstruir_resumo(conn, fonte="producao"):
+    """
+    Recalcula todo o resumo diário (e, a partir dele, o mensal) com base na
+    tabela de produção (ou em outra fonte com as mesmas colunas, como a que
+    inclui os anos arquivados), em uma única transação.
+    """
+    dimensoes = ", ".join(DIMENSOES_RESUMO)
+    with conn:
+        conn.execute("DELETE FROM producao_resumo_diario")
+        conn.execute(f'''
+            INSERT INTO producao_resumo_diario ({dimensoes}, quantidade, total_centavos)
+            SELECT {dimensoes}, COUNT(*), COALESCE(SUM(valor_centavos), 0) FROM {fonte} GROUP BY {dimensoes}
+        ''')
+        if _tipo_objeto(conn, "producao_resumo_mensal") == "table":
+            _reconstruir_resumo_mensal(conn)
+
+def _reconstruir_resumo_mensal(conn):
+    """
+    Recalcula o resumo mensal a partir do resumo diário, na transação em
+    andamento.
+    """
+    conn.execute("DELETE FROM producao_resumo_mensal")
+    for dimensao in DIMENSOES_RESUMO_MENSAL:
+        conn.execute(f'''
+            INSERT INTO producao_resumo_mensal ({", ".join(CHAVE_RESUMO_MENSAL)}, quantidade, total_centavos)
+            SELECT '{dimensao}', {_sql_mes("data")} AS mes, pa, {dimensao}, SUM(quantidade), SUM(total_centavos)
+            FROM producao_resumo_diario GROUP BY mes, pa, {dimensao}
+        ''')
+
+def _sql_valores_historico(expressao_coluna):
+    """
+    Retorna o json_object com as COLUNAS_HISTORICO; expressao_coluna(coluna)
+    dá a expressão SQL de cada uma.
+    """
+    pares = ", ".join(f"'{coluna}', {expressao_coluna(coluna)}" for coluna in COLUNAS_HISTORICO)
+    return f"json_object({pares})"
+
+def _criar_historico(conn):
+    """
+    Cria o histórico de alterações e os gatilhos que o preenchem. O
+    histórico começa vazio: os registros anteriores a ele são lidos pela
+    exportação completa.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS producao_alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            registro_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL CHECK (operacao IN ('I', 'U', 'D')),
+            momento TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+            antes TEXT,
+            depois TEXT
+        )
+    ''')
+    criar_gatilhos(conn)
+
+def criar_gatilhos_historico(conn):
+    """
+    Cria os gatilhos que registram no histórico as inclusões (I), alterações
+    (U, só se algum valor mudar) e exclusões (D) de registros, com os valores
+    antes e depois. Não faz nada antes da migração que cria o histórico.
+    """
+    if _tipo_objeto(conn, "producao_alteracoes") != "table":
+        return
+    novos = _sql_valores_historico(lambda coluna: _sql_coluna(coluna, "NEW"))
+    antigos = _sql_valores_historico(lambda coluna: _sql_coluna(coluna, "OLD"))
+    colunas = _colunas_base(COLUNAS_HISTORICO).split(", ")
+    mudou = f"({', '.join(f'OLD.{coluna}' for coluna in colunas)}) IS NOT ({', '.join(f'NEW.{coluna}' for coluna in colunas)})"
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_alteracoes_insert AFTER INSERT ON registros_producao BEGIN
+            INSERT INTO producao_alteracoes (registro_id, operacao, depois) VALUES (NEW.id, 'I', {novos});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_alteracoes_update AFTER UPDATE ON registros_producao WHEN {mudou} BEGIN
+            INSERT INTO producao_alteracoes (registro_id, operacao, antes, depois) VALUES (NEW.id, 'U', {antigos}, {novos});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_alteracoes_delete AFTER DELETE ON registros_producao BEGIN
+            INSERT INTO producao_alteracoes (registro_id, operacao, antes) VALUES (OLD.id, 'D', {antigos});
+        END
+    ''')
+
+def registrar_insercoes(conn, id_inicio, id_fim):
+    """
+    Registra no histórico a inclusão dos registros com id no intervalo
+    (id_inicio, id_fim], em ordem de id.
+    """
+    if _tipo_objeto(conn, "producao_alteracoes") != "table":
+        return
+    conn.execute(f'''
+        INSERT INTO producao_alteracoes (registro_id, operacao, depois)
+        SELECT id, 'I', {_sql_valores_historico(lambda coluna: coluna)} FROM producao
+        WHERE id > ? AND id <= ? ORDER BY id
+    ''', (id_inicio, id_fim))
+
+def indexar_registros(conn, id_inicio, id_fim):
+    """
+    Faz pelos registros com id no intervalo (id_inicio, id_fim] o trabalho
+    dos GATILHOS_INSERCAO: índice de busca, resumo diário e histórico.
+    """
+    indexar_busca(conn, id_inicio, id_fim)
+    somar_resumo(conn, id_inicio, id_fim)
+    registrar_insercoes(conn, id_inicio, id_fim)
+
+def criar_gatilhos(conn):
+    """
+    Cria (se não existirem) os gatilhos do índice de busca, do resumo diário
+    e do histórico de alterações.
+    """
+    criar_gatilhos_busca(conn)
+    criar_gatilhos_resumo(conn)
+    criar_gatilhos_historico(conn)
+
+# Expressão que formata valor_centavos como moeda, igual a formatar_centavos
+SQL_VALOR_FORMATADO = (
+    "CASE WHEN r.valor_centavos < 0 THEN '-' ELSE '' END || 'R$ ' || "
+    "replace(printf('%,d', abs(r.valor_centavos) / 100), ',', '.') || ',' || "
+    "printf('%02d', abs(r.valor_centavos) % 100)"
+)
+
+def sql_selecao_producao(tabela="registros_producao"):
+    """
+    Retorna o SELECT das colunas da visão producao sobre uma tabela com o
+    formato de registros_producao (a do banco principal ou a de um ano
+    arquivado), com os nomes das dimensões.
+    """
+    return f'''
+        SELECT r.id AS id, pas.nome AS pa, c.nome AS colaborador, r.data AS data, r.cpf_cnpj AS cpf_cnpj,
+               r.cliente AS cliente, pr.nome AS produto, s.nome AS status, {SQL_VALOR_FORMATADO} AS valor,
+               r.valor_centavos AS valor_centavos, r.observacoes AS observacoes
+        FROM {tabela} r
+        JOIN pas ON pas.id = r.pa_id
+        JOIN colaboradores c ON c.id = r.colaborador_id
+        JOIN produtos pr ON pr.id = r.produto_id
+        JOIN status_producao s ON s.id = r.status_id
+    '''
+
+def _tipo_objeto(conn, nome):
+    """
+    Retorna o tipo ("table", "view", ...) do objeto do esquema com o nome
+    informado, ou None se não existir.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (nome,)).fetchone()
+    return row[0] if row else None
+
+def _normalizar_dimensoes(conn):
+    """
+    Move os registros para registros_producao, com PA, colaborador, produto e
+    status como chaves para tabelas de dimensão, e troca a tabela producao
+    pela visão de compatibilidade de mesmo nome.
+    As dimensões e a cópia (em lotes, com INSERT OR IGNORE) podem ser
+    repetidas com segurança; a troca da tabela pela visão é feita em uma
+    única transação. Antes dela, os valores zerados ou nulos são convertidos
+    de novo a partir do texto de valor, que deixa de existir com a tabela
+    antiga, para que nenhum texto ilegível se perca sem ficar em
+    valores_nao_convertidos.
+    """
+    for coluna, tabela in TABELAS_DIMENSOES.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL UNIQUE)")
+        if coluna == "status":
+            conn.executemany("INSERT OR IGNORE INTO status_producao (nome) VALUES (?)", [(status,) for status in LISTA_STATUS])
+        conn.execute(f"INSERT OR IGNORE INTO {tabela} (nome) SELECT DISTINCT {coluna} FROM producao ORDER BY {coluna}")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS registros_producao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pa_id INTEGER NOT NULL REFERENCES pas (id),
+            colaborador_id INTEGER NOT NULL REFERENCES colaboradores (id),
+            data TEXT NOT NULL,
+            cpf_cnpj TEXT NOT NULL,
+            cliente TEXT NOT NULL,
+            produto_id INTEGER NOT NULL REFERENCES produtos (id),
+            status_id INTEGER NOT NULL REFERENCES status_producao (id),
+            valor_centavos INTEGER,  -- nulo se o valor original não pôde ser convertido
+            observacoes TEXT
+        )
+    ''')
+    conn.commit()
+    if _tipo_objeto(conn, "producao") == "view":
+        return  # Troca já concluída
+
+    # Versões anteriores da migração de valor_centavos gravavam zero no lugar
+    # dos textos ilegíveis
+    _converter_valores(conn, "valor_centavos IS NULL OR valor_centavos = 0")
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM producao").fetchone()[0]
+    for inicio in range(0, ultimo_id, TAMANHO_LOTE_MIGRACAO):
+        conn.execute('''
+            INSERT OR IGNORE INTO registros_producao
+            SELECT p.id, pas.id, c.id, p.data, p.cpf_cnpj, p.cliente, pr.id, s.id, p.valor_centavos, p.observacoes
+            FROM producao p
+            JOIN pas ON pas.nome = p.pa
+            JOIN colaboradores c ON c.nome = p.colaborador
+            JOIN produtos pr ON pr.nome = p.produto
+            JOIN status_producao s ON s.nome = p.status
+            WHERE p.id > ? AND p.id <= ?
+        ''', (inicio, inicio + TAMANHO_LOTE_MIGRACAO))
+        conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        sem_texto = conn.execute('''
+            SELECT COUNT(*) FROM producao
+            WHERE valor_centavos IS NULL AND id NOT IN (SELECT registro_id FROM valores_nao_convertidos)
+        ''').fetchone()[0]
+        if sem_texto:
+            raise ValueError(f"{sem_texto} registros sem valor não têm o texto original guardado; a tabela antiga não foi removida.")
+        # O AUTOINCREMENT não deve reaproveitar ids de registros já excluídos
+        sequencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'producao'").fetchone()
+        if sequencia is not None:
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'registros_producao'")
+            conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('registros_producao', MAX(?, (SELECT COALESCE(MAX(id), 0) FROM registros_producao)))",
+                (sequencia[0],),
+            )
+        conn.execute("DROP TABLE producao")  # Remove também os índices e gatilhos antigos
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_registros_data ON registros_producao (data)")
+        for coluna in TABELAS_DIMENSOES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_registros_{coluna}_data ON registros_producao ({coluna}_id, data)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_registros_valor ON registros_producao (valor_centavos)")
+        conn.execute(f"CREATE VIEW producao AS {sql_selecao_producao()}")
+        criar_gatilhos_visao(conn)
+        criar_gatilhos(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+def criar_gatilhos_visao(conn):
+    """
+    Cria os gatilhos INSTEAD OF que permitem inserir, alterar e excluir pela
+    visão producao. Nomes de dimensão ainda não cadastrados são incluídos.
+    """
+    cadastrar = "\n".join(
+        f"INSERT OR IGNORE INTO {tabela} (nome) VALUES (NEW.{coluna});" for coluna, tabela in TABELAS_DIMENSOES.items()
+    )
+    colunas = ("pa", "colaborador", "data", "cpf_cnpj", "cliente", "produto", "status", "valor_centavos", "observacoes")
+    valores = [
+        f"(SELECT id FROM {TABELAS_DIMENSOES[coluna]} WHERE nome = NEW.{coluna})" if coluna in TABELAS_DIMENSOES else f"NEW.{coluna}"
+        for coluna in colunas
+    ]
+    atribuicoes = ", ".join(
+        f"{coluna_base} = {valor}" for coluna_base, valor in zip(_colunas_base(colunas).split(", "), valores)
+    )
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_inserir INSTEAD OF INSERT ON producao BEGIN
+            {cadastrar}
+            INSERT INTO registros_producao (id, {_colunas_base(colunas)}) VALUES (NEW.id, {", ".join(valores)});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS producao_alterar INSTEAD OF UPDATE ON producao BEGIN
+            {cadastrar}
+            UPDATE registros_producao SET {atribuicoes} WHERE id = OLD.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS producao_excluir INSTEAD OF DELETE ON producao BEGIN
+            DELETE FROM registros_producao WHERE id = OLD.id;
+        END
+    ''')
+
+def sql_documento(expressao):
+    """
+    Retorna a expressão SQL do CPF/CNPJ sem pontuação, igual a
+    normalizar_documento.
+    """
+    for sinal in PONTUACAO_DOCUMENTO:
+        expressao = f"replace({expressao}, '{sinal}', '')"
+    return expressao
+
+def indice_unico_ativo(conn):
+    """
+    Retorna True se o índice de duplicidade for único, isto é, se o banco
+    não tiver registros repetidos e o upsert por CHAVE_DUPLICIDADE for possível.
+    """
+    row = conn.execute(
+        "SELECT \"unique\" FROM pragma_index_list('registros_producao') WHERE name = ?", (INDICE_DUPLICIDADE,)
+    ).fetchone()
+    return bool(row and row[0])
+
+def criar_indice_duplicidade(conn):
+    """
+    Cria o índice em CHAVE_DUPLICIDADE: único se não houver registros
+    repetidos; senão, um índice comum, que serve às buscas de duplicados até
+    que eles sejam removidos (python -m producao deduplicar --excluir).
+    Um índice comum já existente é trocado pelo único quando possível.
+    Retorna True se o índice criado for único.
+    """
+    if indice_unico_ativo(conn):
+        return True
+    chave = ", ".join(CHAVE_DUPLICIDADE)
+    with conn:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {INDICE_DUPLICIDADE} ON registros_producao ({chave})")
+    repetido = conn.execute(
+        f"SELECT 1 FROM registros_producao GROUP BY {chave} HAVING COUNT(*) > 1 LIMIT 1"
+    ).fetchone()
+    if repetido is not None:
+        return False
+    with conn:
+        conn.execute(f"DROP INDEX {INDICE_DUPLICIDADE}")
+        conn.execute(f"CREATE UNIQUE INDEX {INDICE_DUPLICIDADE} ON registros_producao ({chave})")
+    return True
+
+def _criar_chave_duplicidade(conn):
+    """
+    Adiciona a coluna gerada documento (CPF/CNPJ sem pontuação, calculado a
+    cada leitura, sem ocupar espaço na tabela) e o índice de duplicidade.
+    """
+    if "documento" not in _colunas_tabela(conn, "registros_producao"):
+        conn.execute(f"ALTER TABLE registros_producao ADD COLUMN documento TEXT GENERATED ALWAYS AS ({sql_documento('cpf_cnpj')}) VIRTUAL")
+        conn.commit()
+    criar_indice_duplicidade(conn)
+
+# Migrações de esquema, aplicadas em ordem conforme o PRAGMA user_version
+MIGRACOES = [
+    (1, _migrar_datas_iso),
+    (2, _migrar_valor_centavos),
+    (3, _criar_indice_valor),
+    (4, _criar_indice_busca),
+    (5, _criar_resumo_diario),
+    (6, _normalizar_dimensoes),
+    (7, _criar_chave_duplicidade),
+    (8, _criar_historico),
+    (9, _corrigir_datas_sem_zeros),
+    (10, _criar_indice_pa),
+    (11, _criar_resumo_mensal),
+]
+
+def aplicar_migracoes(conn):
+    """
+    Aplica as migrações pendentes no banco de dados.
+    Cada migração concluída atualiza o PRAGMA user_version.
+    """
+    versao_atual = conn.execute("PRAGMA user_version").fetchone()[0]
+    for versao, migracao in MIGRACOES:
+        if versao > versao_atual:
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {versao}")
+            conn.commit()
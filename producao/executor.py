@@ -0,0 +1,323 @@
+"""
+Execução das operações de banco de dados fora da thread da interface.
+
+As leituras rodam em um pequeno conjunto de threads e as gravações em uma
+única thread escritora, cada uma com sua conexão persistente. Os resultados
+não são entregues diretamente: ficam em uma fila que a interface esvazia
+periodicamente (por exemplo com janela.after), de modo que os callbacks sempre
+rodam na thread da interface.
+
+Gravações curtas e frequentes (como as do formulário) podem ser submetidas
+em grupo: a thread escritora junta as que chegam em um intervalo curto e as
+grava em uma única transação, com um savepoint por gravação, de modo que o
+custo da confirmação em disco é dividido entre elas e a falha de uma não
+desfaz as demais. A conclusão só é informada depois da confirmação. Se o
+banco estiver travado por outro processo, o grupo é repetido com espera
+exponencial em vez de falhar de imediato.
+"""
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .conexao import TEMPO_ESPERA_TRAVA
+from .instrumentacao import medir
+
+NUMERO_LEITORES = 2
+
+# Gravações em grupo
+INTERVALO_GRUPO = 0.01  # segundos aguardando mais gravações após a primeira
+TAMANHO_MAXIMO_GRUPO = 200
+ESPERA_TRAVA_GRUPO_MS = 1000  # espera do SQLite por tentativa antes de repetir o grupo
+ESPERA_INICIAL_REPETICAO = 0.05
+ESPERA_MAXIMA_REPETICAO = 2.0
+TEMPO_MAXIMO_REPETICOES = 60.0
+
+_NENHUMA = object()  # nenhuma tarefa retirada da fila além do grupo
+
+
+class TarefaCancelada(Exception):
+    """
+    Lançada dentro de uma tarefa quando ela é cancelada.
+    """
+
+
+def banco_travado(erro):
+    """
+    Retorna True se o erro indica que outra conexão está com o banco travado.
+    """
+    mensagem = str(erro).lower()
+    return isinstance(erro, sqlite3.OperationalError) and ("database is locked" in mensagem or "database is busy" in mensagem)
+
+
+class Tarefa:
+    """
+    Operação submetida ao executor.
+    Permite acompanhar o progresso e cancelar a operação em andamento.
+    """
+
+    def __init__(self, executor, funcao, args, ao_concluir=None, ao_falhar=None, ao_progredir=None, ao_cancelar=None, agrupada=False):
+        self.executor = executor
+        self.funcao = funcao
+        self.args = args
+        self.agrupada = agrupada
+        self.ao_concluir = ao_concluir
+        self.ao_falhar = ao_falhar
+        self.ao_progredir = ao_progredir
+        self.ao_cancelar = ao_cancelar
+        self._cancelada = threading.Event()
+        self._trava = threading.Lock()
+        self._conn = None  # conexão em uso enquanto a tarefa executa
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        """
+        Cancela a tarefa; se uma instrução SQL estiver em execução, ela é interrompida.
+        """
+        self._cancelada.set()
+        with self._trava:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def verificar_cancelamento(self):
+        """
+        Lança TarefaCancelada se a tarefa foi cancelada.
+        Deve ser chamada pelas tarefas longas entre uma etapa e outra.
+        """
+        if self._cancelada.is_set():
+            raise TarefaCancelada()
+
+    def informar_progresso(self, feito, total=None):
+        """
+        Informa o progresso da tarefa à interface (total é None se desconhecido).
+        """
+        self.executor._entregar(self, "ao_progredir", feito, total)
+
+    def _executar(self, conn):
+        """
+        Executa a tarefa com a conexão da thread e entrega o resultado.
+        """
+        if self._cancelada.is_set():
+            self.executor._entregar(self, "ao_cancelar")
+            return
+        with self._trava:
+            self._conn = conn
+        try:
+            resultado = self.funcao(conn, self, *self.args)
+        except Exception as erro:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            # Uma instrução interrompida pelo cancelamento também termina aqui
+            if isinstance(erro, TarefaCancelada) or self._cancelada.is_set():
+                self.executor._entregar(self, "ao_cancelar")
+            else:
+                self.executor._entregar(self, "ao_falhar", erro)
+        else:
+            self.executor._entregar(self, "ao_concluir", resultado)
+        finally:
+            with self._trava:
+                self._conn = None
+
+
+class ExecutorBD:
+    """
+    Executa leituras em um conjunto de threads e gravações em uma única thread.
+    As funções submetidas recebem (conn, tarefa, *args); sem gerenciador (como
+    no modo cliente da API, em que não há banco local) recebem conn=None e as
+    gravações em grupo são executadas uma a uma.
+    Os callbacks ficam na fila de processar_resultados, ou, com
+    agendar_callback (por exemplo loop.call_soon_threadsafe do asyncio), são
+    agendados por ele na thread que os deve executar.
+    """
+
+    def __init__(self, gerenciador, leitores=NUMERO_LEITORES, agendar_callback=None):
+        self.gerenciador = gerenciador
+        self.agendar_callback = agendar_callback
+        self._resultados = queue.Queue()
+        self._leitores = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix="leitor-bd")
+        self._escritas = queue.Queue()
+        self._escritor = threading.Thread(target=self._laco_escritor, name="escritor-bd", daemon=True)
+        self._escritor.start()
+
+    def ler(self, funcao, *args, **callbacks):
+        """
+        Submete uma leitura. Retorna a Tarefa correspondente.
+        """
+        tarefa = Tarefa(self, funcao, args, **callbacks)
+        self._leitores.submit(lambda: tarefa._executar(self._conexao()))
+        return tarefa
+
+    def _conexao(self):
+        """
+        Retorna a conexão da thread atual, ou None sem gerenciador.
+        """
+        return self.gerenciador.obter() if self.gerenciador is not None else None
+
+    def escrever(self, funcao, *args, **callbacks):
+        """
+        Submete uma gravação à thread escritora. Retorna a Tarefa correspondente.
+        """
+        tarefa = Tarefa(self, funcao, args, **callbacks)
+        self._escritas.put(tarefa)
+        return tarefa
+
+    def escrever_em_grupo(self, funcao, *args, **callbacks):
+        """
+        Submete uma gravação curta para ser feita junto com as demais que
+        chegarem em seguida, em uma única transação. A função não deve
+        confirmar nem desfazer a transação. ao_concluir só é chamado depois
+        que o grupo foi confirmado no banco.
+        Retorna a Tarefa correspondente.
+        """
+        tarefa = Tarefa(self, funcao, args, agrupada=True, **callbacks)
+        self._escritas.put(tarefa)
+        return tarefa
+
+    def _laco_escritor(self):
+        """
+        Executa as gravações em ordem; gravações em grupo consecutivas são
+        reunidas em uma só transação.
+        """
+        conn = self._conexao()
+        if conn is not None:
+            # A conclusão só é informada com a transação gravada em disco; o
+            # custo dessa sincronização é dividido entre as gravações do grupo
+            conn.execute("PRAGMA synchronous=FULL")
+        tarefa = self._escritas.get()
+        while tarefa is not None:
+            if tarefa.agrupada and conn is not None:
+                grupo, tarefa = self._reunir_grupo(tarefa)
+                self._executar_grupo(conn, grupo)
+                if tarefa is not _NENHUMA:
+                    continue  # Gravação avulsa (ou encerramento) retirada da fila
+            else:
+                tarefa._executar(conn)
+            tarefa = self._escritas.get()
+            conn = self._conexao()  # Anexa os anos arquivados desde a tarefa anterior
+
+    def _reunir_grupo(self, primeira):
+        """
+        Reúne à primeira tarefa as gravações em grupo que chegarem em até
+        INTERVALO_GRUPO, até TAMANHO_MAXIMO_GRUPO tarefas.
+        Retorna (grupo, seguinte): seguinte é o item retirado da fila que não
+        pertence ao grupo, ou _NENHUMA.
+        """
+        grupo = [primeira]
+        prazo = time.monotonic() + INTERVALO_GRUPO
+        while len(grupo) < TAMANHO_MAXIMO_GRUPO:
+            try:
+                proxima = self._escritas.get(timeout=max(0, prazo - time.monotonic()))
+            except queue.Empty:
+                break
+            if proxima is None or not proxima.agrupada:
+                return grupo, proxima
+            grupo.append(proxima)
+        return grupo, _NENHUMA
+
+    def _executar_grupo(self, conn, grupo):
+        """
+        Grava um grupo de tarefas em uma transação, repetindo-a com espera
+        exponencial enquanto o banco estiver travado, e entrega os resultados.
+        """
+        ativas = []
+        for tarefa in grupo:
+            if tarefa.cancelada:
+                self._entregar(tarefa, "ao_cancelar")
+            else:
+                ativas.append(tarefa)
+        if not ativas:
+            return
+
+        inicio = time.monotonic()
+        espera = ESPERA_INICIAL_REPETICAO
+        tentativas = 0
+        conn.execute(f"PRAGMA busy_timeout={ESPERA_TRAVA_GRUPO_MS}")
+        try:
+            with medir("gravação: grupo", tarefas=len(ativas)) as medicao:
+                while True:
+                    tentativas += 1
+                    try:
+                        resultados = self._gravar_grupo(conn, ativas)
+                        break
+                    except sqlite3.Error as erro:
+                        if conn.in_transaction:
+                            conn.rollback()
+                        if not banco_travado(erro) or time.monotonic() - inicio + espera > TEMPO_MAXIMO_REPETICOES:
+                            resultados = [("ao_falhar", erro)] * len(ativas)
+                            break
+                        time.sleep(espera * random.uniform(0.5, 1.5))
+                        espera = min(espera * 2, ESPERA_MAXIMA_REPETICAO)
+                medicao["tentativas"] = tentativas
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={TEMPO_ESPERA_TRAVA * 1000}")
+        for tarefa, (nome_callback, valor) in zip(ativas, resultados):
+            self._entregar(tarefa, nome_callback, valor)
+
+    def _gravar_grupo(self, conn, tarefas):
+        """
+        Executa as tarefas de um grupo em uma única transação, cada uma em seu
+        savepoint: uma tarefa que falha é desfeita sem afetar as outras. Uma
+        trava do banco interrompe o grupo inteiro, para que seja repetido.
+        Retorna a lista de (callback, valor) de cada tarefa.
+        """
+        resultados = []
+        conn.execute("BEGIN IMMEDIATE")
+        for tarefa in tarefas:
+            conn.execute("SAVEPOINT gravacao")
+            try:
+                resultado = tarefa.funcao(conn, tarefa, *tarefa.args)
+            except Exception as erro:
+                if banco_travado(erro):
+                    raise
+                conn.execute("ROLLBACK TO gravacao")
+                conn.execute("RELEASE gravacao")
+                resultados.append(("ao_falhar", erro))
+            else:
+                conn.execute("RELEASE gravacao")
+                resultados.append(("ao_concluir", resultado))
+        conn.commit()
+        return resultados
+
+    def _entregar(self, tarefa, nome_callback, *args):
+        """
+        Enfileira um callback da tarefa para ser executado na thread da interface.
+        O callback só é obtido na entrega, então pode ser definido na tarefa logo
+        após a submissão, mesmo que ela termine antes disso.
+        """
+        if self.agendar_callback is not None:
+            self.agendar_callback(self._executar_callback, tarefa, nome_callback, args)
+        else:
+            self._resultados.put((tarefa, nome_callback, args))
+
+    @staticmethod
+    def _executar_callback(tarefa, nome_callback, args):
+        """
+        Executa um callback entregue, se a tarefa o tiver definido.
+        """
+        callback = getattr(tarefa, nome_callback)
+        if callback is not None:
+            callback(*args)
+
+    def processar_resultados(self):
+        """
+        Executa os callbacks pendentes. Deve ser chamada pela thread da interface.
+        """
+        while True:
+            try:
+                tarefa, nome_callback, args = self._resultados.get_nowait()
+            except queue.Empty:
+                return
+            self._executar_callback(tarefa, nome_callback, args)
+
+    def encerrar(self):
+        """
+        Encerra as threads do executor, aguardando as tarefas em andamento.
+        """
+        self._escritas.put(None)
+        self._escritor.join()
+        self._leitores.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,161 @@
+"""
+Exportação de registros em lotes, com uso de memória constante.
+
+O cursor é lido com fetchmany e cada lote é gravado imediatamente, então a
+memória usada não depende da quantidade de linhas exportadas. Formatos:
+Excel (openpyxl em modo somente escrita), CSV e Parquet (pyarrow). As
+bibliotecas de Excel e Parquet são importadas apenas quando usadas.
+
+Valores em dinheiro são exportados em centavos inteiros (colunas terminadas
+em _centavos), exatos em CSV e Parquet; só na planilha do Excel viram reais,
+em células numéricas com formato de moeda.
+"""
+import csv
+import os
+from decimal import Decimal
+
+TAMANHO_LOTE_EXPORTACAO = 5000
+SUFIXO_CENTAVOS = "_CENTAVOS"
+FORMATO_MOEDA_EXCEL = "#,##0.00"
+# Colunas inteiras no Parquet, além das terminadas em _centavos; as demais
+# são texto
+COLUNAS_INTEIRAS = ("ID", "SEQ", "REGISTRO_ID", "QUANTIDADE", "POSICAO")
+
+# Formato de exportação correspondente a cada extensão de arquivo
+FORMATOS_EXPORTACAO = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+
+def formato_do_arquivo(caminho):
+    """
+    Retorna o formato de exportação pela extensão do arquivo (Excel por padrão).
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    return FORMATOS_EXPORTACAO.get(extensao, "xlsx")
+
+
+class _EscritorExcel:
+    """
+    Grava as linhas em uma planilha do Excel no modo somente escrita do openpyxl.
+    """
+
+    def __init__(self, caminho, colunas):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self.caminho = caminho
+        self.workbook = Workbook(write_only=True)
+        self.planilha = self.workbook.create_sheet("Registros")
+        self.celula = WriteOnlyCell
+        # Colunas em centavos viram reais, com o nome sem o sufixo
+        self.posicoes_centavos = [i for i, nome in enumerate(colunas) if nome.endswith(SUFIXO_CENTAVOS)]
+        self.planilha.append([nome[:-len(SUFIXO_CENTAVOS)] if nome.endswith(SUFIXO_CENTAVOS) else nome for nome in colunas])
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            if self.posicoes_centavos:
+                linha = list(linha)
+                for i in self.posicoes_centavos:
+                    if linha[i] is not None:
+                        # Decimal é gravado no arquivo exatamente com duas casas
+                        celula = self.celula(self.planilha, Decimal(linha[i]).scaleb(-2))
+                        celula.number_format = FORMATO_MOEDA_EXCEL
+                        linha[i] = celula
+            self.planilha.append(linha)
+
+    def fechar(self):
+        self.workbook.save(self.caminho)
+
+    def descartar(self):
+        self.workbook.close()
+
+
+class _EscritorCSV:
+    """
+    Grava as linhas em um arquivo CSV (UTF-8, separado por vírgulas).
+    """
+
+    def __init__(self, caminho, colunas):
+        self.arquivo = open(caminho, "w", newline="", encoding="utf-8")
+        self.escritor = csv.writer(self.arquivo)
+        self.escritor.writerow(colunas)
+
+    def escrever(self, linhas):
+        self.escritor.writerows(linhas)
+
+    def fechar(self):
+        self.arquivo.close()
+
+    def descartar(self):
+        self.arquivo.close()
+
+
+class _EscritorParquet:
+    """
+    Grava as linhas em um arquivo Parquet, um grupo de linhas por lote.
+    O esquema é definido pelos nomes das colunas (inteiros de 64 bits nas
+    COLUNAS_INTEIRAS e nas de centavos, texto nas demais), e não pelos
+    valores do primeiro lote, em que uma coluna pode vir toda nula.
+    """
+
+    def __init__(self, caminho, colunas):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.esquema = pyarrow.schema([
+            pyarrow.field(nome, pyarrow.int64() if nome in COLUNAS_INTEIRAS or nome.endswith(SUFIXO_CENTAVOS) else pyarrow.string())
+            for nome in colunas
+        ])
+        self.escritor = pyarrow.parquet.ParquetWriter(caminho, self.esquema)
+
+    def escrever(self, linhas):
+        valores_colunas = list(zip(*linhas))
+        arrays = [self.pa.array(valores, type=campo.type) for valores, campo in zip(valores_colunas, self.esquema)]
+        self.escritor.write_table(self.pa.Table.from_arrays(arrays, schema=self.esquema))
+
+    def fechar(self):
+        self.escritor.close()
+
+    def descartar(self):
+        self.escritor.close()
+
+
+ESCRITORES = {
+    "xlsx": _EscritorExcel,
+    "csv": _EscritorCSV,
+    "parquet": _EscritorParquet,
+}
+
+
+def exportar_cursor(cursor, caminho, formato=None, tamanho_lote=TAMANHO_LOTE_EXPORTACAO, ao_lote=None):
+    """
+    Exporta as linhas de um cursor já executado para um arquivo, em lotes.
+    ao_lote, se informado, é chamado com o total de linhas gravadas após cada
+    lote; uma exceção lançada por ele interrompe a exportação. Em caso de
+    erro, o arquivo incompleto é removido.
+    Retorna o número de linhas exportadas.
+    """
+    formato = formato or formato_do_arquivo(caminho)
+    colunas = [descricao[0].upper() for descricao in cursor.description]
+    escritor = ESCRITORES[formato](caminho, colunas)
+    total = 0
+    try:
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            escritor.escrever(linhas)
+            total += len(linhas)
+            if ao_lote is not None:
+                ao_lote(total)
+        escritor.fechar()
+    except BaseException:
+        escritor.descartar()
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    return total
@@ -0,0 +1,174 @@
+"""
+Filtros da tela de registros de produção e o SQL parametrizado correspondente.
+"""
+import json
+from calendar import monthrange
+
+from .esquema import COLUNAS_BUSCA
+from .instrumentacao import medir
+from .particoes import anos_no_intervalo, esquema_particao
+from .validacao import data_para_iso, intervalo_filtro_data, remover_acentos
+
+LIMITE_IDS_RESULTADO = 50000
+# Colunas que cada partição repassa à união; a coluna valor (texto formatado)
+# fica de fora, pois calculá-la para cada linha custa caro e as consultas
+# dos filtros usam valor_centavos
+COLUNAS_PARTICAO = "id, pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor_centavos, observacoes"
+# Critérios do filtro, na ordem dos parâmetros de FiltroProducao
+CAMPOS_FILTRO = ("pa", "colaborador", "cliente", "produto", "data", "data_inicio", "data_fim", "observacoes")
+
+class FiltroProducao:
+    """
+    Critérios de filtro da tela de registros e o SQL parametrizado correspondente.
+    As condições são montadas sempre na mesma ordem, de modo que filtros com os
+    mesmos campos preenchidos geram o mesmo texto SQL e reaproveitam o cache de
+    instruções do SQLite. Além do banco principal, as consultas leem apenas os
+    anos arquivados no intervalo de datas do filtro (self.anos_arquivados).
+    Lança ValueError se alguma data for inválida.
+    """
+
+    def __init__(self, pa="", colaborador="", cliente="", produto="", data="", data_inicio="", data_fim="", observacoes=""):
+        self.pa = pa.strip().upper()
+        self.colaborador = colaborador.strip().upper()
+        self.cliente = cliente.strip().upper()
+        self.produto = produto.strip().upper()
+        self.observacoes = observacoes.strip().upper()
+        self.data = data.strip()
+        self.data_inicio = data_inicio.strip()
+        self.data_fim = data_fim.strip()
+        self.condicoes, self.params = self._montar_condicoes()
+        self.anos_arquivados = anos_no_intervalo(*self._intervalo_datas())
+        # Condições de cada ano arquivado, que usa o próprio índice de busca
+        self._condicoes_anos = {ano: self._montar_condicoes(esquema_particao(ano)) for ano in self.anos_arquivados}
+        # Ids do último resultado, reaproveitados por relatório e exportação
+        self.ids = None
+
+    def _intervalo_datas(self):
+        """
+        Retorna o intervalo ISO (inicio, fim) coberto pelos filtros de data,
+        com None nos extremos sem limite.
+        """
+        inicio = fim = None
+        if self.data:
+            inicio, fim = intervalo_filtro_data(self.data)
+        if self.data_inicio and self.data_fim:
+            inicio = max(filter(None, (inicio, data_para_iso(self.data_inicio))))
+            fim = min(filter(None, (fim, data_para_iso(self.data_fim))))
+        return inicio, fim
+
+    def _montar_condicoes(self, esquema_busca="main"):
+        """
+        Monta as condições SQL (iniciadas por " AND") e seus parâmetros, com a
+        busca textual no índice do esquema informado.
+        """
+        condicoes = ""
+        params = []
+        if self.pa:
+            condicoes += " AND pa = ?"
+            params.append(self.pa)
+
+        # Textos livres: termos com 3 ou mais letras vão para o índice trigram
+        # (busca por trecho, sem acentos); termos menores usam LIKE
+        termos_busca = []
+        for coluna in COLUNAS_BUSCA:
+            termo = getattr(self, coluna)
+            if not termo:
+                continue
+            if len(termo) >= 3:
+                termo_normalizado = remover_acentos(termo).replace('"', '""')
+                termos_busca.append(f'{coluna} : "{termo_normalizado}"')
+            else:
+                condicoes += f" AND {coluna} LIKE ?"
+                params.append(f"%{termo}%")
+        if termos_busca:
+            condicoes += f" AND id IN (SELECT rowid FROM {esquema_busca}.producao_busca WHERE producao_busca MATCH ?)"
+            params.append(" AND ".join(termos_busca))
+        if self.data:
+            # Intervalo sobre a data ISO, resolvido pelo índice em data
+            condicoes += " AND data BETWEEN ? AND ?"
+            params.extend(intervalo_filtro_data(self.data))
+        if self.data_inicio and self.data_fim:
+            condicoes += " AND data BETWEEN ? AND ?"
+            params.extend([data_para_iso(self.data_inicio), data_para_iso(self.data_fim)])
+        return condicoes, params
+
+    @property
+    def usa_texto_livre(self):
+        """
+        True se o filtro tiver algum critério de texto livre. Sem eles, as
+        condições usam apenas PA e data, dimensões do resumo diário.
+        """
+        return any(getattr(self, coluna) for coluna in COLUNAS_BUSCA)
+
+    @property
+    def meses_inteiros(self):
+        """
+        True se o filtro não tiver limites de data que cortem um mês: sem
+        datas, ou começando no primeiro e terminando no último dia de um
+        mês. Sem texto livre, um filtro assim vale também para o resumo
+        mensal.
+        """
+        inicio, fim = self._intervalo_datas()
+        if inicio is not None and not inicio.endswith("-01"):
+            return False
+        return fim is None or int(fim[8:]) == monthrange(int(fim[:4]), int(fim[5:7]))[1]
+
+    def criterios(self):
+        """
+        Retorna os critérios preenchidos, por nome de CAMPOS_FILTRO (por
+        exemplo, para enviar o filtro à API).
+        """
+        return {campo: getattr(self, campo) for campo in CAMPOS_FILTRO if getattr(self, campo)}
+
+    def mesmo_filtro(self, outro):
+        """
+        Retorna True se o outro filtro tiver exatamente os mesmos critérios.
+        """
+        return outro is not None and (self.condicoes, self.params, self.anos_arquivados) == (outro.condicoes, outro.params, outro.anos_arquivados)
+
+    def buscar_ids(self, conn):
+        """
+        Busca os ids dos registros que atendem ao filtro, para serem guardados
+        em self.ids. Retorna None para resultados maiores que
+        LIMITE_IDS_RESULTADO, pois repetir a consulta custa menos que carregar
+        a lista de ids.
+        """
+        with medir("sql: ids do filtro") as medicao:
+            query, params = self.selecao("id", complemento=" LIMIT ?")
+            cursor = conn.cursor()
+            cursor.execute(query, [*params, LIMITE_IDS_RESULTADO + 1])
+            ids = [row[0] for row in cursor.fetchall()]
+            medicao["linhas"] = len(ids)
+        return ids if len(ids) <= LIMITE_IDS_RESULTADO else None
+
+    def selecao(self, colunas, condicoes="", params=(), complemento="", usar_ids=False, juncao=""):
+        """
+        Monta um SELECT sobre os registros do filtro com condições adicionais
+        (iniciadas por " AND"); com usar_ids, filtra pelos ids guardados, se
+        houver. A juncao, sem anos arquivados, vem antes da tabela no FROM. Com anos arquivados, cada partição é filtrada em separado, o
+        que permite ao SQLite usar os índices de cada uma, e os resultados são
+        unidos com UNION ALL antes do complemento (ORDER BY, LIMIT, ...).
+        Retorna uma tupla (query, params).
+        """
+        particoes = [("producao", self.condicoes, self.params)]
+        particoes += [(f"producao_{ano}", *self._condicoes_anos[ano]) for ano in self.anos_arquivados]
+        if usar_ids and self.ids is not None:
+            ids = json.dumps(self.ids)
+            particoes = [(tabela, " AND id IN (SELECT value FROM json_each(?))", [ids]) for tabela, _, _ in particoes]
+        if len(particoes) == 1:
+            tabela, condicoes_filtro, params_filtro = particoes[0]
+            return f"SELECT {colunas} FROM {juncao}{tabela} WHERE 1=1{condicoes}{condicoes_filtro}{complemento}", [*params, *params_filtro]
+        partes = []
+        todos_params = []
+        for tabela, condicoes_filtro, params_filtro in particoes:
+            partes.append(f"SELECT {COLUNAS_PARTICAO} FROM {tabela} WHERE 1=1{condicoes}{condicoes_filtro}")
+            todos_params += [*params, *params_filtro]
+        return f"SELECT {colunas} FROM ({' UNION ALL '.join(partes)}){complemento}", todos_params
+
+    def consulta(self, colunas, complemento=""):
+        """
+        Monta um SELECT sobre os registros do filtro.
+        Usa os ids guardados do último resultado, quando houver.
+        Retorna uma tupla (query, params).
+        """
+        return self.selecao(colunas, complemento=complemento, usar_ids=True)
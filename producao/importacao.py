@@ -0,0 +1,288 @@
+"""
+Importação em lote de registros de produção a partir de planilhas e CSV.
+
+O arquivo é lido em fluxo (CSV com o módulo csv, Excel com o openpyxl em modo
+somente leitura), validado em lotes com as mesmas regras do formulário e
+gravado com executemany em uma única transação, direto em registros_producao
+(os nomes de PA, colaborador, produto e status viram ids por um cache em
+memória). Durante a importação os
+gatilhos de inserção (índice de busca e resumo diário) ficam suspensos e os
+registros novos são indexados de uma vez ao final, o que é bem mais rápido
+que indexar linha a linha.
+Com o índice de duplicidade único, a gravação é um upsert (INSERT ... ON
+CONFLICT): uma linha com o cliente, produto e data de um registro existente o
+atualiza em vez de duplicá-lo, então importar de novo a mesma planilha não
+infla os relatórios.
+As linhas rejeitadas são gravadas, com o motivo, em um relatório CSV ao lado
+do arquivo importado.
+"""
+import csv
+import os
+import re
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from .dimensoes import CacheDimensoes
+from .esquema import CHAVE_DUPLICIDADE, GATILHOS_INSERCAO, criar_gatilhos, indice_unico_ativo, indexar_registros
+from .validacao import remover_acentos, validar_lote
+
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+# Inserção direta em registros_producao, com os valores de CacheDimensoes.linha_normalizada
+SQL_INSERIR_REGISTRO = '''
+    INSERT INTO registros_producao (pa_id, colaborador_id, data, cpf_cnpj, cliente, produto_id, status_id, valor_centavos, observacoes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Colunas que o upsert atualiza; as demais formam a CHAVE_DUPLICIDADE
+COLUNAS_ATUALIZADAS = ("pa_id", "colaborador_id", "cpf_cnpj", "cliente", "status_id", "valor_centavos", "observacoes")
+# Upsert pela chave de duplicidade, com o último id anterior à importação
+# como parâmetro extra: só registros já existentes são atualizados (e só se
+# algo mudou); uma linha repetida dentro do próprio arquivo é ignorada, pois
+# o registro que ela atualizaria ainda não está no resumo nem no índice de busca
+SQL_GRAVAR_REGISTRO = SQL_INSERIR_REGISTRO.rstrip() + f'''
+    ON CONFLICT ({', '.join(CHAVE_DUPLICIDADE)}) DO UPDATE SET
+        {', '.join(f'{coluna} = excluded.{coluna}' for coluna in COLUNAS_ATUALIZADAS)}
+    WHERE id <= ? AND ({', '.join(COLUNAS_ATUALIZADAS)}) IS NOT ({', '.join(f'excluded.{coluna}' for coluna in COLUNAS_ATUALIZADAS)})
+'''
+
+# Campos importados, na ordem de normalizar_registro; observacoes é opcional
+CAMPOS_IMPORTACAO = ("pa", "colaborador", "data", "cpf_cnpj", "cliente", "produto", "status", "valor", "observacoes")
+CAMPOS_OBRIGATORIOS = CAMPOS_IMPORTACAO[:-1]
+
+# Outros nomes aceitos no cabeçalho (já normalizados por _normalizar_cabecalho)
+SINONIMOS_CABECALHO = {
+    "nome_do_colaborador": "colaborador",
+    "cpf": "cpf_cnpj",
+    "cnpj": "cpf_cnpj",
+    "cpf_cnpj_do_cliente": "cpf_cnpj",
+    "documento": "cpf_cnpj",
+    "nome_do_cliente": "cliente",
+    "produto_adquirido": "produto",
+    "valor_captado": "valor",
+    "valor_captado_r$": "valor",
+    "observacao": "observacoes",
+}
+
+FORMATO_DATA_ISO = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ResultadoImportacao:
+    """
+    Resumo de uma importação: linhas lidas, importadas (registros novos),
+    atualizadas (registros existentes com o mesmo cliente, produto e data),
+    ignoradas (iguais a um registro existente ou repetidas no arquivo) e
+    rejeitadas, e o caminho do relatório de rejeitadas (None se não houve
+    rejeição).
+    """
+
+    def __init__(self):
+        self.lidas = 0
+        self.importadas = 0
+        self.atualizadas = 0
+        self.ignoradas = 0
+        self.rejeitadas = 0
+        self.caminho_rejeitados = None
+
+
+def _normalizar_cabecalho(nome):
+    """
+    Normaliza um nome de coluna: minúsculas, sem acentos e com "_" no lugar
+    de espaços e barras (ex.: "CPF/CNPJ" vira "cpf_cnpj").
+    """
+    nome = remover_acentos(str(nome or "").strip().upper()).lower()
+    nome = re.sub(r"[\s/\-]+", "_", nome)
+    return re.sub(r"[()]", "", nome).strip("_")
+
+
+def _mapear_colunas(cabecalho):
+    """
+    Retorna a posição de cada campo importado no cabeçalho (None para
+    observacoes ausente); lança ValueError se faltar um campo obrigatório.
+    """
+    posicoes = {}
+    for posicao, nome in enumerate(cabecalho):
+        nome = _normalizar_cabecalho(nome)
+        campo = SINONIMOS_CABECALHO.get(nome, nome)
+        if campo in CAMPOS_IMPORTACAO and campo not in posicoes:
+            posicoes[campo] = posicao
+    faltando = [campo for campo in CAMPOS_OBRIGATORIOS if campo not in posicoes]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(faltando)}")
+    return [posicoes.get(campo) for campo in CAMPOS_IMPORTACAO]
+
+
+def _texto_celula(campo, valor):
+    """
+    Converte o valor de uma célula no texto esperado pela validação.
+    Datas do Excel e datas ISO viram DD-MM-AAAA; documentos numéricos
+    recuperam os zeros à esquerda perdidos pela planilha.
+    """
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d-%m-%Y")
+    if campo == "cpf_cnpj" and isinstance(valor, (int, float)):
+        digitos = str(int(valor))
+        return digitos.zfill(11 if len(digitos) <= 11 else 14)
+    texto = str(valor).strip()
+    if campo == "data" and FORMATO_DATA_ISO.match(texto):
+        return f"{texto[8:10]}-{texto[5:7]}-{texto[0:4]}"
+    return texto
+
+
+def _linhas_csv(caminho, codificacao):
+    """
+    Lê as linhas de um arquivo CSV, detectando o separador (";", "," ou tabulação).
+    """
+    with open(caminho, newline="", encoding=codificacao) as arquivo:
+        amostra = arquivo.read(64 * 1024)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(arquivo, dialeto)
+
+
+def _linhas_excel(caminho):
+    """
+    Lê as linhas da primeira planilha de um arquivo Excel em modo somente leitura.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def ler_arquivo(caminho, codificacao="utf-8-sig"):
+    """
+    Lê um arquivo CSV ou Excel (.xlsx) com cabeçalho, em fluxo.
+    Gera tuplas (número da linha no arquivo, campos na ordem de
+    CAMPOS_IMPORTACAO); linhas totalmente vazias são ignoradas.
+    """
+    if os.path.splitext(caminho)[1].lower() in (".xlsx", ".xlsm"):
+        linhas = _linhas_excel(caminho)
+    else:
+        linhas = _linhas_csv(caminho, codificacao)
+    try:
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            raise ValueError("O arquivo está vazio.")
+        posicoes = _mapear_colunas(cabecalho)
+        for numero, linha in enumerate(linhas, start=2):
+            if not any(valor not in (None, "") for valor in linha):
+                continue
+            yield numero, tuple(
+                _texto_celula(campo, linha[posicao] if posicao is not None and posicao < len(linha) else None)
+                for campo, posicao in zip(CAMPOS_IMPORTACAO, posicoes)
+            )
+    finally:
+        linhas.close()
+
+
+def caminho_rejeitados(caminho):
+    """
+    Retorna o caminho padrão do relatório de linhas rejeitadas de um arquivo.
+    """
+    return os.path.splitext(caminho)[0] + ".rejeitados.csv"
+
+
+class _RelatorioRejeitados:
+    """
+    Relatório CSV das linhas rejeitadas, criado apenas na primeira rejeição.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.arquivo = None
+        self.escritor = None
+
+    def escrever(self, numero, campos, erro):
+        if self.arquivo is None:
+            self.arquivo = open(self.caminho, "w", newline="", encoding="utf-8-sig")
+            self.escritor = csv.writer(self.arquivo, delimiter=";")
+            self.escritor.writerow(("linha", *CAMPOS_IMPORTACAO, "erro"))
+        self.escritor.writerow((numero, *campos, erro))
+
+    def fechar(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+
+
+@contextmanager
+def insercao_em_lote(conn):
+    """
+    Abre a transação de uma inserção em lote em registros_producao, com os
+    gatilhos de inserção suspensos. Fornece o CacheDimensoes da transação;
+    ao sair do bloco, os registros novos são indexados, os gatilhos
+    recriados e a transação confirmada (ou desfeita, em caso de erro).
+    """
+    with conn:
+        # DDL não abre transação sozinha: a suspensão do gatilho precisa
+        # estar na mesma transação das inserções para ser desfeita junto
+        conn.execute("BEGIN IMMEDIATE")
+        ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM registros_producao").fetchone()[0]
+        for gatilho in GATILHOS_INSERCAO:
+            conn.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+        yield CacheDimensoes(conn)  # lido dentro da transação
+        indexar_registros(conn, ultimo_id, conn.execute("SELECT COALESCE(MAX(id), 0) FROM registros_producao").fetchone()[0])
+        criar_gatilhos(conn)
+
+
+def importar_arquivo(conn, caminho, caminho_relatorio=None, codificacao="utf-8-sig",
+                     tamanho_lote=TAMANHO_LOTE_IMPORTACAO, ao_lote=None):
+    """
+    Importa os registros de um arquivo CSV ou Excel para a tabela de produção.
+    As linhas são validadas e gravadas em lotes, todos na mesma transação:
+    se a importação falhar ou for interrompida, nada é gravado. Linhas de
+    registros já existentes os atualizam, se o índice de duplicidade for
+    único (veja ResultadoImportacao). As linhas
+    inválidas não interrompem a importação; vão para o relatório de
+    rejeitadas (por padrão, caminho_rejeitados(caminho)).
+    ao_lote(resultado), se informado, é chamado após cada lote; uma exceção
+    lançada por ele interrompe a importação.
+    Retorna um ResultadoImportacao.
+    """
+    resultado = ResultadoImportacao()
+    relatorio = _RelatorioRejeitados(caminho_relatorio or caminho_rejeitados(caminho))
+
+    def gravar_lote(lote, dimensoes):
+        validos, rejeitados = validar_lote([campos for numero, campos in lote])
+        linhas = [dimensoes.linha_normalizada(registro) for registro in validos]
+        id_anterior = conn.execute("SELECT COALESCE(MAX(id), 0) FROM registros_producao").fetchone()[0]
+        if upsert:
+            gravadas = conn.executemany(SQL_GRAVAR_REGISTRO, [(*linha, ultimo_id) for linha in linhas]).rowcount
+        else:
+            gravadas = conn.executemany(SQL_INSERIR_REGISTRO, linhas).rowcount
+        # O rowcount soma inserções e atualizações; as novas são as de id maior
+        novas = conn.execute("SELECT COUNT(*) FROM registros_producao WHERE id > ?", (id_anterior,)).fetchone()[0]
+        for posicao, erro in rejeitados:
+            relatorio.escrever(*lote[posicao], erro)
+        resultado.lidas += len(lote)
+        resultado.importadas += novas
+        resultado.atualizadas += gravadas - novas
+        resultado.ignoradas += len(validos) - gravadas
+        resultado.rejeitadas += len(rejeitados)
+        if ao_lote is not None:
+            ao_lote(resultado)
+
+    try:
+        with insercao_em_lote(conn) as dimensoes:
+            upsert = indice_unico_ativo(conn)
+            ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM registros_producao").fetchone()[0]
+            lote = []
+            for linha in ler_arquivo(caminho, codificacao):
+                lote.append(linha)
+                if len(lote) >= tamanho_lote:
+                    gravar_lote(lote, dimensoes)
+                    lote = []
+            if lote:
+                gravar_lote(lote, dimensoes)
+    finally:
+        relatorio.fechar()
+    if relatorio.arquivo is not None:
+        resultado.caminho_rejeitados = relatorio.caminho
+    return resultado
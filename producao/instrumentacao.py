@@ -0,0 +1,139 @@
+"""
+Medição de tempo das consultas e das etapas da interface.
+
+Desativada por padrão: medir() devolve um objeto nulo e nada é registrado.
+Para ativar, defina a variável de ambiente PRODUCAO_DIAGNOSTICO=1. As medições
+vão para um log rotativo (PRODUCAO_DIAGNOSTICO_LOG, padrão
+producao_diagnostico.log) e ficam em memória para a janela de diagnóstico.
+Consultas mais lentas que PRODUCAO_CONSULTA_LENTA_MS (padrão 100 ms) têm o
+plano de execução (EXPLAIN QUERY PLAN) registrado.
+"""
+import logging
+import os
+import re
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+
+ATIVA = os.environ.get("PRODUCAO_DIAGNOSTICO", "") not in ("", "0")
+ARQUIVO_LOG = os.environ.get("PRODUCAO_DIAGNOSTICO_LOG", "producao_diagnostico.log")
+LIMITE_CONSULTA_LENTA_MS = float(os.environ.get("PRODUCAO_CONSULTA_LENTA_MS", "100"))
+TAMANHO_LOG = 1024 * 1024
+ARQUIVOS_LOG_MANTIDOS = 3
+TAMANHO_SQL_LOG = 300
+
+# Últimas medições, exibidas na janela de diagnóstico
+ultimas_medicoes = deque(maxlen=500)
+
+_logger = None
+_trava = threading.Lock()
+
+
+def _obter_logger():
+    """
+    Configura o log rotativo na primeira medição registrada.
+    """
+    global _logger
+    with _trava:
+        if _logger is None:
+            logger = logging.getLogger("producao.diagnostico")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(ARQUIVO_LOG, maxBytes=TAMANHO_LOG, backupCount=ARQUIVOS_LOG_MANTIDOS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s [%(threadName)s] %(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def resumir_sql(query):
+    """
+    Retorna o SQL em uma linha, truncado para o log.
+    """
+    query = re.sub(r"\s+", " ", query).strip()
+    return query if len(query) <= TAMANHO_SQL_LOG else query[:TAMANHO_SQL_LOG] + "..."
+
+
+def registrar(nome, duracao_ms, **detalhes):
+    """
+    Registra uma medição no log e na lista de últimas medições.
+    """
+    if not ATIVA:
+        return
+    texto = f"{nome}: {duracao_ms:.1f} ms"
+    if detalhes:
+        texto += " " + " ".join(f"{chave}={valor}" for chave, valor in detalhes.items())
+    ultimas_medicoes.append(texto)
+    _obter_logger().info(texto)
+
+
+class _Medicao:
+    """
+    Mede o tempo de um bloco "with"; detalhes podem ser acrescentados com
+    medicao["chave"] = valor dentro do bloco.
+    """
+
+    def __init__(self, nome, detalhes):
+        self.nome = nome
+        self.detalhes = detalhes
+        self.duracao_ms = 0.0
+
+    def __enter__(self):
+        self.inicio = perf_counter()
+        return self
+
+    def __setitem__(self, chave, valor):
+        self.detalhes[chave] = valor
+
+    def __exit__(self, tipo, erro, rastreamento):
+        self.duracao_ms = (perf_counter() - self.inicio) * 1000
+        if tipo is not None:
+            self.detalhes["erro"] = tipo.__name__
+        registrar(self.nome, self.duracao_ms, **self.detalhes)
+        return False
+
+
+class _MedicaoNula:
+    """
+    Medição usada quando o diagnóstico está desativado: não faz nada.
+    """
+    duracao_ms = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __setitem__(self, chave, valor):
+        pass
+
+    def __exit__(self, tipo, erro, rastreamento):
+        return False
+
+
+_MEDICAO_NULA = _MedicaoNula()
+
+
+def medir(nome, **detalhes):
+    """
+    Retorna um gerenciador de contexto que mede o tempo do bloco "with".
+    """
+    if not ATIVA:
+        return _MEDICAO_NULA
+    return _Medicao(nome, detalhes)
+
+
+def explicar_se_lenta(conn, query, params, duracao_ms):
+    """
+    Registra o plano de execução de uma consulta que levou mais que
+    LIMITE_CONSULTA_LENTA_MS.
+    """
+    if not ATIVA or duracao_ms < LIMITE_CONSULTA_LENTA_MS:
+        return
+    try:
+        plano = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    except Exception as erro:  # O plano é só informativo
+        plano = [(0, 0, 0, f"plano indisponível: {erro}")]
+    linhas = "\n".join(f"    {detalhe}" for _, _, _, detalhe in plano)
+    registrar("consulta lenta", duracao_ms, sql=resumir_sql(query))
+    _obter_logger().info("plano de execução:\n%s", linhas)
+    ultimas_medicoes.append("plano de execução:\n" + linhas)
@@ -0,0 +1,316 @@
+"""
+Arquivamento dos anos encerrados em bancos separados, um por ano.
+
+Os registros de um ano fechado podem ser movidos do banco principal para
+producao_AAAA.db, ao lado dele. Assim o banco principal guarda só os anos em
+uso, e as consultas, os backups e o VACUUM deixam de pagar por todo o
+histórico. Cada arquivo de ano tem sua tabela registros_producao (com os
+mesmos ids e os ids das dimensões do banco principal) e seu índice de busca.
+
+Cada conexão obtida do GerenciadorConexoes anexa (ATTACH) os arquivos
+existentes como arquivo_AAAA e cria visões temporárias: producao_AAAA, com as
+colunas da visão producao, e producao_completa, a união (UNION ALL) do banco
+principal com todos os anos arquivados, para leituras que atravessam os
+anos. Os filtros leem apenas os anos arquivados que se sobrepõem ao seu
+intervalo de datas (anos_no_intervalo), cada um filtrado em separado.
+
+Um ano pode ser arquivado com o banco em uso, inclusive por outro processo:
+os anos conhecidos são relidos da pasta do banco quando ela muda, e cada
+conexão anexa os que lhe faltam sempre que é obtida, antes de executar a
+próxima tarefa. O arquivo de um ano só aparece na pasta já com suas tabelas.
+
+Os resumos diário e mensal continuam completos no banco principal, então
+os relatórios sem texto livre não leem os arquivos. Os anos arquivados são
+somente leitura.
+
+Uso: python -m producao [--banco ARQUIVO] arquivar ANO [--compactar]
+"""
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from .esquema import COLUNAS_BUSCA, GATILHOS_ARQUIVAMENTO, TABELAS_DIMENSOES, criar_gatilhos, sql_documento, sql_selecao_producao
+
+# O SQLite anexa no máximo 10 bancos a uma conexão (SQLITE_MAX_ATTACHED)
+MAXIMO_PARTICOES = 10
+PREFIXO_ESQUEMA = "arquivo_"
+# Colunas copiadas para os arquivos de anos (sem as colunas geradas)
+COLUNAS_ARQUIVADAS = "id, pa_id, colaborador_id, data, cpf_cnpj, cliente, produto_id, status_id, valor_centavos, observacoes"
+
+# Relê a pasta do banco após este intervalo mesmo sem mudança na data de
+# modificação, que em alguns sistemas de arquivos tem resolução de segundos
+INTERVALO_VERIFICACAO = 5
+
+# Arquivos de anos conhecidos do banco em uso neste processo ({ano: caminho});
+# só crescem, para que um ano já usado em uma consulta continue anexável
+_particoes_conhecidas = {}
+_banco_conhecido = None
+_verificacao = (None, 0.0)  # (modificação da pasta, instante) da última leitura
+_trava_anos = threading.Lock()
+
+
+def caminho_particao(caminho_banco, ano):
+    """
+    Retorna o caminho do arquivo do ano ao lado do banco (producao_AAAA.db).
+    """
+    raiz, extensao = os.path.splitext(caminho_banco)
+    return f"{raiz}_{ano}{extensao}"
+
+
+def listar_particoes(caminho_banco):
+    """
+    Retorna um dicionário {ano: caminho} com os arquivos de anos existentes,
+    em ordem de ano.
+    """
+    raiz, extensao = os.path.splitext(caminho_banco)
+    padrao = re.compile(re.escape(raiz) + r"_(\d{4})" + re.escape(extensao) + "$")
+    particoes = {}
+    for caminho in glob.glob(f"{glob.escape(raiz)}_[0-9][0-9][0-9][0-9]{glob.escape(extensao)}"):
+        correspondencia = padrao.match(caminho)
+        if correspondencia:
+            particoes[int(correspondencia.group(1))] = caminho
+    return dict(sorted(particoes.items()))
+
+
+def atualizar_particoes(caminho_banco):
+    """
+    Relê os arquivos de anos do banco se a pasta mudou desde a última
+    leitura (ou após INTERVALO_VERIFICACAO).
+    Retorna um dicionário {ano: caminho} com os anos conhecidos, em ordem.
+    """
+    global _banco_conhecido, _verificacao
+    pasta = os.path.dirname(os.path.abspath(caminho_banco))
+    try:
+        modificacao = os.stat(pasta).st_mtime_ns
+    except OSError:
+        modificacao = None
+    agora = time.monotonic()
+    with _trava_anos:
+        if caminho_banco != _banco_conhecido:
+            _particoes_conhecidas.clear()
+            _banco_conhecido = caminho_banco
+            _verificacao = (None, 0.0)
+        elif _verificacao[0] == modificacao and agora - _verificacao[1] < INTERVALO_VERIFICACAO:
+            return dict(_particoes_conhecidas)
+    particoes = listar_particoes(caminho_banco)
+    with _trava_anos:
+        if caminho_banco == _banco_conhecido:
+            _particoes_conhecidas.update(particoes)
+            _verificacao = (modificacao, agora)
+        particoes = dict(sorted(_particoes_conhecidas.items())) if caminho_banco == _banco_conhecido else particoes
+    return particoes
+
+
+def anos_arquivados():
+    """
+    Retorna os anos arquivados do banco em uso, em ordem.
+    """
+    with _trava_anos:
+        caminho_banco = _banco_conhecido
+    if caminho_banco is None:
+        return ()
+    return tuple(atualizar_particoes(caminho_banco))
+
+
+def esquema_particao(ano):
+    """
+    Retorna o nome com que o arquivo do ano é anexado às conexões.
+    """
+    return f"{PREFIXO_ESQUEMA}{ano}"
+
+
+def _anexar(conn, ano, caminho, criar=False):
+    """
+    Anexa o arquivo de um ano à conexão e cria sua visão temporária; com
+    criar, cria antes as tabelas do arquivo, se ainda não existirem.
+    """
+    anexados = {linha[1] for linha in conn.execute("PRAGMA database_list")}
+    if esquema_particao(ano) not in anexados:
+        conn.execute("ATTACH DATABASE ? AS " + esquema_particao(ano), (caminho,))
+    if criar:
+        _criar_esquema_particao(conn, ano)
+        conn.commit()
+    conn.execute(f"CREATE TEMP VIEW IF NOT EXISTS producao_{ano} AS {sql_selecao_producao(f'{esquema_particao(ano)}.registros_producao')}")
+
+
+def _criar_visao_completa(conn, anos):
+    """
+    Recria a visão temporária producao_completa com os anos informados.
+    """
+    conn.execute("DROP VIEW IF EXISTS temp.producao_completa")
+    conn.execute(f"CREATE TEMP VIEW producao_completa AS {_sql_uniao(anos)}")
+
+
+def _sql_uniao(anos):
+    return " UNION ALL ".join(["SELECT * FROM main.producao"] + [f"SELECT * FROM producao_{ano}" for ano in anos])
+
+
+def anexar_particoes(conn, caminho_banco, anexados=frozenset()):
+    """
+    Anexa à conexão os arquivos de anos que ainda não estão em anexados e
+    recria as visões temporárias. Chamada pelo GerenciadorConexoes sempre
+    que entrega uma conexão; com uma transação aberta, deixa para a próxima.
+    Retorna o conjunto de anos anexados à conexão.
+    """
+    if caminho_banco.startswith(":") or caminho_banco.startswith("file:"):
+        return anexados  # Bancos em memória ou por URI não têm arquivos de anos
+    particoes = atualizar_particoes(caminho_banco)
+    if anexados.issuperset(particoes) or conn.in_transaction:
+        return anexados
+    for ano, caminho in particoes.items():
+        if ano not in anexados:
+            _anexar(conn, ano, caminho)
+    _criar_visao_completa(conn, particoes)
+    return frozenset(particoes)
+
+
+def anos_no_intervalo(inicio=None, fim=None):
+    """
+    Retorna os anos arquivados que se sobrepõem ao intervalo de datas ISO
+    [inicio, fim] (sem limite nos extremos None), as partições que uma
+    consulta nesse intervalo precisa ler além do banco principal.
+    """
+    return tuple(
+        ano for ano in anos_arquivados()
+        if (inicio is None or f"{ano:04d}-12-31" >= inicio) and (fim is None or f"{ano:04d}-01-01" <= fim)
+    )
+
+
+def fonte_registros():
+    """
+    Retorna a visão com todos os registros, inclusive os dos anos
+    arquivados (producao_completa), ou producao se não houver nenhum.
+    """
+    return "producao_completa" if anos_arquivados() else "producao"
+
+
+def verificar_nao_arquivados(conn, ids):
+    """
+    Lança ValueError se algum dos registros estiver em um ano arquivado,
+    que é somente leitura.
+    """
+    for ano in anos_arquivados():
+        arquivados = conn.execute(
+            f"SELECT id FROM {esquema_particao(ano)}.registros_producao WHERE id IN (SELECT value FROM json_each(?)) LIMIT 1",
+            (json.dumps(list(ids)),),
+        ).fetchone()
+        if arquivados is not None:
+            raise ValueError(f"O registro {arquivados[0]} pertence ao ano arquivado de {ano} e não pode ser alterado.")
+
+
+def _criar_esquema_particao(conn, ano):
+    """
+    Cria no arquivo do ano a tabela de registros, seus índices e o índice de
+    busca, se ainda não existirem.
+    """
+    esquema = esquema_particao(ano)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {esquema}.registros_producao (
+            id INTEGER PRIMARY KEY,
+            pa_id INTEGER NOT NULL,
+            colaborador_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            cpf_cnpj TEXT NOT NULL,
+            cliente TEXT NOT NULL,
+            produto_id INTEGER NOT NULL,
+            status_id INTEGER NOT NULL,
+            valor_centavos INTEGER,
+            observacoes TEXT
+        )
+    ''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_registros_data ON registros_producao (data)")
+    for coluna in TABELAS_DIMENSOES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_registros_{coluna}_data ON registros_producao ({coluna}_id, data)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_registros_valor ON registros_producao (valor_centavos)")
+    # A tabela arquivada não tem a coluna gerada documento; o índice é sobre a expressão
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_registros_documento ON registros_producao ({sql_documento('cpf_cnpj')})")
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {esquema}.producao_busca USING fts5({', '.join(COLUNAS_BUSCA)}, tokenize='trigram')")
+
+
+def _criar_arquivo_particao(caminho, ano):
+    """
+    Cria o arquivo do ano com suas tabelas em um arquivo temporário e só
+    então o renomeia para o nome definitivo, para que as outras conexões
+    nunca anexem um arquivo sem as tabelas.
+    """
+    temporario = caminho + ".tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("ATTACH DATABASE ? AS " + esquema_particao(ano), (temporario,))
+        _criar_esquema_particao(conn, ano)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(temporario, caminho)
+
+
+def arquivar_ano(conn, caminho_banco, ano, ao_progredir=None):
+    """
+    Move os registros de um ano encerrado do banco principal para o arquivo
+    do ano, um mês por transação. Cada mês é copiado (com INSERT OR IGNORE)
+    e só então excluído do banco principal, então o arquivamento pode ser
+    interrompido e executado novamente sem perda de dados. Os resumos não
+    são alterados (continuam contando os registros arquivados), e a mudança
+    não entra no histórico de alterações.
+    ao_progredir(meses, 12) é chamado após cada mês.
+    Retorna a quantidade de registros movidos.
+    """
+    if ano >= date.today().year:
+        raise ValueError(f"Só anos encerrados podem ser arquivados; {ano} ainda está em uso.")
+    particoes = listar_particoes(caminho_banco)
+    if ano not in particoes and len(particoes) >= MAXIMO_PARTICOES:
+        raise ValueError(f"Já existem {len(particoes)} anos arquivados, o máximo que o SQLite consegue anexar.")
+
+    caminho = caminho_particao(caminho_banco, ano)
+    if not os.path.exists(caminho):
+        _criar_arquivo_particao(caminho, ano)
+    _anexar(conn, ano, caminho, criar=True)
+    esquema = esquema_particao(ano)
+
+    colunas_busca = ", ".join(COLUNAS_BUSCA)
+    movidos = 0
+    for mes in range(1, 13):
+        intervalo = (f"{ano:04d}-{mes:02d}-01", f"{ano:04d}-{mes:02d}-31")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f'''
+                INSERT OR IGNORE INTO {esquema}.registros_producao ({COLUNAS_ARQUIVADAS})
+                SELECT {COLUNAS_ARQUIVADAS} FROM main.registros_producao WHERE data BETWEEN ? AND ?
+            ''', intervalo)
+            conn.execute(f'''
+                INSERT OR REPLACE INTO {esquema}.producao_busca (rowid, {colunas_busca})
+                SELECT rowid, {colunas_busca} FROM main.producao_busca
+                WHERE rowid IN (SELECT id FROM main.registros_producao WHERE data BETWEEN ? AND ?)
+            ''', intervalo)
+            # Os registros arquivados continuam no resumo e não são exclusões no histórico
+            for gatilho in GATILHOS_ARQUIVAMENTO:
+                conn.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+            cursor = conn.execute(f'''
+                DELETE FROM main.registros_producao
+                WHERE data BETWEEN ? AND ?
+                AND id IN (SELECT id FROM {esquema}.registros_producao WHERE data BETWEEN ? AND ?)
+            ''', intervalo * 2)
+            movidos += cursor.rowcount
+            criar_gatilhos(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if ao_progredir is not None:
+            ao_progredir(mes, 12)
+
+    # As exclusões deixam marcas no índice de busca até que seus segmentos sejam fundidos
+    with conn:
+        for esquema_busca in ("main", esquema):
+            conn.execute(f"INSERT INTO {esquema_busca}.producao_busca (producao_busca) VALUES ('optimize')")
+    # As demais conexões anexam o novo ano na próxima vez que forem obtidas
+    anos = [int(nome[len(PREFIXO_ESQUEMA):]) for _, nome, _ in conn.execute("PRAGMA database_list") if nome.startswith(PREFIXO_ESQUEMA)]
+    _criar_visao_completa(conn, sorted(anos))
+    return movidos
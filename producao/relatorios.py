@@ -0,0 +1,130 @@
+"""
+Relatórios de produção calculados no banco de dados.
+
+Cada relatório agrupa os registros do filtro por dimensões (PA, colaborador,
+produto, status) e, opcionalmente, por período (mês ou semana), e calcula em
+uma única consulta a quantidade, o total, a média, a posição no ranking do
+período e a variação em relação ao período anterior.
+
+Filtros sem texto livre (apenas PA e datas) são respondidos pelos resumos.
+O diário tem quase uma linha por registro (são poucos os registros de um
+mesmo dia, PA, colaborador, produto e status), então poupa pouco em relação
+aos registros. O mensal totaliza cada dimensão à parte por mês e PA e tem
+poucas linhas por mês; responde aos relatórios de meses inteiros, por mês
+ou sem período, agrupados por PA e no máximo uma outra dimensão. Os demais
+são calculados sobre o diário ou, com texto livre, sobre os registros.
+"""
+from .esquema import DIMENSOES_RESUMO_MENSAL
+from .repositorio import consultar
+
+# Dimensões de agrupamento, pelo nome exibido, e a coluna correspondente
+DIMENSOES_RELATORIO = {
+    "PA": "pa",
+    "Colaborador": "colaborador",
+    "Produto": "produto",
+    "Status": "status",
+}
+
+# Períodos de agrupamento, pelo nome exibido, e a expressão sobre a data ISO
+PERIODOS_RELATORIO = {
+    "Mês": "substr(data, 1, 7)",
+    "Semana": "strftime('%Y-S%W', data)",
+}
+
+# Períodos que o resumo mensal consegue agrupar
+PERIODOS_RESUMO_MENSAL = (None, "Mês")
+
+# Colunas de valores monetários do resultado, em centavos
+COLUNAS_CENTAVOS = ("total_centavos", "media_centavos", "variacao_centavos")
+
+
+class ConsultaRelatorio:
+    """
+    Consulta SQL de um relatório e os nomes das colunas do resultado.
+    A mesma consulta serve para exibir e para exportar o relatório. Guarda
+    também as opções com que foi montada, para repeti-la pela API.
+    """
+
+    def __init__(self, query, params, colunas, filtro=None, dimensoes=(), periodo=None, limite=None):
+        self.query = query
+        self.params = params
+        self.colunas = colunas
+        self.filtro = filtro
+        self.dimensoes = dimensoes
+        self.periodo = periodo
+        self.limite = limite
+
+
+def _fonte_resumo(filtro, colunas_dimensoes, periodo):
+    """
+    Retorna o resumo que responde ao relatório: o mensal, se o filtro cobrir
+    meses inteiros, o período for o mês (ou nenhum) e, além do PA, houver no
+    máximo uma dimensão; senão, o diário. O mensal é lido pelas linhas da
+    dimensão agrupada (ou das de status, que têm menos linhas e somam o mesmo
+    total), com o nome na coluna da dimensão.
+    """
+    outras = [coluna for coluna in colunas_dimensoes if coluna != "pa"]
+    if len(outras) > 1 or periodo not in PERIODOS_RESUMO_MENSAL or not filtro.meses_inteiros:
+        return "producao_resumo_diario"
+    dimensao = outras[0] if outras else "status"
+    if dimensao not in DIMENSOES_RESUMO_MENSAL:
+        return "producao_resumo_diario"
+    return (
+        f"(SELECT data, pa, nome AS {dimensao}, quantidade, total_centavos "
+        f"FROM producao_resumo_mensal WHERE dimensao = '{dimensao}')"
+    )
+
+
+def montar_relatorio(filtro, dimensoes=("Colaborador",), periodo=None, limite=None):
+    """
+    Monta a consulta do relatório dos registros do filtro.
+    dimensoes são nomes de DIMENSOES_RELATORIO e periodo um nome de
+    PERIODOS_RELATORIO (ou None). Com limite, só os limite primeiros do
+    ranking de cada período entram no resultado. A variação compara cada grupo
+    com o período anterior em que ele teve produção.
+    Retorna uma ConsultaRelatorio com as colunas: período (se houver), as
+    dimensões, quantidade, total_centavos, media_centavos, posicao e
+    variacao_centavos (se houver período).
+    """
+    colunas_dimensoes = [DIMENSOES_RELATORIO[dimensao] for dimensao in dimensoes]
+    grupo = ([f"{PERIODOS_RELATORIO[periodo]} AS periodo"] if periodo else []) + colunas_dimensoes
+    chaves = (["periodo"] if periodo else []) + colunas_dimensoes
+    agrupamento = f" GROUP BY {', '.join(chaves)}" if chaves else ""
+
+    if filtro.usa_texto_livre:
+        agregados, params = filtro.consulta(
+            ", ".join(grupo + ["COUNT(*) AS quantidade", "COALESCE(SUM(valor_centavos), 0) AS total"]), agrupamento
+        )
+    else:
+        # As condições de PA e data valem igualmente para os resumos
+        selecao = ", ".join(grupo + ["SUM(quantidade) AS quantidade", "SUM(total_centavos) AS total"])
+        agregados = f"SELECT {selecao} FROM {_fonte_resumo(filtro, colunas_dimensoes, periodo)} WHERE 1=1{filtro.condicoes}{agrupamento}"
+        params = list(filtro.params)
+
+    particao_periodo = "PARTITION BY periodo " if periodo else ""
+    calculos = [
+        "quantidade",
+        "total AS total_centavos",
+        "CAST(ROUND(total * 1.0 / quantidade) AS INTEGER) AS media_centavos",
+        f"RANK() OVER ({particao_periodo}ORDER BY total DESC) AS posicao",
+    ]
+    if periodo:
+        particao_grupo = f"PARTITION BY {', '.join(colunas_dimensoes)} " if colunas_dimensoes else ""
+        calculos.append(f"total - LAG(total) OVER ({particao_grupo}ORDER BY periodo) AS variacao_centavos")
+    colunas = chaves + [calculo.split(" AS ")[-1] for calculo in calculos]
+
+    query = f"WITH grupos AS ({agregados}) SELECT {', '.join(chaves + calculos)} FROM grupos"
+    if limite:
+        query = f"SELECT * FROM ({query}) WHERE posicao <= ?"
+        params.append(limite)
+    ordem = (["periodo"] if periodo else []) + ["posicao"] + colunas_dimensoes
+    query += f" ORDER BY {', '.join(ordem)}"
+    return ConsultaRelatorio(query, params, colunas, filtro, tuple(dimensoes), periodo, limite)
+
+
+def gerar_relatorio(conn, consulta):
+    """
+    Executa a consulta de um relatório.
+    Retorna a lista de linhas, na ordem de consulta.colunas.
+    """
+    return consultar(conn, consulta.query, consulta.params)
@@ -0,0 +1,205 @@
+"""
+Leitura e gravação dos registros de produção.
+"""
+from .esquema import TABELAS_DIMENSOES
+from .instrumentacao import explicar_se_lenta, medir, resumir_sql
+from .particoes import verificar_nao_arquivados
+from .validacao import RegistroDuplicado, data_para_exibicao, formatar_centavos, normalizar_documento
+
+TAMANHO_PAGINA = 200
+COLUNAS_REGISTRO = "id, pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor_centavos, observacoes"
+NOMES_COLUNAS_REGISTRO = tuple(coluna.strip() for coluna in COLUNAS_REGISTRO.split(","))
+COLUNAS_EXPORTACAO = "id, pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor_centavos, observacoes"
+# Expressões de ordenação de cada coluna da Treeview. Data e Valor são lidas
+# na ordem dos índices em data e valor_centavos; PA, Colaborador, Produto e
+# Status, na ordem dos nomes da dimensão e, para cada nome, do índice em
+# <coluna>_id e data (ver consulta_pagina). As demais colunas não têm índice
+# e cada página ordena todas as linhas do filtro.
+ORDENACAO_COLUNAS = {
+    "PA": ("pa", "data"),
+    "Colaborador": ("colaborador", "data"),
+    "Data": ("data",),
+    "CPF/CNPJ": ("cpf_cnpj",),
+    "Cliente": ("cliente",),
+    "Produto": ("produto", "data"),
+    "Status": ("status", "data"),
+    "Valor": ("valor_centavos",),
+    "Observações": ("COALESCE(observacoes, '')",),
+}
+# Expressões de ordenação que podem ser nulas (valores não convertidos na
+# migração); a paginação por chave as compara à parte
+ORDENACAO_ANULAVEL = ("valor_centavos",)
+
+def formatar_linha(row):
+    """
+    Converte uma linha da tabela de produção nos valores exibidos na Treeview.
+    """
+    valores = list(row[1:])
+    valores[2] = data_para_exibicao(valores[2])
+    valores[7] = formatar_centavos(valores[7]) if valores[7] is not None else ""
+    return valores
+
+def consultar(conn, query, params):
+    """
+    Executa uma consulta e retorna todas as linhas.
+    Com o diagnóstico ativo, mede a execução e a leitura das linhas
+    separadamente e registra o plano das consultas lentas.
+    """
+    cursor = conn.cursor()
+    with medir("sql: executar", sql=resumir_sql(query)) as execucao:
+        cursor.execute(query, params)
+    with medir("sql: fetchall") as leitura:
+        linhas = cursor.fetchall()
+        leitura["linhas"] = len(linhas)
+    explicar_se_lenta(conn, query, params, execucao.duracao_ms + leitura.duracao_ms)
+    return linhas
+
+def condicao_apos_chave(chave, ultima_chave, decrescente=False):
+    """
+    Monta a condição (iniciada por " AND") das linhas que vêm depois de
+    ultima_chave na ordem das expressões da chave. Comparações com nulo não
+    são verdadeiras e o SQLite põe os nulos antes de qualquer valor, então
+    uma última chave nula (só em ORDENACAO_ANULAVEL) é comparada à parte.
+    Em ordem decrescente, os nulos vêm depois de todos os valores e não são
+    alcançados pela condição de uma chave com valor (ver buscar_pagina).
+    Retorna uma tupla (condicao, params).
+    """
+    comparacao = "<" if decrescente else ">"
+    if ultima_chave[0] is not None:
+        return f" AND ({', '.join(chave)}) {comparacao} ({', '.join('?' * len(chave))})", list(ultima_chave)
+    primeira, restante = chave[0], chave[1:]
+    nulos_seguintes = f"{primeira} IS NULL AND ({', '.join(restante)}) {comparacao} ({', '.join('?' * len(restante))})"
+    if decrescente:
+        return f" AND {nulos_seguintes}", list(ultima_chave[1:])
+    return f" AND ({nulos_seguintes} OR {primeira} IS NOT NULL)", list(ultima_chave[1:])
+
+def consulta_pagina(filtro, ordem=(), decrescente=False, ultima_chave=None, tamanho=TAMANHO_PAGINA):
+    """
+    Monta a consulta de uma página de registros, paginada por chave: a chave de
+    ordenação e o id devem ser maiores (ou menores, em ordem decrescente) que
+    os da última linha da página anterior.
+    Cada linha traz os valores de ordem seguidos de COLUNAS_REGISTRO.
+    Retorna uma tupla (query, params).
+    """
+    chave = (*ordem, "id")
+    juncao, condicao_juncao = "", ""
+    if ordem and ordem[0] in TABELAS_DIMENSOES and not filtro.anos_arquivados and not filtro.usa_texto_livre:
+        # Pela visão, o SQLite leria todos os registros e os ordenaria pelo
+        # nome; o CROSS JOIN fixa a dimensão como o laço externo, percorrida
+        # pelo índice do nome, e busca os registros de cada nome pelo índice
+        # em <coluna>_id e data, sem ordenação à parte
+        juncao = f"(SELECT nome AS nome_ordem FROM {TABELAS_DIMENSOES[ordem[0]]}) AS ordem CROSS JOIN "
+        condicao_juncao = f" AND {ordem[0]} = nome_ordem"
+        chave = ("nome_ordem", *chave[1:])
+    direcao = " DESC" if decrescente else ""
+    condicao, params_condicao = "", []
+    if ultima_chave is not None:
+        condicao, params_condicao = condicao_apos_chave(chave, ultima_chave, decrescente)
+    query, params = filtro.selecao(
+        ", ".join(chave[:-1] + (COLUNAS_REGISTRO,)),
+        condicao_juncao + condicao,
+        params_condicao,
+        f" ORDER BY {', '.join(expr + direcao for expr in chave)} LIMIT ?",
+        juncao=juncao,
+    )
+    params.append(tamanho)
+    return query, params
+
+def buscar_pagina(conn, filtro, coluna=None, decrescente=False, ultima_chave=None, tamanho=TAMANHO_PAGINA):
+    """
+    Busca uma página de registros ordenada pela coluna informada (um nome de
+    ORDENACAO_COLUNAS, ou None para a ordem de cadastro).
+    Retorna uma tupla (linhas com COLUNAS_REGISTRO, chave da última linha),
+    com a chave None na última página; a chave é a ultima_chave da próxima.
+    """
+    ordem = ORDENACAO_COLUNAS[coluna] if coluna else ()
+    linhas = consultar(conn, *consulta_pagina(filtro, ordem, decrescente, ultima_chave, tamanho))
+    if decrescente and ordem and ordem[0] in ORDENACAO_ANULAVEL and ultima_chave and ultima_chave[0] is not None and len(linhas) < tamanho:
+        # Acabaram as linhas com valor; em ordem decrescente, os nulos vêm em seguida
+        # (a comparação com infinito inclui qualquer id)
+        inicio_nulos = [None] * len(ordem) + [float("inf")]
+        linhas += consultar(conn, *consulta_pagina(filtro, ordem, decrescente, inicio_nulos, tamanho - len(linhas)))
+    n = len(ordem)
+    proxima_chave = list(linhas[-1][:n + 1]) if len(linhas) == tamanho else None
+    return [linha[n:] for linha in linhas], proxima_chave
+
+def buscar_registro(conn, id_registro):
+    """
+    Busca um registro pela chave primária.
+    Retorna a tupla (pa, colaborador, data, cpf_cnpj, cliente, produto, status,
+    valor_centavos, observacoes), ou None se o registro não existir.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor_centavos, observacoes FROM producao WHERE id = ?",
+        (id_registro,),
+    )
+    return cursor.fetchone()
+
+def buscar_duplicado(conn, cpf_cnpj, produto, data, id_ignorado=None):
+    """
+    Busca, pelo índice de duplicidade, um registro com o mesmo cliente,
+    produto e data (ISO) que não seja o id_ignorado.
+    Retorna o id encontrado, ou None.
+    """
+    row = conn.execute('''
+        SELECT id FROM registros_producao
+        WHERE documento = ? AND produto_id = (SELECT id FROM produtos WHERE nome = ?) AND data = ? AND id IS NOT ?
+        LIMIT 1
+    ''', (normalizar_documento(cpf_cnpj), produto, data, id_ignorado)).fetchone()
+    return row[0] if row else None
+
+def aplicar_gravacao(conn, valores, id_registro=None):
+    """
+    Insere um registro de produção, ou atualiza o registro id_registro, na
+    transação em andamento, sem confirmá-la (usada nas gravações em grupo).
+    Os valores são os retornados por normalizar_registro; a gravação passa
+    pela visão producao, que cadastra nomes novos nas dimensões.
+    Registros de anos arquivados não podem ser alterados (ValueError), e um
+    registro com o cliente, produto e data de outro lança RegistroDuplicado.
+    Retorna o id do registro gravado.
+    """
+    id_existente = buscar_duplicado(conn, valores[3], valores[5], valores[2], id_registro)
+    if id_existente is not None:
+        raise RegistroDuplicado(id_existente)
+    cursor = conn.cursor()
+    if id_registro is None:
+        cursor.execute('''
+            INSERT INTO producao (pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor, valor_centavos, observacoes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', valores)
+        # O gatilho da visão não preserva last_insert_rowid(); como a
+        # transação tem a trava de escrita, o último id gerado é o do registro
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'registros_producao'")
+        return cursor.fetchone()[0]
+    verificar_nao_arquivados(conn, [id_registro])
+    cursor.execute('''
+        UPDATE producao
+        SET pa=?, colaborador=?, data=?, cpf_cnpj=?, cliente=?, produto=?, status=?, valor=?, valor_centavos=?, observacoes=?
+        WHERE id=?
+    ''', (*valores, id_registro))
+    return id_registro
+
+def gravar_producao(conn, valores, id_registro=None):
+    """
+    Insere um registro de produção, ou atualiza o registro id_registro, em
+    uma transação própria.
+    Retorna o id do registro gravado.
+    """
+    with conn:
+        return aplicar_gravacao(conn, valores, id_registro)
+
+def aplicar_exclusao(conn, ids):
+    """
+    Exclui os registros informados na transação em andamento, sem confirmá-la.
+    Registros de anos arquivados não podem ser excluídos (ValueError).
+    """
+    verificar_nao_arquivados(conn, ids)
+    conn.executemany("DELETE FROM registros_producao WHERE id = ?", [(id_registro,) for id_registro in ids])
+
+def excluir_producao(conn, ids):
+    """
+    Exclui os registros informados em uma única transação.
+    """
+    with conn:
+        aplicar_exclusao(conn, ids)
@@ -0,0 +1,638 @@
+"""
+Servidor HTTP/JSON do controle de produção, para vários usuários ao mesmo tempo.
+
+Um único processo atende os clientes com asyncio e acessa o banco pelo
+ExecutorBD: leituras em um conjunto de threads, cada uma com sua conexão, e
+gravações na única thread escritora, agrupadas em uma transação quando
+chegam juntas. Assim os clientes não abrem o arquivo do banco diretamente
+(o que é frágil e lento em pastas de rede) nem disputam a trava de escrita.
+
+As respostas de leitura levam um ETag com a versão dos dados (PRAGMA
+data_version de uma conexão que nunca grava): enquanto nada for gravado, a
+mesma requisição com If-None-Match recebe 304 sem consultar o banco.
+
+Rotas:
+    GET    /registros               página de registros: filtros (CAMPOS_FILTRO),
+                                    ordem, decrescente, apos (cursor) e tamanho
+    GET    /registros/ID            um registro
+    POST   /registros               cadastra um registro (JSON com os campos do formulário);
+                                    409 se repetir o cliente, produto e data de outro
+    PUT    /registros/ID            altera um registro
+    DELETE /registros/ID            exclui um registro
+    DELETE /registros               exclui os registros do JSON {"ids": [...]} em uma
+                                    única transação (todos ou nenhum)
+    GET    /relatorios              relatório: filtros, agrupamento, periodo e limite
+    GET    /relatorios/exportacao   arquivo do relatório (formato=xlsx, csv ou parquet)
+    GET    /exportacao              arquivo com os registros filtrados
+    GET    /dimensoes/COLUNA        nomes cadastrados de pa, colaborador, produto ou status
+    GET    /clientes/DOCUMENTO      nome mais recente do cliente de um CPF/CNPJ
+    GET    /alteracoes              alterações de registros após a sequência desde, com
+                                    limite; traz a ultima sequência lida e se há mais
+    GET    /alteracoes/exportacao   arquivo com as alterações após desde (formato=...);
+                                    a última sequência exportada vai no cabeçalho
+                                    X-Ultima-Alteracao
+
+O servidor não tem usuários: quem alcança a porta lê e altera tudo. Por
+isso, por padrão, só escuta no próprio computador (127.0.0.1). Para atender
+a rede, defina PRODUCAO_TOKEN com um segredo no servidor e nos clientes: as
+requisições sem o cabeçalho "Authorization: Bearer SEGREDO" recebem 401, e
+um endereço de escuta fora do próprio computador sem o segredo é recusado.
+
+Uso: python -m producao [--banco ARQUIVO] servir [--endereco ENDERECO] [--porta PORTA]
+"""
+import asyncio
+import base64
+import binascii
+import ipaddress
+import json
+import os
+import re
+import secrets
+import sqlite3
+import tempfile
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from .alteracoes import LIMITE_ALTERACOES, buscar_alteracoes, exportar_alteracoes
+from .conexao import GerenciadorConexoes
+from .dimensoes import carregar_dimensao
+from .esquema import TABELAS_DIMENSOES, preparar_banco
+from .executor import ExecutorBD, TarefaCancelada, banco_travado
+from .exportacao import FORMATOS_EXPORTACAO, exportar_cursor
+from .filtros import CAMPOS_FILTRO, FiltroProducao
+from .instrumentacao import medir
+from .relatorios import DIMENSOES_RELATORIO, PERIODOS_RELATORIO, gerar_relatorio, montar_relatorio
+from .repositorio import (
+    COLUNAS_EXPORTACAO, NOMES_COLUNAS_REGISTRO, ORDENACAO_COLUNAS, TAMANHO_PAGINA,
+    aplicar_exclusao, aplicar_gravacao, buscar_pagina, buscar_registro,
+)
+from .sugestoes import buscar_cliente
+from .validacao import RegistroDuplicado, RegistroInvalido, normalizar_registro
+
+ENDERECO_PADRAO = "127.0.0.1"
+TOKEN_API = os.environ.get("PRODUCAO_TOKEN", "")
+PORTA_PADRAO = 8765
+LEITORES_SERVIDOR = 4
+TAMANHO_MAXIMO_PAGINA = 1000
+TAMANHO_MAXIMO_CABECALHO = 64 * 1024
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+TEMPO_OCIOSO = 60  # segundos que uma conexão persistente fica aberta sem requisições
+TAMANHO_BLOCO_ARQUIVO = 64 * 1024
+
+# Campos do formulário aceitos no cadastro e na alteração, na ordem de normalizar_registro
+CAMPOS_REGISTRO_API = ("pa", "colaborador", "data", "cpf_cnpj", "cliente", "produto", "status", "valor", "observacoes")
+
+TIPOS_ARQUIVO = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ErroHTTP(Exception):
+    """
+    Erro que vira uma resposta HTTP com o status e a mensagem informados.
+    """
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class Resposta:
+    """
+    Resposta a uma requisição: dados JSON ou um arquivo temporário, que é
+    removido depois de enviado.
+    """
+
+    def __init__(self, status=HTTPStatus.OK, dados=None, arquivo=None, cabecalhos=None):
+        self.status = status
+        self.dados = dados
+        self.arquivo = arquivo
+        self.cabecalhos = cabecalhos or {}
+
+
+def codificar_chave(chave):
+    """
+    Converte a chave da última linha de uma página no cursor opaco da próxima.
+    """
+    if chave is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode().rstrip("=")
+
+
+def decodificar_chave(cursor, tamanho):
+    """
+    Converte um cursor recebido na chave de paginação (lista com tamanho valores).
+    """
+    if not cursor:
+        return None
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        chave = None
+    if not isinstance(chave, list) or len(chave) != tamanho or not all(valor is None or isinstance(valor, (str, int, float)) for valor in chave):
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Cursor de paginação inválido.")
+    return chave
+
+
+def endereco_local(endereco):
+    """
+    Retorna True se o endereço de escuta só aceita conexões do próprio
+    computador.
+    """
+    if endereco == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(endereco).is_loopback
+    except ValueError:
+        return False
+
+
+def _inteiro(consulta, nome, padrao, minimo, maximo):
+    """
+    Lê um parâmetro inteiro da consulta, limitado ao intervalo informado.
+    """
+    valor = consulta.get(nome)
+    if not valor:
+        return padrao
+    try:
+        return min(max(int(valor), minimo), maximo)
+    except ValueError:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"Parâmetro {nome} inválido.")
+
+
+def _filtro(consulta):
+    """
+    Monta o FiltroProducao com os critérios da consulta.
+    """
+    return FiltroProducao(**{campo: consulta.get(campo, "") for campo in CAMPOS_FILTRO})
+
+
+def _consulta_relatorio(consulta):
+    """
+    Monta a consulta do relatório com os parâmetros agrupamento (dimensões
+    separadas por vírgula, vazio para nenhuma), periodo e limite.
+    """
+    agrupamento = consulta.get("agrupamento", "Colaborador")
+    dimensoes = tuple(dimensao.strip() for dimensao in agrupamento.split(",") if dimensao.strip())
+    periodo = consulta.get("periodo") or None
+    if any(dimensao not in DIMENSOES_RELATORIO for dimensao in dimensoes):
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"Agrupamento inválido; use {', '.join(DIMENSOES_RELATORIO)}.")
+    if periodo is not None and periodo not in PERIODOS_RELATORIO:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"Período inválido; use {', '.join(PERIODOS_RELATORIO)}.")
+    limite = _inteiro(consulta, "limite", None, 1, 1000000)
+    return montar_relatorio(_filtro(consulta), dimensoes, periodo, limite)
+
+
+def _formato(consulta):
+    """
+    Retorna o formato de exportação pedido na consulta (Excel por padrão).
+    """
+    formato = consulta.get("formato", "xlsx")
+    if formato not in FORMATOS_EXPORTACAO.values():
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"Formato inválido; use {', '.join(FORMATOS_EXPORTACAO.values())}.")
+    return formato
+
+
+def _campos_registro(corpo):
+    """
+    Lê os campos do formulário enviados em JSON e os normaliza.
+    Retorna os valores de normalizar_registro.
+    """
+    try:
+        dados = json.loads(corpo or b"{}")
+    except ValueError:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON.")
+    if not isinstance(dados, dict):
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON.")
+    return normalizar_registro(**{campo: str(dados.get(campo) or "") for campo in CAMPOS_REGISTRO_API})
+
+
+def _ids_registros(corpo):
+    """
+    Lê a lista de ids do corpo JSON {"ids": [...]}.
+    """
+    try:
+        dados = json.loads(corpo or b"{}")
+    except ValueError:
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON.")
+    ids = dados.get("ids") if isinstance(dados, dict) else None
+    if not isinstance(ids, list) or not ids or not all(isinstance(id_registro, int) and not isinstance(id_registro, bool) for id_registro in ids):
+        raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Informe os ids dos registros em uma lista de inteiros.")
+    return ids
+
+
+def _exportar_para_arquivo(conn, query, params, formato):
+    """
+    Exporta o resultado de uma consulta para um arquivo temporário.
+    Retorna o caminho do arquivo.
+    """
+    descritor, caminho = tempfile.mkstemp(suffix=f".{formato}")
+    os.close(descritor)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        exportar_cursor(cursor, caminho, formato)
+    except BaseException:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    return caminho
+
+
+def _exportar_alteracoes_para_arquivo(conn, desde, formato):
+    """
+    Exporta as alterações posteriores a desde para um arquivo temporário.
+    Retorna uma tupla (caminho do arquivo, última sequência exportada).
+    """
+    descritor, caminho = tempfile.mkstemp(suffix=f".{formato}")
+    os.close(descritor)
+    try:
+        _, ultima = exportar_alteracoes(conn, caminho, desde, formato)
+    except BaseException:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    return caminho, ultima
+
+
+def _alterar_registro(conn, valores, id_registro):
+    """
+    Altera um registro existente na transação do grupo.
+    """
+    if buscar_registro(conn, id_registro) is None:
+        raise ErroHTTP(HTTPStatus.NOT_FOUND, "Registro não encontrado.")
+    return aplicar_gravacao(conn, valores, id_registro)
+
+
+def _excluir_registro(conn, id_registro):
+    """
+    Exclui um registro existente na transação do grupo.
+    """
+    if buscar_registro(conn, id_registro) is None:
+        raise ErroHTTP(HTTPStatus.NOT_FOUND, "Registro não encontrado.")
+    aplicar_exclusao(conn, [id_registro])
+
+
+def _excluir_registros(conn, ids):
+    """
+    Exclui registros existentes na transação do grupo; se algum não existir,
+    nenhum é excluído.
+    """
+    ausente = conn.execute(
+        "SELECT value FROM json_each(?) WHERE value NOT IN (SELECT id FROM registros_producao) LIMIT 1", (json.dumps(ids),)
+    ).fetchone()
+    if ausente is not None:
+        raise ErroHTTP(HTTPStatus.NOT_FOUND, f"Registro {ausente[0]} não encontrado.")
+    aplicar_exclusao(conn, ids)
+
+
+class ServidorProducao:
+    """
+    Atende as requisições HTTP sobre um banco de produção.
+    """
+
+    def __init__(self, caminho_banco, leitores=LEITORES_SERVIDOR, token=TOKEN_API):
+        self.gerenciador = GerenciadorConexoes(caminho_banco)
+        self.leitores = leitores
+        self._autorizacao = f"Bearer {token}" if token else None
+        self.executor = None
+        self._monitor = None
+        # Distingue os ETags de execuções diferentes do servidor
+        self._instancia = secrets.token_hex(4)
+        self._rotas = [
+            ("GET", re.compile(r"/registros"), self._listar_registros),
+            ("POST", re.compile(r"/registros"), self._criar_registro),
+            ("DELETE", re.compile(r"/registros"), self._excluir_registros),
+            ("GET", re.compile(r"/registros/(\d+)"), self._obter_registro),
+            ("PUT", re.compile(r"/registros/(\d+)"), self._alterar_registro),
+            ("DELETE", re.compile(r"/registros/(\d+)"), self._excluir_registro),
+            ("GET", re.compile(r"/relatorios"), self._relatorio),
+            ("GET", re.compile(r"/relatorios/exportacao"), self._exportar_relatorio),
+            ("GET", re.compile(r"/exportacao"), self._exportar_registros),
+            ("GET", re.compile(r"/dimensoes/(\w+)"), self._listar_dimensao),
+            ("GET", re.compile(r"/clientes/([^/]+)"), self._obter_cliente),
+            ("GET", re.compile(r"/alteracoes"), self._listar_alteracoes),
+            ("GET", re.compile(r"/alteracoes/exportacao"), self._exportar_alteracoes),
+        ]
+
+    async def iniciar(self, endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO):
+        """
+        Prepara o banco e começa a aceitar conexões.
+        Retorna o asyncio.Server.
+        """
+        # A conexão da thread do laço só lê a versão dos dados, sem nunca gravar
+        self._monitor = self.gerenciador.obter()
+        preparar_banco(self._monitor)
+        loop = asyncio.get_running_loop()
+        self.executor = ExecutorBD(self.gerenciador, self.leitores, agendar_callback=loop.call_soon_threadsafe)
+        return await asyncio.start_server(self._atender, endereco, porta, limit=TAMANHO_MAXIMO_CABECALHO)
+
+    def encerrar(self):
+        """
+        Encerra o executor e fecha as conexões com o banco.
+        """
+        if self.executor is not None:
+            self.executor.encerrar()
+        self.gerenciador.fechar_todas()
+
+    def versao(self):
+        """
+        Retorna o ETag da versão atual dos dados.
+        """
+        return f'"{self._instancia}-{self._monitor.execute("PRAGMA data_version").fetchone()[0]}"'
+
+    async def _aguardar(self, tarefa):
+        """
+        Aguarda a conclusão de uma tarefa do executor.
+        Retorna o resultado da tarefa ou lança o erro com que ela falhou.
+        """
+        futuro = asyncio.get_running_loop().create_future()
+
+        def definir(metodo, valor):
+            if not futuro.done():
+                metodo(valor)
+
+        tarefa.ao_concluir = lambda resultado: definir(futuro.set_result, resultado)
+        tarefa.ao_falhar = lambda erro: definir(futuro.set_exception, erro)
+        tarefa.ao_cancelar = lambda: definir(futuro.set_exception, TarefaCancelada())
+        try:
+            return await futuro
+        except asyncio.CancelledError:
+            tarefa.cancelar()  # O cliente desconectou
+            raise
+
+    async def ler(self, funcao, *args):
+        """
+        Executa funcao(conn, *args) em uma thread leitora.
+        """
+        return await self._aguardar(self.executor.ler(lambda conn, tarefa: funcao(conn, *args)))
+
+    async def gravar(self, funcao, *args):
+        """
+        Executa funcao(conn, *args) na thread escritora, agrupada com as
+        gravações dos demais clientes; retorna após a confirmação.
+        """
+        return await self._aguardar(self.executor.escrever_em_grupo(lambda conn, tarefa: funcao(conn, *args)))
+
+    async def _listar_registros(self, consulta, corpo):
+        coluna = consulta.get("ordem") or None
+        if coluna is not None and coluna not in ORDENACAO_COLUNAS:
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, f"Ordem inválida; use {', '.join(ORDENACAO_COLUNAS)}.")
+        decrescente = consulta.get("decrescente", "").lower() in ("1", "true", "sim")
+        tamanho = _inteiro(consulta, "tamanho", TAMANHO_PAGINA, 1, TAMANHO_MAXIMO_PAGINA)
+        ultima_chave = decodificar_chave(consulta.get("apos"), len(ORDENACAO_COLUNAS[coluna]) + 1 if coluna else 1)
+        linhas, proxima_chave = await self.ler(buscar_pagina, _filtro(consulta), coluna, decrescente, ultima_chave, tamanho)
+        return Resposta(dados={
+            "registros": [dict(zip(NOMES_COLUNAS_REGISTRO, linha)) for linha in linhas],
+            "proxima": codificar_chave(proxima_chave),
+        })
+
+    async def _obter_registro(self, consulta, corpo, id_registro):
+        valores = await self.ler(buscar_registro, int(id_registro))
+        if valores is None:
+            raise ErroHTTP(HTTPStatus.NOT_FOUND, "Registro não encontrado.")
+        return Resposta(dados=dict(zip(NOMES_COLUNAS_REGISTRO, (int(id_registro), *valores))))
+
+    async def _criar_registro(self, consulta, corpo):
+        id_registro = await self.gravar(aplicar_gravacao, _campos_registro(corpo))
+        return Resposta(HTTPStatus.CREATED, {"id": id_registro}, cabecalhos={"Location": f"/registros/{id_registro}"})
+
+    async def _alterar_registro(self, consulta, corpo, id_registro):
+        await self.gravar(_alterar_registro, _campos_registro(corpo), int(id_registro))
+        return Resposta(dados={"id": int(id_registro)})
+
+    async def _excluir_registro(self, consulta, corpo, id_registro):
+        await self.gravar(_excluir_registro, int(id_registro))
+        return Resposta(HTTPStatus.NO_CONTENT)
+
+    async def _excluir_registros(self, consulta, corpo):
+        await self.gravar(_excluir_registros, _ids_registros(corpo))
+        return Resposta(HTTPStatus.NO_CONTENT)
+
+    async def _relatorio(self, consulta, corpo):
+        relatorio = _consulta_relatorio(consulta)
+        linhas = await self.ler(gerar_relatorio, relatorio)
+        return Resposta(dados={"colunas": relatorio.colunas, "linhas": linhas})
+
+    async def _exportar_relatorio(self, consulta, corpo):
+        relatorio = _consulta_relatorio(consulta)
+        formato = _formato(consulta)
+        caminho = await self.ler(_exportar_para_arquivo, relatorio.query, relatorio.params, formato)
+        return Resposta(arquivo=caminho, cabecalhos={
+            "Content-Type": TIPOS_ARQUIVO[formato],
+            "Content-Disposition": f'attachment; filename="relatorio.{formato}"',
+        })
+
+    async def _exportar_registros(self, consulta, corpo):
+        query, params = _filtro(consulta).consulta(COLUNAS_EXPORTACAO)
+        formato = _formato(consulta)
+        caminho = await self.ler(_exportar_para_arquivo, query, params, formato)
+        return Resposta(arquivo=caminho, cabecalhos={
+            "Content-Type": TIPOS_ARQUIVO[formato],
+            "Content-Disposition": f'attachment; filename="producao.{formato}"',
+        })
+
+    async def _listar_dimensao(self, consulta, corpo, coluna):
+        if coluna not in TABELAS_DIMENSOES:
+            raise ErroHTTP(HTTPStatus.NOT_FOUND, f"Dimensão desconhecida; use {', '.join(TABELAS_DIMENSOES)}.")
+        return Resposta(dados={"nomes": await self.ler(carregar_dimensao, coluna)})
+
+    async def _obter_cliente(self, consulta, corpo, cpf_cnpj):
+        cliente = await self.ler(buscar_cliente, cpf_cnpj)
+        if cliente is None:
+            raise ErroHTTP(HTTPStatus.NOT_FOUND, "Cliente não encontrado.")
+        return Resposta(dados={"cpf_cnpj": cpf_cnpj, "cliente": cliente})
+
+    async def _listar_alteracoes(self, consulta, corpo):
+        desde = _inteiro(consulta, "desde", 0, 0, 2 ** 63 - 1)
+        limite = _inteiro(consulta, "limite", LIMITE_ALTERACOES, 1, TAMANHO_MAXIMO_PAGINA)
+        alteracoes, mais = await self.ler(buscar_alteracoes, desde, limite)
+        ultima = alteracoes[-1]["seq"] if alteracoes else desde
+        return Resposta(dados={"alteracoes": alteracoes, "ultima": ultima, "mais": mais})
+
+    async def _exportar_alteracoes(self, consulta, corpo):
+        desde = _inteiro(consulta, "desde", 0, 0, 2 ** 63 - 1)
+        formato = _formato(consulta)
+        caminho, ultima = await self.ler(_exportar_alteracoes_para_arquivo, desde, formato)
+        return Resposta(arquivo=caminho, cabecalhos={
+            "Content-Type": TIPOS_ARQUIVO[formato],
+            "Content-Disposition": f'attachment; filename="alteracoes.{formato}"',
+            "X-Ultima-Alteracao": str(ultima),
+        })
+
+    async def tratar(self, metodo, caminho, consulta, cabecalhos, corpo):
+        """
+        Encaminha uma requisição à rota correspondente.
+        Retorna a Resposta.
+        """
+        if self._autorizacao is not None and not secrets.compare_digest(
+            cabecalhos.get("authorization", "").encode("iso-8859-1"), self._autorizacao.encode("utf-8")
+        ):
+            return Resposta(HTTPStatus.UNAUTHORIZED, {"erro": "Token de acesso ausente ou inválido."}, cabecalhos={"WWW-Authenticate": "Bearer"})
+        metodo_rota = "GET" if metodo == "HEAD" else metodo
+        permitidos = []
+        for metodo_permitido, padrao, tratador in self._rotas:
+            correspondencia = padrao.fullmatch(caminho)
+            if correspondencia is None:
+                continue
+            permitidos.append(metodo_permitido)
+            if metodo_permitido == metodo_rota:
+                break
+        else:
+            if permitidos:
+                return Resposta(HTTPStatus.METHOD_NOT_ALLOWED, {"erro": "Método não permitido."}, cabecalhos={"Allow": ", ".join(permitidos)})
+            return Resposta(HTTPStatus.NOT_FOUND, {"erro": "Rota não encontrada."})
+
+        versao = None
+        if metodo_rota == "GET":
+            versao = self.versao()
+            if cabecalhos.get("if-none-match") == versao:
+                return Resposta(HTTPStatus.NOT_MODIFIED, cabecalhos={"ETag": versao})
+        try:
+            resposta = await tratador(consulta, corpo, *correspondencia.groups())
+        except ErroHTTP as erro:
+            return Resposta(erro.status, {"erro": str(erro)})
+        except RegistroDuplicado as erro:
+            return Resposta(HTTPStatus.CONFLICT, {"erro": str(erro), "id": erro.id_existente})
+        except (RegistroInvalido, ValueError) as erro:
+            return Resposta(HTTPStatus.BAD_REQUEST, {"erro": str(erro)})
+        except TarefaCancelada:
+            return Resposta(HTTPStatus.SERVICE_UNAVAILABLE, {"erro": "Operação cancelada."})
+        except sqlite3.Error as erro:
+            if banco_travado(erro):
+                return Resposta(HTTPStatus.SERVICE_UNAVAILABLE, {"erro": "Banco de dados ocupado; tente novamente."}, cabecalhos={"Retry-After": "1"})
+            return Resposta(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": str(erro)})
+        except Exception as erro:  # Falha inesperada: responde sem derrubar a conexão
+            return Resposta(HTTPStatus.INTERNAL_SERVER_ERROR, {"erro": f"{type(erro).__name__}: {erro}"})
+        if versao is not None:
+            resposta.cabecalhos.setdefault("ETag", versao)
+            resposta.cabecalhos.setdefault("Cache-Control", "no-cache")
+        return resposta
+
+    async def _ler_requisicao(self, leitor):
+        """
+        Lê uma requisição HTTP/1.1.
+        Retorna (metodo, versao, caminho, consulta, cabecalhos, corpo), ou None
+        se o cliente fechou a conexão.
+        """
+        try:
+            cabecalho = await leitor.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as erro:
+            if not erro.partial.strip():
+                return None
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Requisição incompleta.")
+        except asyncio.LimitOverrunError:
+            raise ErroHTTP(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Cabeçalho muito grande.")
+
+        linhas = cabecalho.decode("iso-8859-1").split("\r\n")
+        try:
+            metodo, alvo, versao = linhas[0].split(" ")
+        except ValueError:
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida.")
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            if linha:
+                nome, _, valor = linha.partition(":")
+                cabecalhos[nome.strip().lower()] = valor.strip()
+        try:
+            tamanho = int(cabecalhos.get("content-length") or 0)
+        except ValueError:
+            raise ErroHTTP(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+        if tamanho > TAMANHO_MAXIMO_CORPO:
+            raise ErroHTTP(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande.")
+        corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+        partes = urlsplit(alvo)
+        consulta = dict(parse_qsl(partes.query))
+        return metodo.upper(), versao.upper(), unquote(partes.path).rstrip("/") or "/", consulta, cabecalhos, corpo
+
+    async def _enviar(self, escritor, resposta, manter_conexao, somente_cabecalho=False):
+        """
+        Envia uma resposta; arquivos são enviados em blocos e depois removidos.
+        """
+        cabecalhos = dict(resposta.cabecalhos)
+        corpo = b""
+        try:
+            if resposta.arquivo is not None:
+                cabecalhos["Content-Length"] = str(os.path.getsize(resposta.arquivo))
+            elif resposta.dados is not None:
+                corpo = json.dumps(resposta.dados, ensure_ascii=False).encode("utf-8")
+                cabecalhos["Content-Type"] = "application/json; charset=utf-8"
+                cabecalhos["Content-Length"] = str(len(corpo))
+            elif resposta.status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+                cabecalhos["Content-Length"] = "0"
+            cabecalhos["Connection"] = "keep-alive" if manter_conexao else "close"
+
+            status = HTTPStatus(resposta.status)
+            texto = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            texto += "".join(f"{nome}: {valor}\r\n" for nome, valor in cabecalhos.items())
+            escritor.write((texto + "\r\n").encode("iso-8859-1"))
+            if not somente_cabecalho:
+                if resposta.arquivo is not None:
+                    with open(resposta.arquivo, "rb") as arquivo:
+                        while bloco := arquivo.read(TAMANHO_BLOCO_ARQUIVO):
+                            escritor.write(bloco)
+                            await escritor.drain()
+                else:
+                    escritor.write(corpo)
+            await escritor.drain()
+        finally:
+            if resposta.arquivo is not None:
+                os.remove(resposta.arquivo)
+
+    async def _atender(self, leitor, escritor):
+        """
+        Atende as requisições de uma conexão, mantida aberta entre elas.
+        """
+        try:
+            while True:
+                try:
+                    requisicao = await asyncio.wait_for(self._ler_requisicao(leitor), TEMPO_OCIOSO)
+                except ErroHTTP as erro:
+                    await self._enviar(escritor, Resposta(erro.status, {"erro": str(erro)}), manter_conexao=False)
+                    break
+                if requisicao is None:
+                    break
+                metodo, versao, caminho, consulta, cabecalhos, corpo = requisicao
+                conexao = cabecalhos.get("connection", "").lower()
+                manter_conexao = conexao == "keep-alive" if versao == "HTTP/1.0" else conexao != "close"
+                with medir("api", metodo=metodo, caminho=caminho) as medicao:
+                    resposta = await self.tratar(metodo, caminho, consulta, cabecalhos, corpo)
+                    medicao["status"] = int(resposta.status)
+                await self._enviar(escritor, resposta, manter_conexao, somente_cabecalho=metodo == "HEAD")
+                if not manter_conexao:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def servir(caminho_banco, endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO, leitores=LEITORES_SERVIDOR, ao_iniciar=None, token=TOKEN_API):
+    """
+    Executa o servidor até ser interrompido.
+    ao_iniciar(endereços), se informado, é chamado quando o servidor começa
+    a aceitar conexões.
+    Lança ValueError se o endereço aceitar conexões de outros computadores
+    e não houver token de acesso.
+    """
+    if not token and not endereco_local(endereco):
+        raise ValueError(
+            f"O servidor não tem autenticação; para escutar em {endereco}, defina PRODUCAO_TOKEN "
+            "com um segredo (e o mesmo valor nos clientes)."
+        )
+    servidor = ServidorProducao(caminho_banco, leitores, token)
+    try:
+        servidor_tcp = await servidor.iniciar(endereco, porta)
+        if ao_iniciar is not None:
+            ao_iniciar([soquete.getsockname() for soquete in servidor_tcp.sockets])
+        async with servidor_tcp:
+            await servidor_tcp.serve_forever()
+    finally:
+        servidor.encerrar()
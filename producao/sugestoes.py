@@ -0,0 +1,129 @@
+"""
+Sugestões do formulário: o nome do cliente pelo CPF/CNPJ e o autocompletar
+de colaboradores e produtos.
+
+As sugestões são consultadas a cada tecla, então ficam em memória: o nome de
+cada cliente em um dicionário pelo documento sem pontuação (carregado uma
+vez, em segundo plano, e atualizado a cada gravação), e os nomes de cada
+dimensão em uma lista ordenada, em que os nomes com um mesmo prefixo formam
+uma faixa contínua, achada por busca binária (bisect). Cada consulta leva
+poucos microssegundos.
+"""
+from bisect import bisect_left
+
+from .esquema import sql_documento
+from .particoes import anos_arquivados, esquema_particao
+from .validacao import normalizar_documento, remover_acentos
+
+LIMITE_SUGESTOES = 20
+
+
+class IndicePrefixos:
+    """
+    Nomes em ordem alfabética, para a busca por prefixo sem diferenciar
+    maiúsculas nem acentos.
+    """
+
+    def __init__(self, nomes=()):
+        self.itens = sorted({(self._chave(nome), nome) for nome in nomes})
+
+    @staticmethod
+    def _chave(texto):
+        return remover_acentos(texto.strip().upper())
+
+    def sugerir(self, prefixo, limite=LIMITE_SUGESTOES):
+        """
+        Retorna até limite nomes que começam com o prefixo, em ordem
+        alfabética (nenhum, para um prefixo vazio).
+        """
+        chave = self._chave(prefixo)
+        if not chave:
+            return []
+        sugestoes = []
+        for posicao in range(bisect_left(self.itens, (chave,)), len(self.itens)):
+            chave_nome, nome = self.itens[posicao]
+            if not chave_nome.startswith(chave) or len(sugestoes) == limite:
+                break
+            sugestoes.append(nome)
+        return sugestoes
+
+
+class CacheClientes:
+    """
+    Nome mais recente de cada cliente, pelo CPF/CNPJ sem pontuação.
+    Enquanto carregado for False, um documento ausente pode apenas não ter
+    sido lido ainda (buscar_cliente o consulta no banco).
+    """
+
+    def __init__(self):
+        self.nomes = {}
+        self.carregado = False
+        self._registrados = None  # gravados durante uma leitura em andamento
+
+    def iniciar_leitura(self):
+        """
+        Marca o início de uma leitura com carregar_clientes, cujo resultado
+        será passado a definir.
+        """
+        self._registrados = {}
+
+    def definir(self, nomes):
+        """
+        Substitui os nomes pelos lidos com carregar_clientes, mantendo os
+        registrados durante a leitura, que podem ser mais recentes.
+        """
+        nomes.update(self._registrados or {})
+        self.nomes = nomes
+        self._registrados = None
+        self.carregado = True
+
+    def buscar(self, cpf_cnpj):
+        """
+        Retorna o nome do cliente do documento, ou None se não for conhecido.
+        """
+        return self.nomes.get(normalizar_documento(cpf_cnpj))
+
+    def registrar(self, cpf_cnpj, cliente):
+        """
+        Guarda o nome do cliente de um registro gravado.
+        """
+        documento = normalizar_documento(cpf_cnpj)
+        self.nomes[documento] = cliente
+        if self._registrados is not None:
+            self._registrados[documento] = cliente
+
+
+def carregar_clientes(conn):
+    """
+    Lê o nome mais recente de cada cliente, inclusive dos anos arquivados.
+    Retorna um dicionário {documento sem pontuação: nome}.
+    """
+    consultas = [
+        f"SELECT {sql_documento('cpf_cnpj')}, cliente FROM {esquema_particao(ano)}.registros_producao ORDER BY id"
+        for ano in anos_arquivados()
+    ]
+    consultas.append("SELECT documento, cliente FROM main.registros_producao ORDER BY id")
+    nomes = {}
+    for consulta in consultas:
+        nomes.update(conn.execute(consulta))  # Os registros mais novos sobrescrevem os antigos
+    return nomes
+
+
+def buscar_cliente(conn, cpf_cnpj):
+    """
+    Busca o nome mais recente do cliente de um documento, pelo índice de
+    duplicidade (e, nos anos arquivados, pelo índice do documento).
+    Retorna o nome, ou None se o documento não tiver registros.
+    """
+    documento = normalizar_documento(cpf_cnpj)
+    row = conn.execute(
+        "SELECT cliente FROM main.registros_producao WHERE documento = ? ORDER BY id DESC LIMIT 1", (documento,)
+    ).fetchone()
+    for ano in reversed(anos_arquivados()):
+        if row is not None:
+            break
+        row = conn.execute(
+            f"SELECT cliente FROM {esquema_particao(ano)}.registros_producao WHERE {sql_documento('cpf_cnpj')} = ? ORDER BY id DESC LIMIT 1",
+            (documento,),
+        ).fetchone()
+    return row[0] if row else None
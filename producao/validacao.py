@@ -0,0 +1,258 @@
+"""
+Validação e conversão dos campos de um registro de produção.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+import calendar
+import re
+
+# Letras acentuadas e seus equivalentes sem acento, usadas na busca textual;
+# só maiúsculas, pois os textos são gravados e filtrados em maiúsculas
+ACENTOS = ("ÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ", "AAAAAEEEEIIIIOOOOOUUUUC")
+TABELA_ACENTOS = str.maketrans(*ACENTOS)
+
+# Pesos do cálculo módulo 11 dos dígitos verificadores (primeiro e segundo dígito)
+PESOS_CPF = (tuple(range(10, 1, -1)), tuple(range(11, 1, -1)))
+PESOS_CNPJ = ((5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2), (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2))
+# Pontuação removida do CPF/CNPJ em normalizar_documento
+PONTUACAO_DOCUMENTO = (".", "-", "/", " ")
+
+
+class RegistroInvalido(ValueError):
+    """
+    Lançada quando um registro de produção não passa na validação.
+    A mensagem é própria para ser exibida ao usuário.
+    """
+
+
+class RegistroDuplicado(RegistroInvalido):
+    """
+    Lançada ao gravar um registro com o mesmo cliente, produto e data de
+    outro já existente (id_existente).
+    """
+
+    def __init__(self, id_existente):
+        super().__init__(f"Já existe um registro deste cliente, produto e data (id {id_existente}).")
+        self.id_existente = id_existente
+
+
+# Funções de Validação
+def validar_cpf_cnpj(cpf_cnpj):
+    """
+    Valida CPF ou CNPJ, incluindo os dígitos verificadores.
+    Retorna True se for válido, False caso contrário.
+    """
+    return _documento_valido(re.sub(r'[^0-9]', '', cpf_cnpj))
+
+def normalizar_documento(cpf_cnpj):
+    """
+    Retorna o CPF/CNPJ sem pontuação, como na coluna documento do banco.
+    """
+    for sinal in PONTUACAO_DOCUMENTO:
+        cpf_cnpj = cpf_cnpj.replace(sinal, "")
+    return cpf_cnpj
+
+def _digito_verificador(digitos, pesos):
+    """
+    Calcula um dígito verificador módulo 11.
+    """
+    resto = sum(int(digito) * peso for digito, peso in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+@lru_cache(maxsize=65536)
+def _documento_valido(digitos):
+    """
+    Valida um CPF (11 dígitos) ou CNPJ (14 dígitos) já sem pontuação.
+    O resultado fica guardado, pois os mesmos clientes se repetem muito.
+    """
+    if len(digitos) == 11:  # CPF
+        pesos = PESOS_CPF
+    elif len(digitos) == 14:  # CNPJ
+        pesos = PESOS_CNPJ
+    else:
+        return False
+    if digitos == digitos[0] * len(digitos):
+        return False
+    return (_digito_verificador(digitos, pesos[0]) == int(digitos[-2])
+            and _digito_verificador(digitos, pesos[1]) == int(digitos[-1]))
+
+def validar_cpf_cnpj_lote(documentos):
+    """
+    Valida uma lista de CPFs/CNPJs de uma vez, com as regras de validar_cpf_cnpj.
+    Usa o NumPy, se instalado, para calcular os dígitos verificadores de todos
+    os documentos em conjunto; sem ele, valida um a um.
+    Retorna uma lista de booleanos na mesma ordem dos documentos.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [validar_cpf_cnpj(documento) for documento in documentos]
+
+    normalizados = [re.sub(r'[^0-9]', '', documento) for documento in documentos]
+    resultado = np.zeros(len(normalizados), dtype=bool)
+    for tamanho, pesos in ((11, PESOS_CPF), (14, PESOS_CNPJ)):
+        posicoes = [i for i, digitos in enumerate(normalizados) if len(digitos) == tamanho]
+        if not posicoes:
+            continue
+        texto = "".join(normalizados[i] for i in posicoes).encode("ascii")
+        matriz = (np.frombuffer(texto, dtype=np.uint8) - ord("0")).reshape(-1, tamanho).astype(np.int64)
+        validos = ~(matriz == matriz[:, :1]).all(axis=1)  # todos os dígitos iguais
+        for pesos_digito in pesos:
+            n = len(pesos_digito)
+            resto = (matriz[:, :n] @ np.array(pesos_digito)) % 11
+            digito = np.where(resto < 2, 0, 11 - resto)
+            validos &= digito == matriz[:, n]
+        resultado[posicoes] = validos
+    return resultado.tolist()
+
+def validar_data(data):
+    """
+    Valida a data no formato DD-MM-AAAA.
+    Retorna True se for válida, False caso contrário.
+    """
+    try:
+        datetime.strptime(data, "%d-%m-%Y")
+        return True
+    except ValueError:
+        return False
+
+def validar_valor(valor):
+    """
+    Valida o valor monetário.
+    Retorna True se for válido, False caso contrário.
+    """
+    try:
+        valor_para_centavos(valor)
+        return True
+    except ValueError:
+        return False
+
+def normalizar_registro(pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor, observacoes="", documento_valido=None):
+    """
+    Valida os campos de um registro e os converte para o formato gravado no banco.
+    documento_valido, se informado, é o resultado já calculado da validação do
+    CPF/CNPJ (como na validação em lote).
+    Retorna a tupla (pa, colaborador, data, cpf_cnpj, cliente, produto, status,
+    valor, valor_centavos, observacoes); lança RegistroInvalido se algum campo
+    for inválido.
+    """
+    pa = pa.strip().upper()
+    data = data.strip()
+    colaborador = colaborador.strip().upper()
+    cpf_cnpj = cpf_cnpj.strip().upper()
+    cliente = cliente.strip().upper()
+    produto = produto.strip().upper()
+    status = status.strip().upper()
+    valor = valor.strip().upper()
+    observacoes = (observacoes or "").strip().upper()
+
+    if not pa or not colaborador or not cpf_cnpj or not cliente or not produto or not status or not valor:
+        raise RegistroInvalido("Todos os campos devem ser preenchidos!")
+    if documento_valido is None:
+        documento_valido = validar_cpf_cnpj(cpf_cnpj)
+    if not documento_valido:
+        raise RegistroInvalido("CPF/CNPJ inválido!")
+    data_iso = _data_iso_valida(data)
+    if data_iso is None:
+        raise RegistroInvalido("Data inválida! Use o formato DD-MM-AAAA.")
+    try:
+        valor_centavos = valor_para_centavos(valor)
+    except ValueError:
+        raise RegistroInvalido("Valor inválido! Insira um valor monetário válido.")
+
+    return (pa, colaborador, data_iso, cpf_cnpj, cliente, produto, status,
+            formatar_centavos(valor_centavos), valor_centavos, observacoes)
+
+def validar_lote(registros):
+    """
+    Valida um lote de registros com as mesmas regras de normalizar_registro.
+    Cada registro é uma sequência com os campos na ordem de normalizar_registro.
+    Retorna uma tupla (validos, rejeitados): as tuplas normalizadas e uma lista
+    de (posição no lote, mensagem de erro).
+    """
+    documentos_validos = validar_cpf_cnpj_lote([registro[3] for registro in registros])
+    validos = []
+    rejeitados = []
+    for posicao, registro in enumerate(registros):
+        try:
+            validos.append(normalizar_registro(*registro, documento_valido=documentos_validos[posicao]))
+        except RegistroInvalido as erro:
+            rejeitados.append((posicao, str(erro)))
+    return validos, rejeitados
+
+@lru_cache(maxsize=4096)
+def _data_iso_valida(data):
+    """
+    Converte uma data DD-MM-AAAA para ISO, guardando o resultado: as datas se
+    repetem muito em um lote importado.
+    Retorna None se a data for inválida.
+    """
+    try:
+        return data_para_iso(data)
+    except ValueError:
+        return None
+
+# Funções de Conversão de Valores
+def valor_para_centavos(valor):
+    """
+    Converte um valor monetário ("R$ 1.234,56", "1234,56" ou "1234.56") em centavos.
+    Retorna um inteiro; lança ValueError se o valor for inválido.
+    """
+    valor_limpo = valor.upper().replace("R$", "").replace(" ", "").strip()
+    if "," in valor_limpo:
+        # Formato brasileiro: ponto como separador de milhar e vírgula como decimal
+        valor_limpo = valor_limpo.replace(".", "").replace(",", ".")
+    try:
+        return int((Decimal(valor_limpo) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {valor}")
+
+def formatar_centavos(centavos):
+    """
+    Formata um valor em centavos como moeda (ex.: "R$ 1.234,56").
+    """
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(centavos), 100)
+    return f"{sinal}R$ {reais:,}".replace(",", ".") + f",{resto:02d}"
+
+# Funções de Conversão de Datas
+def data_para_iso(data):
+    """
+    Converte uma data DD-MM-AAAA para o formato AAAA-MM-DD gravado no banco.
+    """
+    return datetime.strptime(data, "%d-%m-%Y").strftime("%Y-%m-%d")
+
+def data_para_exibicao(data_iso):
+    """
+    Converte uma data AAAA-MM-DD do banco para o formato DD-MM-AAAA.
+    Datas em outro formato (as que a migração não conseguiu ler) são
+    retornadas como estão.
+    """
+    if len(data_iso) != 10 or data_iso[4] != "-" or data_iso[7] != "-":
+        return data_iso
+    return f"{data_iso[8:10]}-{data_iso[5:7]}-{data_iso[0:4]}"
+
+def intervalo_filtro_data(data_filtro):
+    """
+    Converte o filtro de data (AAAA, MM-AAAA ou DD-MM-AAAA) em um intervalo ISO.
+    Retorna uma tupla (inicio, fim) inclusiva; lança ValueError se o formato for inválido.
+    """
+    data_filtro = data_filtro.strip()
+    if len(data_filtro) == 4:  # Ano (AAAA)
+        ano = datetime.strptime(data_filtro, "%Y").year
+        return f"{ano:04d}-01-01", f"{ano:04d}-12-31"
+    if len(data_filtro) == 7:  # Mês e ano (MM-AAAA)
+        mes = datetime.strptime(data_filtro, "%m-%Y")
+        ultimo_dia = calendar.monthrange(mes.year, mes.month)[1]
+        return mes.strftime("%Y-%m-01"), mes.strftime(f"%Y-%m-{ultimo_dia:02d}")
+    if len(data_filtro) == 10:  # Data completa (DD-MM-AAAA)
+        data_iso = data_para_iso(data_filtro)
+        return data_iso, data_iso
+    raise ValueError(f"Formato de data inválido: {data_filtro}")
+
+def remover_acentos(texto):
+    """
+    Remove os acentos de um texto, como no índice de busca.
+    """
+    return texto.translate(TABELA_ACENTOS)
@@ -0,0 +1,43 @@
+"""
+Fixtures dos testes: um banco de produção novo por teste, em uma pasta
+temporária.
+"""
+import pytest
+
+from producao.conexao import GerenciadorConexoes
+from producao.esquema import preparar_banco
+from producao.repositorio import gravar_producao
+from producao.validacao import normalizar_registro
+
+CPF_VALIDO = "529.982.247-25"
+
+
+@pytest.fixture
+def caminho_banco(tmp_path):
+    return str(tmp_path / "producao.db")
+
+
+@pytest.fixture
+def gerenciador(caminho_banco):
+    gerenciador = GerenciadorConexoes(caminho_banco)
+    preparar_banco(gerenciador.obter())
+    yield gerenciador
+    gerenciador.fechar_todas()
+
+
+@pytest.fixture
+def conn(gerenciador):
+    return gerenciador.obter()
+
+
+@pytest.fixture
+def gravar(conn):
+    """
+    Grava um registro com valores padrão para os campos não informados.
+    Retorna o id do registro.
+    """
+    def gravar(id_registro=None, pa="PA01", colaborador="ANA", data="05-03-2025", cpf_cnpj=CPF_VALIDO,
+               cliente="CLIENTE", produto="CONSORCIO", status="CONCLUÍDO", valor="100,00", observacoes=""):
+        valores = normalizar_registro(pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor, observacoes)
+        return gravar_producao(conn, valores, id_registro)
+    return gravar
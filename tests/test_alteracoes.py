@@ -0,0 +1,61 @@
+import csv
+
+from producao.alteracoes import buscar_alteracoes, exportar_alteracoes, ultima_sequencia
+from producao.repositorio import excluir_producao
+
+
+def test_historico_de_inclusao_alteracao_e_exclusao(conn, gravar):
+    assert ultima_sequencia(conn) == 0
+    id_registro = gravar(valor="100,00")
+    gravar(id_registro, valor="150,00", observacoes="REVISADO")
+    # Gravar os mesmos valores não gera alteração
+    gravar(id_registro, valor="150,00", observacoes="REVISADO")
+    excluir_producao(conn, [id_registro])
+
+    alteracoes, ha_mais = buscar_alteracoes(conn)
+    assert not ha_mais
+    assert [(alteracao["registro_id"], alteracao["operacao"]) for alteracao in alteracoes] == [
+        (id_registro, "I"), (id_registro, "U"), (id_registro, "D"),
+    ]
+    inclusao, alteracao, exclusao = alteracoes
+    assert inclusao["antes"] is None
+    assert inclusao["depois"]["valor_centavos"] == 10000
+    assert inclusao["depois"]["data"] == "2025-03-05"
+    assert alteracao["antes"] == inclusao["depois"]
+    assert alteracao["depois"]["valor_centavos"] == 15000
+    assert alteracao["depois"]["observacoes"] == "REVISADO"
+    assert exclusao["antes"] == alteracao["depois"]
+    assert exclusao["depois"] is None
+    assert ultima_sequencia(conn) == exclusao["seq"]
+
+
+def test_leitura_incremental(conn, gravar):
+    for dia in range(1, 6):
+        gravar(data=f"{dia:02d}-03-2025")
+    primeiras, ha_mais = buscar_alteracoes(conn, limite=3)
+    assert ha_mais
+    restantes, ha_mais = buscar_alteracoes(conn, desde=primeiras[-1]["seq"], limite=3)
+    assert not ha_mais
+    assert [alteracao["seq"] for alteracao in primeiras + restantes] == sorted(
+        alteracao["seq"] for alteracao in buscar_alteracoes(conn)[0]
+    )
+    assert len(primeiras + restantes) == 5
+
+
+def test_exportacao_a_partir_da_ultima_sequencia(tmp_path, conn, gravar):
+    primeiro = gravar()
+    total, desde = exportar_alteracoes(conn, str(tmp_path / "todas.csv"))
+    assert (total, desde) == (1, ultima_sequencia(conn))
+
+    excluir_producao(conn, [primeiro])
+    caminho = tmp_path / "novas.csv"
+    total, ate = exportar_alteracoes(conn, str(caminho), desde=desde)
+    assert (total, ate) == (1, desde + 1)
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    assert [(linha["REGISTRO_ID"], linha["OPERACAO"], linha["VALOR_CENTAVOS"]) for linha in linhas] == [
+        (str(primeiro), "D", "10000"),
+    ]
+
+    # Sem alterações novas, o desde é mantido
+    assert exportar_alteracoes(conn, str(tmp_path / "vazio.csv"), desde=ate) == (0, ate)
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+
+import pytest
+
+from producao.backup import (
+    base_do_diferencial, criar_backup, criar_backup_diferencial, podar_backups, restaurar_backup,
+)
+from producao.repositorio import excluir_producao
+
+
+def registros(caminho):
+    """
+    Retorna os registros de um banco restaurado, em ordem de id.
+    """
+    conn = sqlite3.connect(caminho)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return conn.execute("SELECT * FROM producao ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def pasta_backups(tmp_path):
+    pasta = tmp_path / "backups"
+    pasta.mkdir()
+    return str(pasta)
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_backup_e_restauracao(tmp_path, caminho_banco, conn, gravar, pasta_backups, comprimir):
+    for dia in range(1, 4):
+        gravar(data=f"{dia:02d}-03-2025")
+    caminho = criar_backup(conn, pasta_backups, comprimir=comprimir)
+    assert caminho.endswith(".db.gz" if comprimir else ".db")
+    # Gravações depois do backup não aparecem na restauração
+    gravar(data="04-03-2025")
+
+    destino = str(tmp_path / "restaurado.db")
+    restaurar_backup(caminho, destino)
+    assert registros(destino) == registros(caminho_banco)[:3]
+
+
+def test_backup_diferencial(tmp_path, caminho_banco, conn, gravar, pasta_backups):
+    # Sem backup completo, o diferencial cria um
+    completo = criar_backup_diferencial(conn, pasta_backups)
+    assert completo.endswith(".db")
+
+    ids = [gravar(data=f"{dia:02d}-03-2025", observacoes="X" * 500) for dia in range(1, 29)]
+    excluir_producao(conn, ids[:5])
+    diferencial = criar_backup_diferencial(conn, pasta_backups)
+    assert diferencial.endswith(".diff.gz")
+    assert base_do_diferencial(diferencial) == os.path.basename(completo)
+
+    destino = str(tmp_path / "restaurado.db")
+    restaurar_backup(diferencial, destino)
+    assert registros(destino) == registros(caminho_banco)
+
+
+def test_retencao_remove_diferenciais_sem_base(conn, gravar, pasta_backups):
+    antigo = criar_backup(conn, pasta_backups)
+    gravar()
+    diferencial = criar_backup_diferencial(conn, pasta_backups)
+    recente = criar_backup(conn, pasta_backups)
+    assert sorted(podar_backups(pasta_backups, manter=1)) == sorted([antigo, diferencial])
+    assert os.listdir(pasta_backups) == [os.path.basename(recente)]
@@ -0,0 +1,90 @@
+import sqlite3
+
+from producao.esquema import (
+    MIGRACOES, contar_datas_nao_convertidas, contar_valores_nao_convertidos, preparar_banco, reconstruir_resumo,
+)
+
+# Tabela producao da primeira versão do programa, antes das migrações
+ESQUEMA_ORIGINAL = '''
+    CREATE TABLE producao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pa TEXT NOT NULL,
+        colaborador TEXT NOT NULL,
+        data TEXT NOT NULL,
+        cpf_cnpj TEXT NOT NULL,
+        cliente TEXT NOT NULL,
+        produto TEXT NOT NULL,
+        status TEXT NOT NULL,
+        valor TEXT NOT NULL,
+        observacoes TEXT
+    )
+'''
+
+
+def criar_banco_original(caminho, linhas):
+    """
+    Cria um banco no esquema original com as linhas (data, valor) informadas.
+    """
+    conn = sqlite3.connect(caminho)
+    conn.execute(ESQUEMA_ORIGINAL)
+    conn.executemany(
+        "INSERT INTO producao (pa, colaborador, data, cpf_cnpj, cliente, produto, status, valor, observacoes) "
+        "VALUES ('PA01', 'ANA', ?, '529.982.247-25', 'CLIENTE', 'CONSORCIO', 'CONCLUÍDO', ?, '')",
+        linhas,
+    )
+    conn.commit()
+    return conn
+
+
+def resumos(conn):
+    return (
+        sorted(conn.execute("SELECT * FROM producao_resumo_diario")),
+        sorted(conn.execute("SELECT * FROM producao_resumo_mensal")),
+    )
+
+
+def test_migracao_do_esquema_original(tmp_path):
+    conn = criar_banco_original(str(tmp_path / "antigo.db"), [
+        ("05-03-2024", "R$ 1.234,56"),
+        ("5-3-2024", "10"),
+        ("31-02-2024", "2,50"),
+        ("1-12-2023", "sem valor"),
+    ])
+    preparar_banco(conn)
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRACOES[-1][0]
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'producao'").fetchone()[0] == "view"
+    assert conn.execute("SELECT id, data, valor_centavos FROM producao ORDER BY id").fetchall() == [
+        (1, "2024-03-05", 123456),
+        (2, "2024-03-05", 1000),
+        (3, "31-02-2024", 250),
+        (4, "2023-12-01", None),
+    ]
+    assert conn.execute("SELECT * FROM datas_nao_convertidas").fetchall() == [(3, "31-02-2024")]
+    assert conn.execute("SELECT * FROM valores_nao_convertidos").fetchall() == [(4, "sem valor")]
+    assert contar_datas_nao_convertidas(conn) == 1
+    assert contar_valores_nao_convertidos(conn) == 1
+
+
+def test_migracao_pode_ser_repetida(tmp_path):
+    conn = criar_banco_original(str(tmp_path / "antigo.db"), [("05-03-2024", "1,00"), ("7-8-2022", "2,00")])
+    preparar_banco(conn)
+    registros = conn.execute("SELECT * FROM producao ORDER BY id").fetchall()
+    preparar_banco(conn)
+    assert conn.execute("SELECT * FROM producao ORDER BY id").fetchall() == registros
+
+
+def test_datas_sem_zeros_de_banco_ja_migrado(conn, gravar):
+    gravar(data="07-08-2022")
+    # Versões anteriores da migração de datas deixavam estas datas como estavam
+    conn.execute("UPDATE registros_producao SET data = '7-8-2022'")
+    conn.execute("PRAGMA user_version = 8")
+    conn.commit()
+
+    preparar_banco(conn)
+
+    assert conn.execute("SELECT data FROM producao").fetchall() == [("2022-08-07",)]
+    antes = resumos(conn)
+    reconstruir_resumo(conn)
+    assert resumos(conn) == antes
+    assert antes[0][0][0] == "2022-08-07"
@@ -0,0 +1,52 @@
+import csv
+
+import pytest
+
+from producao.exportacao import exportar_cursor
+from producao.repositorio import COLUNAS_EXPORTACAO
+
+
+@pytest.fixture
+def cursor_registros(conn, gravar):
+    """
+    Grava seis registros, os três primeiros sem observações e sem valor, e
+    retorna um cursor com a consulta de exportação.
+    """
+    for dia in range(1, 7):
+        gravar(data=f"{dia:02d}-03-2025", observacoes="" if dia <= 3 else f"OBS {dia}")
+    with conn:
+        conn.execute("UPDATE registros_producao SET observacoes = NULL, valor_centavos = NULL WHERE id <= 3")
+    return conn.execute(f"SELECT {COLUNAS_EXPORTACAO} FROM producao ORDER BY id")
+
+
+def test_exportacao_csv_em_lotes(tmp_path, cursor_registros):
+    caminho = tmp_path / "producao.csv"
+    lotes = []
+    assert exportar_cursor(cursor_registros, str(caminho), tamanho_lote=4, ao_lote=lotes.append) == 6
+    assert lotes == [4, 6]
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    assert [linha["ID"] for linha in linhas] == [str(id_registro) for id_registro in range(1, 7)]
+
+
+def test_exportacao_interrompida_remove_o_arquivo(tmp_path, cursor_registros):
+    caminho = tmp_path / "producao.csv"
+
+    def interromper(total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        exportar_cursor(cursor_registros, str(caminho), tamanho_lote=2, ao_lote=interromper)
+    assert not caminho.exists()
+
+
+def test_parquet_com_primeiro_lote_nulo(tmp_path, cursor_registros):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    caminho = tmp_path / "producao.parquet"
+    # O primeiro lote tem as observações e os valores todos nulos
+    assert exportar_cursor(cursor_registros, str(caminho), tamanho_lote=3) == 6
+    tabela = pyarrow_parquet.read_table(caminho)
+    assert str(tabela.schema.field("VALOR_CENTAVOS").type) == "int64"
+    assert str(tabela.schema.field("OBSERVACOES").type) == "string"
+    assert tabela.column("VALOR_CENTAVOS").to_pylist() == [None, None, None, 10000, 10000, 10000]
+    assert tabela.column("OBSERVACOES").to_pylist() == [None, None, None, "OBS 4", "OBS 5", "OBS 6"]
@@ -0,0 +1,85 @@
+import os
+from datetime import date
+
+import pytest
+
+from producao.conexao import GerenciadorConexoes
+from producao.filtros import FiltroProducao
+from producao.particoes import arquivar_ano, caminho_particao, listar_particoes, verificar_nao_arquivados
+from producao.relatorios import gerar_relatorio, montar_relatorio
+from producao.repositorio import buscar_pagina, excluir_producao
+
+ANO_ARQUIVADO = 2023
+
+
+@pytest.fixture
+def registros(gravar):
+    """
+    Grava dois registros no ano a arquivar e um no ano seguinte.
+    Retorna a tupla (ids arquivados, id mantido).
+    """
+    arquivados = [
+        gravar(colaborador="ANA", cliente="MARIA DA SILVA", data=f"10-03-{ANO_ARQUIVADO}"),
+        gravar(colaborador="BRUNO", cliente="JOSE SOUZA", data=f"20-11-{ANO_ARQUIVADO}", valor="50,00"),
+    ]
+    return arquivados, gravar(colaborador="ANA", cliente="MARIA DA SILVA", data=f"05-01-{ANO_ARQUIVADO + 1}")
+
+
+def ids_da_busca(conn, filtro):
+    linhas, _ = buscar_pagina(conn, filtro, "Data")
+    return [linha[0] for linha in linhas]
+
+
+def test_arquivar_e_consultar_ano(caminho_banco, conn, registros):
+    arquivados, mantido = registros
+    assert arquivar_ano(conn, caminho_banco, ANO_ARQUIVADO) == 2
+    assert listar_particoes(caminho_banco) == {ANO_ARQUIVADO: caminho_particao(caminho_banco, ANO_ARQUIVADO)}
+    assert [row[0] for row in conn.execute("SELECT id FROM main.registros_producao")] == [mantido]
+
+    assert ids_da_busca(conn, FiltroProducao()) == arquivados + [mantido]
+    # Um filtro fora do ano arquivado não lê o arquivo
+    filtro = FiltroProducao(data_inicio=f"01-01-{ANO_ARQUIVADO + 1}", data_fim=f"31-12-{ANO_ARQUIVADO + 1}")
+    assert filtro.anos_arquivados == ()
+    assert ids_da_busca(conn, filtro) == [mantido]
+    assert ids_da_busca(conn, FiltroProducao(data_inicio=f"01-01-{ANO_ARQUIVADO}", data_fim=f"31-12-{ANO_ARQUIVADO}")) == arquivados
+    # A busca por texto livre usa o índice de busca copiado para o arquivo do ano
+    assert ids_da_busca(conn, FiltroProducao(cliente="silva")) == [arquivados[0], mantido]
+
+    # Os resumos continuam contando os registros arquivados
+    linhas = gerar_relatorio(conn, montar_relatorio(FiltroProducao(), ("Colaborador",)))
+    assert [tuple(linha[:3]) for linha in linhas] == [("ANA", 2, 20000), ("BRUNO", 1, 5000)]
+
+    # Executar de novo não move nada nem perde registros
+    assert arquivar_ano(conn, caminho_banco, ANO_ARQUIVADO) == 0
+    assert ids_da_busca(conn, FiltroProducao()) == arquivados + [mantido]
+
+
+def test_outra_conexao_anexa_o_ano_arquivado(caminho_banco, conn, registros):
+    arquivados, mantido = registros
+    arquivar_ano(conn, caminho_banco, ANO_ARQUIVADO)
+    outro = GerenciadorConexoes(caminho_banco)
+    try:
+        outra_conexao = outro.obter()
+        assert ids_da_busca(outra_conexao, FiltroProducao()) == arquivados + [mantido]
+        assert outra_conexao.execute("SELECT COUNT(*) FROM producao_completa").fetchone()[0] == 3
+    finally:
+        outro.fechar_todas()
+
+
+def test_ano_arquivado_e_somente_leitura(caminho_banco, conn, gravar, registros):
+    arquivados, mantido = registros
+    arquivar_ano(conn, caminho_banco, ANO_ARQUIVADO)
+    verificar_nao_arquivados(conn, [mantido])
+    with pytest.raises(ValueError):
+        verificar_nao_arquivados(conn, [mantido, arquivados[1]])
+    with pytest.raises(ValueError):
+        excluir_producao(conn, [arquivados[0]])
+    with pytest.raises(ValueError):
+        gravar(arquivados[0], valor="1,00")
+    assert ids_da_busca(conn, FiltroProducao()) == arquivados + [mantido]
+
+
+def test_ano_em_uso_nao_e_arquivado(caminho_banco, conn):
+    with pytest.raises(ValueError):
+        arquivar_ano(conn, caminho_banco, date.today().year)
+    assert not os.path.exists(caminho_particao(caminho_banco, date.today().year))
@@ -0,0 +1,78 @@
+import pytest
+
+from producao.filtros import FiltroProducao
+from producao.repositorio import ORDENACAO_COLUNAS, buscar_pagina, consulta_pagina
+
+REGISTROS = [
+    ("PA02", "BRUNO", "05-03-2025", "SEGURO", "CONCLUÍDO", "300,00"),
+    ("PA01", "ANA", "06-03-2025", "CONSORCIO", "CANCELADO", "100,00"),
+    ("PA01", "CARLA", "06-03-2025", "SEGURO", "EM ANDAMENTO", "100,00"),
+    ("PA03", "ANA", "07-03-2025", "CONSORCIO", "CONCLUÍDO", "200,00"),
+    ("PA02", "BRUNO", "08-03-2025", "CONSORCIO", "CONCLUÍDO", "50,00"),
+    ("PA01", "CARLA", "09-03-2025", "SEGURO", "CONCLUÍDO", "75,00"),
+    ("PA03", "ANA", "10-03-2025", "SEGURO", "CANCELADO", "20,00"),
+]
+
+
+@pytest.fixture
+def registros(conn, gravar):
+    ids = [
+        gravar(pa=pa, colaborador=colaborador, data=data, produto=produto, status=status, valor=valor)
+        for pa, colaborador, data, produto, status, valor in REGISTROS
+    ]
+    # Valores que a migração não conseguiu converter ficam nulos
+    with conn:
+        conn.execute("UPDATE registros_producao SET valor_centavos = NULL WHERE id IN (?, ?, ?)", (ids[1], ids[3], ids[6]))
+    return ids
+
+
+def paginar(conn, filtro, coluna, decrescente, tamanho):
+    """
+    Percorre todas as páginas e retorna os ids na ordem em que vieram.
+    """
+    ids, chave = [], None
+    while True:
+        linhas, chave = buscar_pagina(conn, filtro, coluna, decrescente, chave, tamanho)
+        ids += [linha[0] for linha in linhas]
+        if chave is None:
+            return ids
+
+
+def ordem_esperada(conn, coluna, decrescente):
+    """
+    Retorna os ids na ordem da coluna calculada sem paginação. Como no
+    SQLite, os nulos vêm antes dos valores (e depois, em ordem decrescente).
+    """
+    direcao = " DESC" if decrescente else ""
+    expressoes = ORDENACAO_COLUNAS[coluna] if coluna else ()
+    ordem = ", ".join(expressao + direcao for expressao in (*expressoes, "id"))
+    return [row[0] for row in conn.execute(f"SELECT id FROM producao ORDER BY {ordem}")]
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 4, 100])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_paginacao_por_valor_com_nulos(conn, registros, decrescente, tamanho):
+    ids = paginar(conn, FiltroProducao(), "Valor", decrescente, tamanho)
+    assert sorted(ids) == sorted(registros)
+    assert ids == ordem_esperada(conn, "Valor", decrescente)
+    nulos = [registros[1], registros[3], registros[6]]
+    assert (ids[-3:] if decrescente else ids[:3]) == sorted(nulos, reverse=decrescente)
+
+
+@pytest.mark.parametrize("coluna", [None, *ORDENACAO_COLUNAS])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_paginacao_por_coluna(conn, registros, coluna, decrescente):
+    assert paginar(conn, FiltroProducao(), coluna, decrescente, 2) == ordem_esperada(conn, coluna, decrescente)
+
+
+def test_paginacao_com_filtro(conn, registros):
+    filtro = FiltroProducao(pa="PA01")
+    ids = paginar(conn, filtro, "Colaborador", False, 2)
+    assert ids == [registros[1], registros[2], registros[5]]
+
+
+@pytest.mark.parametrize("coluna", ["PA", "Colaborador", "Produto", "Status"])
+def test_ordenacao_por_dimensao_usa_indices(conn, registros, coluna):
+    query, params = consulta_pagina(FiltroProducao(), ORDENACAO_COLUNAS[coluna])
+    plano = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+    assert "TEMP B-TREE" not in plano
@@ -0,0 +1,105 @@
+import pytest
+
+from producao.esquema import reconstruir_resumo
+from producao.filtros import FiltroProducao
+from producao.importacao import importar_arquivo
+from producao.relatorios import DIMENSOES_RELATORIO, PERIODOS_RELATORIO, gerar_relatorio, montar_relatorio
+from producao.repositorio import excluir_producao
+
+
+def resumos(conn):
+    return (
+        sorted(conn.execute("SELECT * FROM producao_resumo_diario")),
+        sorted(conn.execute("SELECT * FROM producao_resumo_mensal")),
+    )
+
+
+def assert_resumos_em_dia(conn):
+    """
+    Verifica que os resumos mantidos pelos gatilhos são iguais aos recalculados.
+    """
+    mantidos = resumos(conn)
+    reconstruir_resumo(conn)
+    assert resumos(conn) == mantidos
+
+
+def test_gatilhos_mantem_os_resumos(conn, gravar):
+    primeiro = gravar(colaborador="ANA", data="05-03-2025", valor="100,00")
+    segundo = gravar(colaborador="BRUNO", data="06-03-2025", produto="SEGURO", valor="50,00")
+    assert conn.execute("SELECT SUM(quantidade), SUM(total_centavos) FROM producao_resumo_diario").fetchone() == (2, 15000)
+    assert conn.execute(
+        "SELECT data, pa, nome, quantidade, total_centavos FROM producao_resumo_mensal WHERE dimensao = 'colaborador' ORDER BY nome"
+    ).fetchall() == [("2025-03-01", "PA01", "ANA", 1, 10000), ("2025-03-01", "PA01", "BRUNO", 1, 5000)]
+    assert_resumos_em_dia(conn)
+
+    # Mudar de mês, de PA e de valor move o registro entre os grupos
+    gravar(primeiro, pa="PA02", colaborador="ANA", data="10-04-2025", valor="30,00")
+    assert_resumos_em_dia(conn)
+    assert conn.execute(
+        "SELECT data, pa, quantidade, total_centavos FROM producao_resumo_mensal WHERE dimensao = 'colaborador' AND nome = 'ANA'"
+    ).fetchall() == [("2025-04-01", "PA02", 1, 3000)]
+
+    excluir_producao(conn, [segundo])
+    assert_resumos_em_dia(conn)
+    assert conn.execute("SELECT COUNT(*) FROM producao_resumo_mensal WHERE nome = 'BRUNO'").fetchone()[0] == 0
+
+
+def test_importacao_mantem_os_resumos(tmp_path, conn, gravar):
+    gravar()
+    arquivo = tmp_path / "importar.csv"
+    arquivo.write_text(
+        "pa,colaborador,data,cpf_cnpj,cliente,produto,status,valor\n"
+        "PA03,CARLA,01-02-2025,529.982.247-25,CLIENTE,SEGURO,CONCLUÍDO,\"10,00\"\n"
+        "PA03,CARLA,02-02-2025,529.982.247-25,CLIENTE,SEGURO,CANCELADO,\"20,00\"\n",
+        encoding="utf-8",
+    )
+    assert importar_arquivo(conn, str(arquivo)).importadas == 2
+    assert_resumos_em_dia(conn)
+
+
+def agregados_dos_registros(conn, pa, dimensoes, periodo):
+    """
+    Retorna a quantidade e o total de cada grupo do relatório, calculados
+    direto dos registros.
+    """
+    grupo = ([PERIODOS_RELATORIO[periodo]] if periodo else []) + [DIMENSOES_RELATORIO[dimensao] for dimensao in dimensoes]
+    agrupamento = f" GROUP BY {', '.join(grupo)}" if grupo else ""
+    linhas = conn.execute(
+        f"SELECT {', '.join(grupo + ['COUNT(*)', 'SUM(valor_centavos)'])} FROM producao WHERE pa LIKE ?{agrupamento}",
+        [pa or "%"],
+    )
+    return sorted(tuple(linha) for linha in linhas)
+
+
+@pytest.mark.parametrize("dimensoes, periodo, mensal", [
+    ((), None, True),
+    (("PA",), "Mês", True),
+    (("Colaborador",), None, True),
+    (("PA", "Produto"), "Mês", True),
+    (("Colaborador", "Produto"), None, False),
+    (("Status",), "Semana", False),
+])
+@pytest.mark.parametrize("pa", ["", "PA02"])
+def test_relatorios_pelos_resumos(conn, gravar, dimensoes, periodo, mensal, pa):
+    for dia, (pa_registro, colaborador, produto) in enumerate([
+        ("PA01", "ANA", "SEGURO"), ("PA02", "ANA", "CONSORCIO"), ("PA02", "BRUNO", "SEGURO"),
+        ("PA01", "CARLA", "SEGURO"), ("PA02", "BRUNO", "CONSORCIO"),
+    ]):
+        gravar(pa=pa_registro, colaborador=colaborador, produto=produto,
+               data=f"{dia + 1:02d}-{dia % 2 + 1:02d}-2025", valor=f"{dia + 1}0,00")
+    consulta = montar_relatorio(FiltroProducao(pa=pa), dimensoes, periodo)
+    assert ("producao_resumo_mensal" in consulta.query) == mensal
+    chaves = len(dimensoes) + (1 if periodo else 0)
+    obtido = sorted(tuple(linha[:chaves + 2]) for linha in gerar_relatorio(conn, consulta))
+    assert obtido == agregados_dos_registros(conn, pa, dimensoes, periodo)
+
+
+def test_filtro_que_corta_o_mes_usa_o_resumo_diario(conn, gravar):
+    gravar(data="05-03-2025")
+    gravar(data="20-03-2025")
+    consulta = montar_relatorio(FiltroProducao(data_inicio="01-03-2025", data_fim="10-03-2025"), ("Colaborador",))
+    assert "producao_resumo_mensal" not in consulta.query
+    assert [tuple(linha[:3]) for linha in gerar_relatorio(conn, consulta)] == [("ANA", 1, 10000)]
+    consulta = montar_relatorio(FiltroProducao(data_inicio="01-03-2025", data_fim="31-03-2025"), ("Colaborador",))
+    assert "producao_resumo_mensal" in consulta.query
+    assert [tuple(linha[:3]) for linha in gerar_relatorio(conn, consulta)] == [("ANA", 2, 20000)]
@@ -0,0 +1,116 @@
+import asyncio
+import http.client
+import threading
+
+import pytest
+
+from producao.cliente import ClienteProducao, ErroAPI
+from producao.filtros import FiltroProducao
+from producao.servidor import servir
+
+from conftest import CPF_VALIDO
+
+TOKEN = "segredo-de-teste"
+CAMPOS = {
+    "pa": "PA01", "colaborador": "ANA", "data": "05-03-2025", "cpf_cnpj": CPF_VALIDO, "cliente": "CLIENTE",
+    "produto": "CONSORCIO", "status": "CONCLUÍDO", "valor": "100,00", "observacoes": "",
+}
+
+
+def iniciar_servidor(caminho_banco, token):
+    """
+    Executa o servidor em uma thread, em uma porta livre.
+    Retorna uma tupla (url, função que encerra o servidor).
+    """
+    iniciado = threading.Event()
+    enderecos = []
+    execucao = {}
+
+    def ao_iniciar(sockets):
+        enderecos.extend(sockets)
+        iniciado.set()
+
+    async def principal():
+        execucao["loop"], execucao["tarefa"] = asyncio.get_running_loop(), asyncio.current_task()
+        await servir(caminho_banco, "127.0.0.1", 0, leitores=2, ao_iniciar=ao_iniciar, token=token)
+
+    def executar():
+        # asyncio.run cancela também as conexões que os clientes deixaram abertas
+        try:
+            asyncio.run(principal())
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=executar, daemon=True)
+    thread.start()
+    assert iniciado.wait(10), "o servidor não iniciou"
+
+    def encerrar():
+        execucao["loop"].call_soon_threadsafe(execucao["tarefa"].cancel)
+        thread.join(10)
+
+    host, porta = enderecos[0][:2]
+    return f"http://{host}:{porta}", encerrar
+
+
+@pytest.fixture
+def servidor_com_token(caminho_banco):
+    url, encerrar = iniciar_servidor(caminho_banco, TOKEN)
+    yield url
+    encerrar()
+
+
+@pytest.fixture
+def servidor_sem_token(caminho_banco):
+    url, encerrar = iniciar_servidor(caminho_banco, "")
+    yield url
+    encerrar()
+
+
+def test_requisicoes_com_token(servidor_com_token):
+    cliente = ClienteProducao(servidor_com_token, token=TOKEN)
+    id_registro = cliente.gravar(CAMPOS)
+    assert cliente.buscar_registro(id_registro)[:3] == ("PA01", "ANA", "2025-03-05")
+    linhas, proxima = cliente.buscar_pagina(FiltroProducao())
+    assert [linha[0] for linha in linhas] == [id_registro]
+    assert proxima is None
+    cliente.excluir([id_registro])
+    assert cliente.buscar_registro(id_registro) is None
+
+
+@pytest.mark.parametrize("token", ["", "outro-segredo"])
+def test_requisicoes_sem_o_token_sao_recusadas(servidor_com_token, token):
+    cliente = ClienteProducao(servidor_com_token, token=token)
+    with pytest.raises(ErroAPI) as erro:
+        cliente.buscar_pagina(FiltroProducao())
+    assert erro.value.status == 401
+    with pytest.raises(ErroAPI) as erro:
+        cliente.gravar(CAMPOS)
+    assert erro.value.status == 401
+    # Nada foi gravado
+    linhas, _ = ClienteProducao(servidor_com_token, token=TOKEN).buscar_pagina(FiltroProducao())
+    assert linhas == []
+
+
+def test_resposta_401_pede_o_token(servidor_com_token):
+    host, porta = servidor_com_token[len("http://"):].split(":")
+    conexao = http.client.HTTPConnection(host, int(porta), timeout=10)
+    try:
+        conexao.request("GET", "/registros")
+        resposta = conexao.getresponse()
+        resposta.read()
+        assert resposta.status == 401
+        assert resposta.getheader("WWW-Authenticate") == "Bearer"
+    finally:
+        conexao.close()
+
+
+def test_servidor_local_sem_token(servidor_sem_token):
+    cliente = ClienteProducao(servidor_sem_token, token="")
+    id_registro = cliente.gravar(CAMPOS)
+    assert cliente.buscar_registro(id_registro) is not None
+
+
+def test_endereco_externo_exige_token(caminho_banco):
+    with pytest.raises(ValueError):
+        asyncio.run(servir(caminho_banco, "0.0.0.0", 0, token=""))